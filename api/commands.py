@@ -6,12 +6,20 @@ from typing import Optional
 
 import click
 from flask import current_app
+from sqlalchemy import update
 from werkzeug.exceptions import NotFound
 
 from configs import dify_config
 from constants.languages import languages
+from core.rag.datasource.keyword.jieba.jieba_posting import JiebaPosting
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.embedding.embedding_codec import (
+    EmbeddingStorageFormat,
+    decode_embedding_array,
+    encode_embedding,
+    get_embedding_storage_format,
+)
 from core.rag.models.document import Document
 from events.app_event import app_was_created
 from extensions.ext_database import db
@@ -20,7 +28,7 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DocumentSegment
+from models.dataset import Dataset, DatasetCollectionBinding, DatasetKeywordTable, DocumentSegment, Embedding
 from models.dataset import Document as DatasetDocument
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
@@ -649,3 +657,96 @@ where sites.id is null limit 1000"""
                 break
 
     click.echo(click.style("Fix for missing app-related sites completed successfully!", fg="green"))
+
+
+@click.command("convert-embedding-cache-format", help="Convert cached embeddings to the configured storage format.")
+@click.option("--batch-size", default=1000, show_default=True, help="Number of rows converted per transaction.")
+def convert_embedding_cache_format(batch_size: int):
+    """
+    Rewrite rows of the embedding cache table in EMBEDDING_CACHE_STORAGE_FORMAT.
+    Rows are readable in any format, so the conversion can run while the service is online.
+    """
+    storage_format = EmbeddingStorageFormat(dify_config.EMBEDDING_CACHE_STORAGE_FORMAT)
+    click.echo(click.style(f"Starting convert cached embeddings to {storage_format}.", fg="green"))
+
+    last_id = None
+    converted_count = 0
+    skipped_count = 0
+    while True:
+        query = db.session.query(Embedding.id, Embedding.embedding).order_by(Embedding.id)
+        if last_id is not None:
+            query = query.filter(Embedding.id > last_id)
+        rows = query.limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        values = []
+        for row in rows:
+            if get_embedding_storage_format(row.embedding) == storage_format:
+                skipped_count += 1
+                continue
+            try:
+                embedding = decode_embedding_array(row.embedding)
+            except Exception as e:
+                click.echo(click.style(f"Failed to decode cached embedding {row.id}: {e}", fg="red"))
+                continue
+            values.append({"id": row.id, "embedding": encode_embedding(embedding, storage_format)})
+
+        if values:
+            db.session.execute(update(Embedding), values)
+            db.session.commit()
+            converted_count += len(values)
+        click.echo(f"Converted {converted_count} cached embeddings, skipped {skipped_count}.")
+
+    click.echo(
+        click.style(
+            f"Conversion complete. Converted {converted_count} cached embeddings, skipped {skipped_count}.",
+            fg="green",
+        )
+    )
+
+
+@click.command("migrate-keyword-postings", help="Migrate jieba keyword tables to keyword posting rows.")
+def migrate_keyword_postings():
+    """
+    Copy every dataset keyword table into dataset_keyword_postings so that KEYWORD_STORE
+    can be switched to jieba_posting without re-indexing. Safe to run more than once.
+    """
+    click.echo(click.style("Starting migrate keyword tables to keyword postings.", fg="green"))
+
+    migrated_count = 0
+    page = 1
+    while True:
+        try:
+            keyword_tables = DatasetKeywordTable.query.order_by(DatasetKeywordTable.id).paginate(page=page, per_page=50)
+        except NotFound:
+            break
+
+        page += 1
+        for keyword_table in keyword_tables:
+            dataset = db.session.query(Dataset).filter(Dataset.id == keyword_table.dataset_id).first()
+            if not dataset:
+                continue
+            try:
+                click.echo("Migrating keyword table of dataset: {}".format(dataset.id))
+                keyword_table_dict = keyword_table.keyword_table_dict
+                table = keyword_table_dict["__data__"]["table"] if keyword_table_dict else {}
+                postings: dict[str, list[str]] = {}
+                for keyword, node_ids in table.items():
+                    for node_id in node_ids:
+                        postings.setdefault(node_id, []).append(keyword)
+                JiebaPosting(dataset).add_postings(postings)
+                migrated_count += 1
+            except Exception as e:
+                db.session.rollback()
+                click.echo(
+                    click.style(
+                        "Migrate keyword table error: {} {} {}".format(dataset.id, e.__class__.__name__, str(e)),
+                        fg="red",
+                    )
+                )
+
+    click.echo(
+        click.style("Migration complete. Migrated {} dataset keyword tables.".format(migrated_count), fg="green")
+    )
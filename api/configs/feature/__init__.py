@@ -5,6 +5,7 @@ from pydantic import (
     Field,
     HttpUrl,
     NegativeInt,
+    NonNegativeFloat,
     NonNegativeInt,
     PositiveFloat,
     PositiveInt,
@@ -61,6 +62,10 @@ class AppExecutionConfig(BaseSettings):
         description="Maximum number of concurrent active requests per app (0 for unlimited)",
         default=0,
     )
+    APP_STOP_FLAG_CHECK_INTERVAL: PositiveFloat = Field(
+        description="Interval in seconds between checks of the stop flag of a running app task in Redis",
+        default=1.0,
+    )
 
 
 class CodeExecutionSandboxConfig(BaseSettings):
@@ -93,6 +98,34 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=10.0,
     )
 
+    CODE_EXECUTION_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of connections in the connection pool to the code execution service",
+        default=100,
+    )
+
+    CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections kept in the pool to the code execution service",
+        default=20,
+    )
+
+    CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection to the code execution service is kept",
+        default=5.0,
+    )
+
+    CODE_EXECUTION_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of concurrent runs of the same code node in parallel iterations sent to the"
+        " code execution service in one request, where they run one after the other in the same process and share"
+        " its interpreter state, 1 disables batching",
+        default=10,
+    )
+
+    CODE_EXECUTION_BATCH_WAIT: NonNegativeFloat = Field(
+        description="Time in seconds a code run in a parallel iteration waits for other runs of the same code node"
+        " to batch with",
+        default=0.01,
+    )
+
     CODE_MAX_NUMBER: PositiveInt = Field(
         description="Maximum allowed numeric value in code execution",
         default=9223372036854775807,
@@ -133,6 +166,28 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=1000,
     )
 
+    JINJA2_RENDERER: Literal["sandbox", "local"] = Field(
+        description="Where Jinja2 templates of template transform nodes and prompts are rendered,"
+        " 'sandbox' for the code execution service or 'local' for a sandboxed Jinja2 environment in the process",
+        default="sandbox",
+    )
+
+    JINJA2_TEMPLATE_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of compiled Jinja2 templates cached per process by the local renderer,"
+        " 0 to disable",
+        default=256,
+    )
+
+    JINJA2_RENDER_TIMEOUT: PositiveFloat = Field(
+        description="Maximum time in seconds a template takes to render with the local renderer",
+        default=5.0,
+    )
+
+    JINJA2_MAX_OUTPUT_LENGTH: PositiveInt = Field(
+        description="Maximum length in characters of a template rendered with the local renderer",
+        default=1000000,
+    )
+
 
 class EndpointConfig(BaseSettings):
     """
@@ -314,6 +369,32 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of connections in the shared connection pool for network requests (SSRF)",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections kept in the pool for network requests (SSRF)",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection is kept for network requests (SSRF)",
+        default=5.0,
+    )
+
+    SSRF_POOL_MAX_CONNECTIONS_PER_HOST: NonNegativeInt = Field(
+        description="Maximum number of concurrent requests to one host for network requests (SSRF),"
+        " 0 means no limit besides SSRF_POOL_MAX_CONNECTIONS",
+        default=0,
+    )
+
+    SSRF_POOL_HTTP2_ENABLED: bool = Field(
+        description="Enable HTTP/2 for network requests (SSRF), requires the h2 package",
+        default=False,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable or disable the X-Forwarded-For Proxy Fix middleware from Werkzeug"
         " to respect X-* headers to redirect clients",
@@ -389,6 +470,41 @@ class ModelLoadBalanceConfig(BaseSettings):
     )
 
 
+class ModelProviderCacheConfig(BaseSettings):
+    """
+    Configuration for the per-process cache of the model provider configurations of the workspaces
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of workspaces whose provider configurations are cached in each process,"
+        " 0 to disable the cache",
+        default=1000,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds after which cached provider configurations are reloaded even if unchanged,"
+        " for the changes made outside of the api such as quota top-ups",
+        default=60,
+    )
+
+
+class ProviderUsageCounterConfig(BaseSettings):
+    """
+    Configuration for counting the usage of the model providers in redis
+    """
+
+    PROVIDER_USAGE_COUNTER_ENABLED: bool = Field(
+        description="Count the hosted quota used and the last used time of the model providers in redis and write"
+        " them to the database in the background, instead of updating the provider records on each message",
+        default=True,
+    )
+
+    PROVIDER_USAGE_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Interval in seconds at which the provider usage counted in redis is written to the database",
+        default=10.0,
+    )
+
+
 class BillingConfig(BaseSettings):
     """
     Configuration for platform billing features
@@ -441,6 +557,33 @@ class WorkflowConfig(BaseSettings):
         default=200 * 1024,
     )
 
+    ITERATION_STREAMING_CHUNK_SIZE: PositiveInt = Field(
+        description="Number of outputs of a streaming iteration kept together in memory before being spilled to disk",
+        default=1000,
+    )
+
+    WORKFLOW_GRAPH_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of compiled workflow graphs cached per process, 0 to disable",
+        default=128,
+    )
+
+    WORKFLOW_VARIABLE_POOL_MEMORY_BUDGET: NonNegativeInt = Field(
+        description="Maximum size in bytes of the variables a workflow run keeps in memory, larger variables added"
+        " once it is reached are spilled to the storage, 0 for unlimited",
+        default=256 * 1024 * 1024,
+    )
+
+    WORKFLOW_VARIABLE_SPILL_THRESHOLD: NonNegativeInt = Field(
+        description="Size in bytes from which a workflow variable is always spilled to the storage, 0 to disable",
+        default=16 * 1024 * 1024,
+    )
+
+    WORKFLOW_VARIABLE_PREVIEW_LENGTH: NonNegativeInt = Field(
+        description="Maximum length of the strings and arrays saved in the inputs and outputs of node execution"
+        " logs, longer ones are truncated, 0 to disable",
+        default=100000,
+    )
+
 
 class WorkflowNodeExecutionConfig(BaseSettings):
     """
@@ -452,6 +595,43 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_EXECUTION_POOL_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads shared by the parallel branches and iterations of all workflow runs"
+        " in a process",
+        default=200,
+    )
+
+    WORKFLOW_EXECUTION_POOL_MAX_QUEUE_SIZE: PositiveInt = Field(
+        description="Maximum number of parallel branches and iterations waiting for a thread before new ones are"
+        " rejected",
+        default=2000,
+    )
+
+    WORKFLOW_EXECUTION_POOL_MAX_WORKERS_PER_TENANT: NonNegativeInt = Field(
+        description="Maximum number of threads of the workflow execution pool a tenant can use at once, 0 for no limit",
+        default=0,
+    )
+
+    WORKFLOW_EXECUTION_POOL_MAX_WORKERS_PER_APP: NonNegativeInt = Field(
+        description="Maximum number of threads of the workflow execution pool an app can use at once, 0 for no limit",
+        default=0,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of buffered workflow node execution records that triggers a write to the database",
+        default=100,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Maximum time in seconds workflow node execution records stay buffered before being written",
+        default=1.0,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_TIMEOUT: PositiveFloat = Field(
+        description="Maximum time in seconds to wait for buffered node execution records when a workflow run ends",
+        default=10.0,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -650,6 +830,43 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    RETRIEVAL_KEYWORD_SCORE_USE_SEGMENT_KEYWORDS: bool = Field(
+        description="Score keyword similarity during retrieval with the keywords saved on document segments"
+        " instead of re-extracting them from each candidate. Saved keywords are limited to the top 10 per segment.",
+        default=False,
+    )
+
+    RETRIEVAL_EXECUTOR_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads shared by all retrieval requests of a process",
+        default=32,
+    )
+
+    RETRIEVAL_EXECUTOR_MAX_QUEUE_SIZE: PositiveInt = Field(
+        description="Maximum number of retrieval tasks waiting for a thread before new tasks are rejected",
+        default=1000,
+    )
+
+    RETRIEVAL_TIMEOUT: NonNegativeInt = Field(
+        description="Deadline in seconds for the searches of one retrieval, pending searches are cancelled"
+        " and the retrieval fails when it expires. 0 means no deadline.",
+        default=0,
+    )
+
+    RETRIEVAL_CACHE_ENABLED: bool = Field(
+        description="Cache knowledge retrieval results in Redis, invalidated whenever a dataset index changes",
+        default=False,
+    )
+
+    RETRIEVAL_CACHE_TTL: PositiveInt = Field(
+        description="Expiration time in seconds for cached retrieval results",
+        default=300,
+    )
+
+    RETRIEVAL_CACHE_MAX_ENTRY_SIZE: PositiveInt = Field(
+        description="Maximum size in bytes of one cached retrieval result, larger results are not cached",
+        default=1024 * 1024,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -672,12 +889,77 @@ class IndexingConfig(BaseSettings):
         default=4000,
     )
 
+    INDEXING_PAGE_BATCH_SIZE: PositiveInt = Field(
+        description="Number of extracted pages split, saved and indexed together when indexing a document",
+        default=20,
+    )
+
+    INDEXING_MAX_PENDING_BATCHES: PositiveInt = Field(
+        description="Maximum number of batches of a document waiting to be embedded and loaded while the next"
+        " pages are extracted",
+        default=4,
+    )
+
+    INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_DATASET: PositiveInt = Field(
+        description="Maximum number of documents of a dataset indexed at once, across all the workers",
+        default=4,
+    )
+
+    INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_TENANT: PositiveInt = Field(
+        description="Maximum number of documents of a workspace indexed at once, across all the workers",
+        default=8,
+    )
+
+    EMBEDDING_BATCH_MAX_WAIT: NonNegativeFloat = Field(
+        description="Maximum time in seconds the document texts wait for the texts of other documents to fill an"
+        " embedding batch (0 to disable the shared batches)",
+        default=0.05,
+    )
+
+    EMBEDDING_BATCH_MAX_CONCURRENCY: PositiveInt = Field(
+        description="Maximum number of shared embedding batches sent at once per model and credentials, multiplied"
+        " by the number of load balancing configs of the model",
+        default=10,
+    )
+
     CHILD_CHUNKS_PREVIEW_NUMBER: PositiveInt = Field(
         description="Maximum number of child chunks to preview",
         default=50,
     )
 
 
+class EmbeddingCacheConfig(BaseSettings):
+    """
+    Configuration for the embedding cache used by indexing and retrieval
+    """
+
+    EMBEDDING_CACHE_LOOKUP_BATCH_SIZE: PositiveInt = Field(
+        description="Number of text hashes looked up in the embedding cache table per database query",
+        default=500,
+    )
+
+    EMBEDDING_CACHE_STORAGE_FORMAT: Literal["pickle", "float32", "float16"] = Field(
+        description="Binary format of new embeddings written to the embedding cache table and Redis,"
+        " existing rows in any format stay readable",
+        default="float32",
+    )
+
+    EMBEDDING_CACHE_MEMORY_SIZE: NonNegativeInt = Field(
+        description="Maximum number of embeddings kept in the in-process LRU cache (0 to disable)",
+        default=0,
+    )
+
+    EMBEDDING_CACHE_REDIS_ENABLED: bool = Field(
+        description="Whether to cache document embeddings in Redis in front of the embedding cache table",
+        default=False,
+    )
+
+    EMBEDDING_CACHE_REDIS_TTL: PositiveInt = Field(
+        description="Expiration time in seconds for embeddings cached in Redis",
+        default=600,
+    )
+
+
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
         description="Format for sending files in multimodal contexts ('base64' or 'url'), default is base64",
@@ -789,6 +1071,7 @@ class FeatureConfig(
     BillingConfig,
     CodeExecutionSandboxConfig,
     DataSetConfig,
+    EmbeddingCacheConfig,
     EndpointConfig,
     FileAccessConfig,
     FileUploadConfig,
@@ -798,9 +1081,11 @@ class FeatureConfig(
     LoggingConfig,
     MailConfig,
     ModelLoadBalanceConfig,
+    ModelProviderCacheConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
+    ProviderUsageCounterConfig,
     RagEtlConfig,
     SecurityConfig,
     ToolConfig,
@@ -1,3 +1,4 @@
+import logging
 import queue
 import time
 from abc import abstractmethod
@@ -18,6 +19,8 @@ from core.app.entities.queue_entities import (
 )
 from extensions.ext_redis import redis_client
 
+logger = logging.getLogger(__name__)
+
 
 class PublishFrom(Enum):
     APPLICATION_MANAGER = 1
@@ -41,6 +44,10 @@ class AppQueueManager:
         q: queue.Queue[WorkflowQueueMessage | MessageQueueMessage | None] = queue.Queue()
 
         self._q = q
+        # the stop flag is read from redis at most once per APP_STOP_FLAG_CHECK_INTERVAL, see _is_stopped
+        self._stopped = False
+        self._next_stop_check_time: float = 0
+        self._stop_flag_checks = 0
 
     def listen(self):
         """
@@ -52,8 +59,15 @@ class AppQueueManager:
         start_time = time.time()
         last_ping_time: int | float = 0
         while True:
+            # sleep until a message arrives or the next timeout, ping or stop flag check is due
+            elapsed_time = time.time() - start_time
+            wait_timeout = min(
+                listen_timeout - elapsed_time,
+                (last_ping_time + 1) * 10 - elapsed_time,
+                self._next_stop_check_time - time.monotonic(),
+            )
             try:
-                message = self._q.get(timeout=1)
+                message = self._q.get(timeout=max(wait_timeout, 0.01))
                 if message is None:
                     break
 
@@ -73,6 +87,8 @@ class AppQueueManager:
                     self.publish(QueuePingEvent(), PublishFrom.TASK_PIPELINE)
                     last_ping_time = elapsed_time // 10
 
+        logger.debug("Task %s stopped listening after %d stop flag checks", self._task_id, self._stop_flag_checks)
+
     def stop_listen(self) -> None:
         """
         Stop listen to queue
@@ -128,15 +144,26 @@ class AppQueueManager:
 
     def _is_stopped(self) -> bool:
         """
-        Check if task is stopped
+        Check if task is stopped.
+        The flag in redis is read at most once per APP_STOP_FLAG_CHECK_INTERVAL and cached in between,
+        so the number of redis calls does not grow with the number of streamed messages.
         :return:
         """
+        if self._stopped:
+            return True
+
+        now = time.monotonic()
+        if now < self._next_stop_check_time:
+            return False
+        self._next_stop_check_time = now + dify_config.APP_STOP_FLAG_CHECK_INTERVAL
+        self._stop_flag_checks += 1
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
-            return True
+            self._stopped = True
 
-        return False
+        return self._stopped
 
     @classmethod
     def _generate_task_belong_cache_key(cls, task_id: str) -> str:
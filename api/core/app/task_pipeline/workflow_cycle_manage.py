@@ -8,6 +8,7 @@ from uuid import uuid4
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from configs import dify_config
 from core.app.entities.app_invoke_entities import AdvancedChatAppGenerateEntity, InvokeFrom, WorkflowAppGenerateEntity
 from core.app.entities.queue_entities import (
     QueueIterationCompletedEvent,
@@ -35,11 +36,14 @@ from core.app.entities.task_entities import (
     WorkflowFinishStreamResponse,
     WorkflowStartStreamResponse,
 )
+from core.app.task_pipeline.workflow_node_execution_writer import get_workflow_node_execution_writer
 from core.file import FILE_MODEL_IDENTITY, File
 from core.model_runtime.utils.encoders import jsonable_encoder
 from core.ops.entities.trace_entity import TraceTaskName
 from core.ops.ops_trace_manager import TraceQueueManager, TraceTask
 from core.tools.tool_manager import ToolManager
+from core.variables import SpilledArray
+from core.variables.utils import dump_json, preview_spilled_arrays, truncate_value
 from core.workflow.entities.node_entities import NodeRunMetadataKey
 from core.workflow.enums import SystemVariableKey
 from core.workflow.nodes import NodeType
@@ -71,6 +75,8 @@ class WorkflowCycleManage:
         self._workflow_node_executions: dict[str, WorkflowNodeExecution] = {}
         self._application_generate_entity = application_generate_entity
         self._workflow_system_variables = workflow_system_variables
+        # outputs of the streaming iterations, closed once the workflow run is over
+        self._spilled_arrays: list[SpilledArray] = []
 
     def _handle_workflow_run_start(
         self,
@@ -153,12 +159,14 @@ class WorkflowCycleManage:
         :param conversation_id: conversation id
         :return:
         """
+        self._flush_workflow_node_executions(workflow_run_id)
         workflow_run = self._get_workflow_run(session=session, workflow_run_id=workflow_run_id)
 
         outputs = WorkflowEntry.handle_special_values(outputs)
 
         workflow_run.status = WorkflowRunStatus.SUCCEEDED.value
-        workflow_run.outputs = json.dumps(outputs or {})
+        workflow_run.outputs = dump_json(outputs or {})
+        self._close_spilled_arrays()
         workflow_run.elapsed_time = time.perf_counter() - start_at
         workflow_run.total_tokens = total_tokens
         workflow_run.total_steps = total_steps
@@ -189,11 +197,13 @@ class WorkflowCycleManage:
         conversation_id: Optional[str] = None,
         trace_manager: Optional[TraceQueueManager] = None,
     ) -> WorkflowRun:
+        self._flush_workflow_node_executions(workflow_run_id)
         workflow_run = self._get_workflow_run(session=session, workflow_run_id=workflow_run_id)
         outputs = WorkflowEntry.handle_special_values(dict(outputs) if outputs else None)
 
         workflow_run.status = WorkflowRunStatus.PARTIAL_SUCCESSED.value
-        workflow_run.outputs = json.dumps(outputs or {})
+        workflow_run.outputs = dump_json(outputs or {})
+        self._close_spilled_arrays()
         workflow_run.elapsed_time = time.perf_counter() - start_at
         workflow_run.total_tokens = total_tokens
         workflow_run.total_steps = total_steps
@@ -246,18 +256,12 @@ class WorkflowCycleManage:
         workflow_run.finished_at = datetime.now(UTC).replace(tzinfo=None)
         workflow_run.exceptions_count = exceptions_count
 
-        stmt = select(WorkflowNodeExecution.node_execution_id).where(
-            WorkflowNodeExecution.tenant_id == workflow_run.tenant_id,
-            WorkflowNodeExecution.app_id == workflow_run.app_id,
-            WorkflowNodeExecution.workflow_id == workflow_run.workflow_id,
-            WorkflowNodeExecution.triggered_from == WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN.value,
-            WorkflowNodeExecution.workflow_run_id == workflow_run.id,
-            WorkflowNodeExecution.status == WorkflowNodeExecutionStatus.RUNNING.value,
-        )
-        ids = session.scalars(stmt).all()
-        # Use self._get_workflow_node_execution here to make sure the cache is updated
+        # every node execution of this run is cached, including the ones not written yet
         running_workflow_node_executions = [
-            self._get_workflow_node_execution(session=session, node_execution_id=id) for id in ids if id
+            workflow_node_execution
+            for workflow_node_execution in self._workflow_node_executions.values()
+            if workflow_node_execution.workflow_run_id == workflow_run.id
+            and workflow_node_execution.status == WorkflowNodeExecutionStatus.RUNNING.value
         ]
 
         for workflow_node_execution in running_workflow_node_executions:
@@ -266,6 +270,9 @@ class WorkflowCycleManage:
             workflow_node_execution.error = error
             workflow_node_execution.finished_at = now
             workflow_node_execution.elapsed_time = (now - workflow_node_execution.created_at).total_seconds()
+            self._save_workflow_node_execution(workflow_node_execution)
+        self._flush_workflow_node_executions(workflow_run_id)
+        self._close_spilled_arrays()
 
         if trace_manager:
             trace_manager.add_trace_task(
@@ -304,9 +311,10 @@ class WorkflowCycleManage:
                 NodeRunMetadataKey.ITERATION_ID: event.in_iteration_id,
             }
         )
+        workflow_node_execution.elapsed_time = 0
         workflow_node_execution.created_at = datetime.now(UTC).replace(tzinfo=None)
 
-        session.add(workflow_node_execution)
+        self._save_workflow_node_execution(workflow_node_execution)
 
         self._workflow_node_executions[event.node_execution_id] = workflow_node_execution
         return workflow_node_execution
@@ -329,14 +337,14 @@ class WorkflowCycleManage:
         process_data = WorkflowEntry.handle_special_values(event.process_data)
 
         workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
-        workflow_node_execution.inputs = json.dumps(inputs) if inputs else None
-        workflow_node_execution.process_data = json.dumps(process_data) if process_data else None
-        workflow_node_execution.outputs = json.dumps(outputs) if outputs else None
+        workflow_node_execution.inputs = self._dump_node_execution_value(inputs)
+        workflow_node_execution.process_data = self._dump_node_execution_value(process_data)
+        workflow_node_execution.outputs = self._dump_node_execution_value(outputs)
         workflow_node_execution.execution_metadata = execution_metadata
         workflow_node_execution.finished_at = finished_at
         workflow_node_execution.elapsed_time = elapsed_time
 
-        workflow_node_execution = session.merge(workflow_node_execution)
+        self._save_workflow_node_execution(workflow_node_execution)
         return workflow_node_execution
 
     def _handle_workflow_node_execution_failed(
@@ -369,16 +377,42 @@ class WorkflowCycleManage:
             else WorkflowNodeExecutionStatus.EXCEPTION.value
         )
         workflow_node_execution.error = event.error
-        workflow_node_execution.inputs = json.dumps(inputs) if inputs else None
-        workflow_node_execution.process_data = json.dumps(process_data) if process_data else None
-        workflow_node_execution.outputs = json.dumps(outputs) if outputs else None
+        workflow_node_execution.inputs = self._dump_node_execution_value(inputs)
+        workflow_node_execution.process_data = self._dump_node_execution_value(process_data)
+        workflow_node_execution.outputs = self._dump_node_execution_value(outputs)
         workflow_node_execution.finished_at = finished_at
         workflow_node_execution.elapsed_time = elapsed_time
         workflow_node_execution.execution_metadata = execution_metadata
 
-        workflow_node_execution = session.merge(workflow_node_execution)
+        self._save_workflow_node_execution(workflow_node_execution)
         return workflow_node_execution
 
+    @staticmethod
+    def _dump_node_execution_value(value: Optional[Mapping[str, Any]]) -> Optional[str]:
+        """
+        Dump node execution inputs, process data or outputs, with large values truncated to a preview
+        """
+        if not value:
+            return None
+        if dify_config.WORKFLOW_VARIABLE_PREVIEW_LENGTH:
+            value = truncate_value(value, dify_config.WORKFLOW_VARIABLE_PREVIEW_LENGTH)
+        return dump_json(value)
+
+    @staticmethod
+    def _stream_node_execution_value(value: Optional[Mapping[str, Any]]) -> Optional[dict[str, Any]]:
+        """
+        Node inputs, process data or outputs sent in stream responses, in full unlike the preview saved in node
+        execution logs, except for the spilled arrays of streaming iterations
+        """
+        if not value:
+            return None
+        return cast(
+            dict[str, Any],
+            preview_spilled_arrays(
+                WorkflowEntry.handle_special_values(value), dify_config.WORKFLOW_VARIABLE_PREVIEW_LENGTH
+            ),
+        )
+
     def _handle_workflow_node_execution_retried(
         self, *, session: Session, workflow_run: WorkflowRun, event: QueueNodeRetryEvent
     ) -> WorkflowNodeExecution:
@@ -422,12 +456,12 @@ class WorkflowCycleManage:
         workflow_node_execution.finished_at = finished_at
         workflow_node_execution.elapsed_time = elapsed_time
         workflow_node_execution.error = event.error
-        workflow_node_execution.inputs = json.dumps(inputs) if inputs else None
-        workflow_node_execution.outputs = json.dumps(outputs) if outputs else None
+        workflow_node_execution.inputs = self._dump_node_execution_value(inputs)
+        workflow_node_execution.outputs = self._dump_node_execution_value(outputs)
         workflow_node_execution.execution_metadata = execution_metadata
         workflow_node_execution.index = event.node_run_index
 
-        session.add(workflow_node_execution)
+        self._save_workflow_node_execution(workflow_node_execution)
 
         self._workflow_node_executions[event.node_execution_id] = workflow_node_execution
         return workflow_node_execution
@@ -574,6 +608,7 @@ class WorkflowCycleManage:
         if not workflow_node_execution.finished_at:
             return None
 
+        outputs = self._stream_node_execution_value(event.outputs)
         return NodeFinishStreamResponse(
             task_id=task_id,
             workflow_run_id=workflow_node_execution.workflow_run_id,
@@ -584,16 +619,16 @@ class WorkflowCycleManage:
                 index=workflow_node_execution.index,
                 title=workflow_node_execution.title,
                 predecessor_node_id=workflow_node_execution.predecessor_node_id,
-                inputs=workflow_node_execution.inputs_dict,
-                process_data=workflow_node_execution.process_data_dict,
-                outputs=workflow_node_execution.outputs_dict,
+                inputs=self._stream_node_execution_value(event.inputs),
+                process_data=self._stream_node_execution_value(event.process_data),
+                outputs=outputs,
                 status=workflow_node_execution.status,
                 error=workflow_node_execution.error,
                 elapsed_time=workflow_node_execution.elapsed_time,
                 execution_metadata=workflow_node_execution.execution_metadata_dict,
                 created_at=int(workflow_node_execution.created_at.timestamp()),
                 finished_at=int(workflow_node_execution.finished_at.timestamp()),
-                files=self._fetch_files_from_node_outputs(workflow_node_execution.outputs_dict or {}),
+                files=self._fetch_files_from_node_outputs(outputs or {}),
                 parallel_id=event.parallel_id,
                 parallel_start_node_id=event.parallel_start_node_id,
                 parent_parallel_id=event.parent_parallel_id,
@@ -619,6 +654,7 @@ class WorkflowCycleManage:
         if not workflow_node_execution.finished_at:
             return None
 
+        outputs = self._stream_node_execution_value(event.outputs)
         return NodeRetryStreamResponse(
             task_id=task_id,
             workflow_run_id=workflow_node_execution.workflow_run_id,
@@ -629,16 +665,16 @@ class WorkflowCycleManage:
                 index=workflow_node_execution.index,
                 title=workflow_node_execution.title,
                 predecessor_node_id=workflow_node_execution.predecessor_node_id,
-                inputs=workflow_node_execution.inputs_dict,
-                process_data=workflow_node_execution.process_data_dict,
-                outputs=workflow_node_execution.outputs_dict,
+                inputs=self._stream_node_execution_value(event.inputs),
+                process_data=None,
+                outputs=outputs,
                 status=workflow_node_execution.status,
                 error=workflow_node_execution.error,
                 elapsed_time=workflow_node_execution.elapsed_time,
                 execution_metadata=workflow_node_execution.execution_metadata_dict,
                 created_at=int(workflow_node_execution.created_at.timestamp()),
                 finished_at=int(workflow_node_execution.finished_at.timestamp()),
-                files=self._fetch_files_from_node_outputs(workflow_node_execution.outputs_dict or {}),
+                files=self._fetch_files_from_node_outputs(outputs or {}),
                 parallel_id=event.parallel_id,
                 parallel_start_node_id=event.parallel_start_node_id,
                 parent_parallel_id=event.parent_parallel_id,
@@ -742,6 +778,8 @@ class WorkflowCycleManage:
     ) -> IterationNodeCompletedStreamResponse:
         # receive session to make sure the workflow_run won't be expired, need a more elegant way to handle this
         _ = session
+        if event.outputs:
+            self._spilled_arrays.extend(value for value in event.outputs.values() if isinstance(value, SpilledArray))
         return IterationNodeCompletedStreamResponse(
             task_id=task_id,
             workflow_run_id=workflow_run.id,
@@ -750,7 +788,10 @@ class WorkflowCycleManage:
                 node_id=event.node_id,
                 node_type=event.node_type.value,
                 title=event.node_data.title,
-                outputs=event.outputs,
+                # the outputs of a streaming iteration are spilled arrays, only a preview of them is sent
+                outputs=preview_spilled_arrays(
+                    WorkflowEntry.handle_special_values(event.outputs), dify_config.WORKFLOW_VARIABLE_PREVIEW_LENGTH
+                ),
                 created_at=int(time.time()),
                 extras={},
                 inputs=event.inputs or {},
@@ -838,6 +879,20 @@ class WorkflowCycleManage:
 
         return workflow_run
 
+    def _save_workflow_node_execution(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        # written in batches by the write-behind writer, flushed when the workflow run ends
+        get_workflow_node_execution_writer().save(workflow_node_execution)
+
+    def _flush_workflow_node_executions(self, workflow_run_id: str) -> None:
+        get_workflow_node_execution_writer().flush(
+            workflow_run_id, timeout=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_TIMEOUT
+        )
+
+    def _close_spilled_arrays(self) -> None:
+        # the run is over, every event reading the spilled arrays was handled
+        while self._spilled_arrays:
+            self._spilled_arrays.pop().close()
+
     def _get_workflow_node_execution(self, session: Session, node_execution_id: str) -> WorkflowNodeExecution:
         if node_execution_id not in self._workflow_node_executions:
             raise ValueError(f"Workflow node execution not found: {node_execution_id}")
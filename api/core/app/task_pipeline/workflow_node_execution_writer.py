@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from sqlalchemy import Engine
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from configs import dify_config
+from extensions.ext_database import db
+from models.workflow import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+_COLUMN_KEYS = [column.key for column in WorkflowNodeExecution.__table__.columns]
+# times the writer thread writes a record before handing it over to flush
+_MAX_WRITE_ATTEMPTS = 3
+# seconds between two attempts to write a failed batch
+_RETRY_INTERVAL = 0.5
+
+
+class WorkflowNodeExecutionWriter:
+    """
+    Write-behind buffer of workflow node execution records.
+
+    Saved records are snapshotted and kept in memory by id, so the start and finish of a node that
+    happen between two writes end up as a single upsert. A background thread writes the buffer in
+    batches once it holds batch_size records or flush_interval seconds passed, and callers that
+    need the records of a workflow run in the database, like the end of the run, wait for them with flush.
+
+    The records of a failed batch are queued again, and the ones that still fail after a few attempts
+    are written synchronously by the next flush of their run, which reports whether they could be written.
+    """
+
+    def __init__(self, engine: Engine, batch_size: int, flush_interval: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._engine = engine
+        self._condition = threading.Condition()
+        self._pending: dict[str, dict[str, Any]] = {}
+        # ids of the records not written yet by workflow run, and the records the writer thread gave up on
+        self._unwritten: dict[Optional[str], set[str]] = {}
+        self._given_up: dict[Optional[str], dict[str, dict[str, Any]]] = {}
+        self._attempts: dict[str, int] = {}
+        self._flush_waiters = 0
+        self._worker: Optional[threading.Thread] = None
+        self._saved = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._retried = 0
+        self._failed = 0
+
+    def save(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        row = {key: getattr(workflow_node_execution, key) for key in _COLUMN_KEYS}
+        with self._condition:
+            if row["id"] in self._pending:
+                self._coalesced += 1
+            self._pending[row["id"]] = row
+            self._unwritten.setdefault(row["workflow_run_id"], set()).add(row["id"])
+            self._saved += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="workflow_node_execution_writer", daemon=True)
+                self._worker.start()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+
+    def flush(self, workflow_run_id: Optional[str], timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every record of the workflow run saved before the call is written.
+
+        Records the writer thread gave up on are written synchronously.
+
+        :return: whether the records were written before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        lost = 0
+        while True:
+            with self._condition:
+                self._flush_waiters += 1
+                self._condition.notify_all()
+                try:
+                    remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    flushed = self._condition.wait_for(
+                        lambda: not self._unwritten.get(workflow_run_id) or workflow_run_id in self._given_up,
+                        remaining,
+                    )
+                    given_up = self._given_up.pop(workflow_run_id, {})
+                finally:
+                    self._flush_waiters -= 1
+            if not given_up:
+                break
+
+            rows = list(given_up.values())
+            written = self._write_rows(rows)
+            with self._condition:
+                if not written:
+                    self._failed += len(rows)
+                self._mark_written(rows)
+            if not written:
+                lost += len(rows)
+                logger.error("Lost %d workflow node executions that could not be written", len(rows))
+
+        if not flushed:
+            with self._condition:
+                queued = len(self._unwritten.get(workflow_run_id, ()))
+            logger.warning("Timed out flushing workflow node executions, %d still queued", queued)
+        return bool(flushed) and not lost
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending),
+                "saved": self._saved,
+                "coalesced": self._coalesced,
+                "batches": self._batches,
+                "retried": self._retried,
+                "failed": self._failed,
+            }
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                if len(self._pending) < self.batch_size and not self._flush_waiters:
+                    self._condition.wait(self.flush_interval)
+                rows = list(self._pending.values())
+                self._pending = {}
+
+            failed = False
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i : i + self.batch_size]
+                if self._write_rows(batch):
+                    with self._condition:
+                        self._mark_written(batch)
+                else:
+                    failed = True
+                    with self._condition:
+                        self._requeue(batch)
+
+            if failed:
+                time.sleep(_RETRY_INTERVAL)
+
+    def _requeue(self, rows: list[dict[str, Any]]) -> None:
+        for row in rows:
+            if row["id"] in self._pending:
+                # superseded by a newer snapshot, the record is written once that one is
+                continue
+            attempts = self._attempts.get(row["id"], 0) + 1
+            if attempts < _MAX_WRITE_ATTEMPTS:
+                self._attempts[row["id"]] = attempts
+                self._pending[row["id"]] = row
+                self._retried += 1
+            else:
+                self._attempts.pop(row["id"], None)
+                self._given_up.setdefault(row["workflow_run_id"], {})[row["id"]] = row
+        self._condition.notify_all()
+
+    def _mark_written(self, rows: list[dict[str, Any]]) -> None:
+        for row in rows:
+            self._attempts.pop(row["id"], None)
+            if row["id"] in self._pending:
+                # a newer snapshot is still to be written
+                continue
+            unwritten = self._unwritten.get(row["workflow_run_id"])
+            if unwritten is not None:
+                unwritten.discard(row["id"])
+                if not unwritten:
+                    del self._unwritten[row["workflow_run_id"]]
+        self._condition.notify_all()
+
+    def _write_rows(self, rows: list[dict[str, Any]]) -> bool:
+        try:
+            stmt = insert(WorkflowNodeExecution).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[WorkflowNodeExecution.id],
+                set_={key: stmt.excluded[key] for key in _COLUMN_KEYS if key != "id"},
+            )
+            with Session(self._engine) as session:
+                session.execute(stmt)
+                session.commit()
+        except Exception:
+            logger.exception("Failed to write %d workflow node executions", len(rows))
+            return False
+        with self._condition:
+            self._batches += 1
+        return True
+
+
+_workflow_node_execution_writer: Optional[WorkflowNodeExecutionWriter] = None
+_workflow_node_execution_writer_lock = threading.Lock()
+
+
+def get_workflow_node_execution_writer() -> WorkflowNodeExecutionWriter:
+    global _workflow_node_execution_writer
+    if _workflow_node_execution_writer is None:
+        with _workflow_node_execution_writer_lock:
+            if _workflow_node_execution_writer is None:
+                _workflow_node_execution_writer = WorkflowNodeExecutionWriter(
+                    engine=db.engine,
+                    batch_size=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE,
+                    flush_interval=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL,
+                )
+    return _workflow_node_execution_writer
+
+
+def _reset_writer() -> None:
+    # the writer thread does not survive a fork
+    global _workflow_node_execution_writer, _workflow_node_execution_writer_lock
+    _workflow_node_execution_writer = None
+    _workflow_node_execution_writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_writer)
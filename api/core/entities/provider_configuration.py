@@ -123,7 +123,8 @@ class ProviderConfiguration(BaseModel):
             if not credentials and self.custom_configuration.provider:
                 credentials = self.custom_configuration.provider.credentials
 
-            return credentials
+            # the configuration is shared by the requests of the workspace, model runtimes may change the credentials
+            return credentials.copy() if credentials is not None else None
 
     def get_system_configuration_status(self) -> Optional[SystemConfigurationStatus]:
         """
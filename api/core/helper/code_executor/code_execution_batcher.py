@@ -0,0 +1,111 @@
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Future
+from typing import Any, Optional, cast
+
+from configs import dify_config
+from core.helper.code_executor.code_executor import CodeExecutor, CodeLanguage
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.items: list[tuple[Mapping[str, Any], Future]] = []
+        self.closed = False
+
+
+class CodeExecutionBatcher:
+    """
+    Batches concurrent runs of the same code node, like the code node of a parallel iteration, into one request
+    to the code execution service.
+
+    The first run of a code node waits up to max_wait seconds for other runs of the same node to join it, then
+    executes the batch for every run of it. A batch is executed right away once it holds max_batch_size runs.
+
+    The runs of a batch are executed one after the other in the same sandbox process, and share its interpreter
+    state: module globals, mutable default arguments and files written. Batches are therefore only made of the
+    runs of one node of one workflow of a workspace.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._batches: dict[tuple[str, str, str, CodeLanguage, str], _Batch] = {}
+
+    def execute(
+        self,
+        *,
+        tenant_id: str,
+        workflow_id: str,
+        node_id: str,
+        language: CodeLanguage,
+        code: str,
+        inputs: Mapping[str, Any],
+    ) -> Mapping[str, Any]:
+        if self.max_batch_size <= 1:
+            return cast(
+                Mapping[str, Any],
+                CodeExecutor.execute_workflow_code_template(language=language, code=code, inputs=inputs),
+            )
+
+        key = (tenant_id, workflow_id, node_id, language, code)
+        future: Future[Mapping[str, Any]] = Future()
+        with self._condition:
+            batch = self._batches.get(key)
+            is_leader = batch is None
+            if batch is None:
+                batch = self._batches[key] = _Batch()
+            batch.items.append((inputs, future))
+            if len(batch.items) >= self.max_batch_size:
+                self._close(key, batch)
+
+        if is_leader:
+            with self._condition:
+                self._condition.wait_for(lambda: batch.closed, self.max_wait)
+                if not batch.closed:
+                    self._close(key, batch)
+            self._execute_batch(language, code, batch)
+
+        return future.result()
+
+    def _close(self, key: tuple[str, str, str, CodeLanguage, str], batch: _Batch) -> None:
+        batch.closed = True
+        del self._batches[key]
+        self._condition.notify_all()
+
+    @staticmethod
+    def _execute_batch(language: CodeLanguage, code: str, batch: _Batch) -> None:
+        try:
+            if len(batch.items) == 1:
+                inputs, future = batch.items[0]
+                future.set_result(CodeExecutor.execute_workflow_code_template(language, code, inputs))
+                return
+
+            results = CodeExecutor.execute_workflow_code_template_batch(
+                language, code, [inputs for inputs, _ in batch.items]
+            )
+            for (_, future), result in zip(batch.items, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+
+
+_code_execution_batcher: Optional[CodeExecutionBatcher] = None
+_code_execution_batcher_lock = threading.Lock()
+
+
+def get_code_execution_batcher() -> CodeExecutionBatcher:
+    global _code_execution_batcher
+    if _code_execution_batcher is None:
+        with _code_execution_batcher_lock:
+            if _code_execution_batcher is None:
+                _code_execution_batcher = CodeExecutionBatcher(
+                    max_batch_size=dify_config.CODE_EXECUTION_BATCH_SIZE,
+                    max_wait=dify_config.CODE_EXECUTION_BATCH_WAIT,
+                )
+    return _code_execution_batcher
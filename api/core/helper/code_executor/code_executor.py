@@ -1,15 +1,19 @@
 import logging
-from collections.abc import Mapping
+import os
+import threading
+from collections.abc import Mapping, Sequence
 from enum import StrEnum
 from threading import Lock
 from typing import Any, Optional
 
-from httpx import Timeout, post
+import httpx
+from httpx import Timeout
 from pydantic import BaseModel
 from yarl import URL
 
 from configs import dify_config
 from core.helper.code_executor.javascript.javascript_transformer import NodeJsTemplateTransformer
+from core.helper.code_executor.jinja2.jinja2_renderer import Jinja2RenderError, get_jinja2_renderer
 from core.helper.code_executor.jinja2.jinja2_transformer import Jinja2TemplateTransformer
 from core.helper.code_executor.python3.python3_transformer import Python3TemplateTransformer
 from core.helper.code_executor.template_transformer import TemplateTransformer
@@ -21,6 +25,10 @@ class CodeExecutionError(Exception):
     pass
 
 
+class CodeExecutionTimeoutError(CodeExecutionError):
+    pass
+
+
 class CodeExecutionResponse(BaseModel):
     class Data(BaseModel):
         stdout: Optional[str] = None
@@ -37,6 +45,39 @@ class CodeLanguage(StrEnum):
     JAVASCRIPT = "javascript"
 
 
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> httpx.Client:
+    """
+    Get the long-lived client of the code execution service, its connections are kept alive between requests.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=dify_config.CODE_EXECUTION_POOL_MAX_CONNECTIONS,
+                        max_keepalive_connections=dify_config.CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=dify_config.CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY,
+                    )
+                )
+    return _client
+
+
+def _reset_client() -> None:
+    # connections must not be shared with forked worker processes
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client)
+
+
 class CodeExecutor:
     dependencies_cache: dict[str, str] = {}
     dependencies_cache_lock = Lock()
@@ -75,7 +116,7 @@ class CodeExecutor:
         }
 
         try:
-            response = post(
+            response = _get_client().post(
                 str(url),
                 json=data,
                 headers=headers,
@@ -95,6 +136,8 @@ class CodeExecutor:
                 )
         except CodeExecutionError as e:
             raise e
+        except httpx.TimeoutException as e:
+            raise CodeExecutionTimeoutError(f"Code execution timed out ( Error: {str(e)} )")
         except Exception as e:
             raise CodeExecutionError(
                 "Failed to execute code, which is likely a network issue,"
@@ -126,6 +169,12 @@ class CodeExecutor:
         :param inputs: inputs
         :return:
         """
+        if language == CodeLanguage.JINJA2 and dify_config.JINJA2_RENDERER == "local":
+            try:
+                return {"result": get_jinja2_renderer().render(code, inputs)}
+            except Jinja2RenderError as e:
+                raise CodeExecutionError(str(e))
+
         template_transformer = cls.code_template_transformers.get(language)
         if not template_transformer:
             raise CodeExecutionError(f"Unsupported language {language}")
@@ -138,3 +187,50 @@ class CodeExecutor:
             raise e
 
         return template_transformer.transform_response(response)
+
+    @classmethod
+    def execute_workflow_code_template_batch(
+        cls, language: CodeLanguage, code: str, inputs_list: Sequence[Mapping[str, Any]]
+    ) -> list[Mapping[str, Any] | Exception]:
+        """
+        Execute code once for each inputs in a single request to the code execution service
+        :param language: code language
+        :param code: code
+        :param inputs_list: list of inputs
+        :return: the result of each inputs, or the error it failed with
+        """
+        template_transformer = cls.code_template_transformers.get(language)
+        if not template_transformer:
+            raise CodeExecutionError(f"Unsupported language {language}")
+
+        if len(inputs_list) > 1 and template_transformer.get_batch_runner_script() is not None:
+            runner, preload = template_transformer.transform_batch_caller(code, inputs_list)
+            try:
+                items = template_transformer.transform_batch_response(cls.execute_code(language, preload, runner))
+            except CodeExecutionTimeoutError as e:
+                # running each inputs again on its own would add the time out to the latency of every inputs
+                return [e] * len(inputs_list)
+            except (CodeExecutionError, ValueError):
+                # an error outside of the main function, like a syntax error or a crash of the sandbox process,
+                # fails the whole batch, run each inputs on its own for their own result or error
+                logger.warning("Batch code execution failed, executing %d inputs one by one", len(inputs_list))
+            else:
+                if len(items) == len(inputs_list):
+                    results: list[Mapping[str, Any] | Exception] = []
+                    for item in items:
+                        if "error" in item:
+                            results.append(CodeExecutionError(item["error"]))
+                            continue
+                        try:
+                            results.append(template_transformer.validate_result(item.get("output")))
+                        except ValueError as e:
+                            results.append(e)
+                    return results
+
+        outputs: list[Mapping[str, Any] | Exception] = []
+        for inputs in inputs_list:
+            try:
+                outputs.append(cls.execute_workflow_code_template(language, code, inputs))
+            except (CodeExecutionError, ValueError) as e:
+                outputs.append(e)
+        return outputs
@@ -24,3 +24,30 @@ class NodeJsTemplateTransformer(TemplateTransformer):
             """
         )
         return runner_script
+
+    @classmethod
+    def get_batch_runner_script(cls) -> str:
+        runner_script = dedent(
+            f"""
+            // declare main function
+            {cls._code_placeholder}
+            
+            // decode and prepare the list of input objects
+            var inputs_list = JSON.parse(Buffer.from('{cls._inputs_placeholder}', 'base64').toString('utf-8'))
+            
+            // execute main function for each input object, an error only fails its own input
+            var output_list = inputs_list.map(function (inputs_obj) {{
+                try {{
+                    return {{ output: main(inputs_obj) }}
+                }} catch (e) {{
+                    return {{ error: String(e) }}
+                }}
+            }})
+            
+            // convert outputs to json and print
+            var output_json = JSON.stringify(output_list)
+            var result = `<<RESULT>>${{output_json}}<<RESULT>>`
+            console.log(result)
+            """
+        )
+        return runner_script
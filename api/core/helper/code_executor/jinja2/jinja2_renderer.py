@@ -0,0 +1,149 @@
+import hashlib
+import sys
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from types import FrameType
+from typing import Any, Optional, cast
+
+from jinja2 import Template
+from jinja2.runtime import Context
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
+
+# file name of the code compiled from a template source
+_TEMPLATE_FILENAME = "<template>"
+_SEQUENCE_TYPES = (str, bytes, list, tuple)
+
+
+class Jinja2RenderError(ValueError):
+    pass
+
+
+class _LimitedSandboxedEnvironment(ImmutableSandboxedEnvironment):
+    """
+    Sandboxed environment failing before allocating a value longer than the output of a render, when adding or
+    repeating sequences or raising a number to a power.
+    """
+
+    intercepted_binops = frozenset(["+", "*", "**"])
+
+    def __init__(self, max_output_length: int) -> None:
+        super().__init__()
+        self.max_output_length = max_output_length
+
+    def call_binop(self, context: Context, operator: str, left: Any, right: Any) -> Any:
+        if operator == "+":
+            if isinstance(left, _SEQUENCE_TYPES) and isinstance(right, _SEQUENCE_TYPES):
+                self._check_length(len(left) + len(right))
+        elif operator == "*":
+            for sequence, times in ((left, right), (right, left)):
+                if isinstance(sequence, _SEQUENCE_TYPES) and isinstance(times, int):
+                    self._check_length(len(sequence) * times)
+        elif operator == "**" and isinstance(left, int) and isinstance(right, int):
+            # a number has about one digit per 3.3 bits
+            self._check_length(abs(left).bit_length() * right // 4)
+        return super().call_binop(context, operator, left, right)
+
+    def _check_length(self, length: int) -> None:
+        if length > self.max_output_length:
+            raise Jinja2RenderError(f"Template value exceeds {self.max_output_length} characters")
+
+
+@contextmanager
+def _deadline_guard(deadline: float, timeout: float) -> Iterator[None]:
+    """
+    Check the deadline on every line the compiled templates run in the current thread, so that a template
+    looping without output is interrupted too.
+    """
+
+    def trace_line(frame: FrameType, event: str, arg: Any) -> Any:
+        if event == "line" and time.monotonic() > deadline:
+            raise Jinja2RenderError(f"Template rendering timed out after {timeout} seconds")
+        return trace_line
+
+    def trace_call(frame: FrameType, event: str, arg: Any) -> Any:
+        # only the frames of the templates are traced line by line
+        return trace_line if frame.f_code.co_filename == _TEMPLATE_FILENAME else None
+
+    previous = sys.gettrace()
+    sys.settrace(trace_call)
+    try:
+        yield
+    finally:
+        sys.settrace(previous)
+
+
+class Jinja2Renderer:
+    """
+    Renders Jinja2 templates in the process, in a sandboxed environment denying access to unsafe attributes and
+    to the methods modifying the inputs, instead of sending each render to the code execution service.
+
+    Compiled templates are cached by the hash of their source. A render fails once its output exceeds
+    max_output_length characters or it runs longer than timeout seconds, both are checked as the template
+    output is generated and while the template is evaluated: the deadline on every line run by the template,
+    the length before building a sequence or a number.
+    """
+
+    def __init__(self, cache_size: int, max_output_length: int, timeout: float) -> None:
+        self.max_output_length = max_output_length
+        self.timeout = timeout
+        self._environment = _LimitedSandboxedEnvironment(max_output_length)
+        self._cache = LRUCache(cache_size) if cache_size else None
+        self._cache_lock = threading.Lock()
+
+    def render(self, template: str, inputs: Mapping[str, Any]) -> str:
+        compiled = self._get_template(template)
+        deadline = time.monotonic() + self.timeout
+        chunks = []
+        length = 0
+        try:
+            with _deadline_guard(deadline, self.timeout):
+                for chunk in compiled.generate(**inputs):
+                    length += len(chunk)
+                    if length > self.max_output_length:
+                        raise Jinja2RenderError(f"Template output exceeds {self.max_output_length} characters")
+                    chunks.append(chunk)
+        except Jinja2RenderError:
+            raise
+        except Exception as e:
+            raise Jinja2RenderError(f"Failed to render template: {e}") from e
+        return "".join(chunks)
+
+    def _get_template(self, template: str) -> Template:
+        key = hashlib.sha256(template.encode()).hexdigest()
+        if self._cache is not None:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+            if cached is not None:
+                return cast(Template, cached)
+
+        try:
+            compiled = self._environment.from_string(template)
+        except Exception as e:
+            raise Jinja2RenderError(f"Failed to compile template: {e}") from e
+
+        if self._cache is not None:
+            with self._cache_lock:
+                self._cache.put(key, compiled)
+        return compiled
+
+
+_jinja2_renderer: Optional[Jinja2Renderer] = None
+_jinja2_renderer_lock = threading.Lock()
+
+
+def get_jinja2_renderer() -> Jinja2Renderer:
+    global _jinja2_renderer
+    if _jinja2_renderer is None:
+        with _jinja2_renderer_lock:
+            if _jinja2_renderer is None:
+                _jinja2_renderer = Jinja2Renderer(
+                    cache_size=dify_config.JINJA2_TEMPLATE_CACHE_SIZE,
+                    max_output_length=dify_config.JINJA2_MAX_OUTPUT_LENGTH,
+                    timeout=dify_config.JINJA2_RENDER_TIMEOUT,
+                )
+    return _jinja2_renderer
@@ -25,3 +25,30 @@ class Python3TemplateTransformer(TemplateTransformer):
             print(result)
             """)
         return runner_script
+
+    @classmethod
+    def get_batch_runner_script(cls) -> str:
+        runner_script = dedent(f"""
+            # declare main function
+            {cls._code_placeholder}
+            
+            import json
+            from base64 import b64decode
+            
+            # decode and prepare the list of input dicts
+            inputs_list = json.loads(b64decode('{cls._inputs_placeholder}').decode('utf-8'))
+            
+            # execute main function for each input dict, an error only fails its own input
+            output_list = []
+            for inputs_obj in inputs_list:
+                try:
+                    output_list.append({{"output": main(**inputs_obj)}})
+                except Exception as e:
+                    output_list.append({{"error": f"{{type(e).__name__}}: {{e}}"}})
+            
+            # convert outputs to json and print
+            output_json = json.dumps(output_list, indent=4)
+            result = f'''<<RESULT>>{{output_json}}<<RESULT>>'''
+            print(result)
+            """)
+        return runner_script
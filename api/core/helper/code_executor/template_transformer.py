@@ -2,8 +2,8 @@ import json
 import re
 from abc import ABC, abstractmethod
 from base64 import b64encode
-from collections.abc import Mapping
-from typing import Any
+from collections.abc import Mapping, Sequence
+from typing import Any, Optional
 
 
 class TemplateTransformer(ABC):
@@ -42,12 +42,54 @@ class TemplateTransformer(ABC):
             result = json.loads(cls.extract_result_str_from_response(response))
         except json.JSONDecodeError:
             raise ValueError("failed to parse response")
+        return cls.validate_result(result)
+
+    @classmethod
+    def validate_result(cls, result: Any) -> Mapping[str, Any]:
+        """
+        Check the result of the main function is a dict with string keys
+        :param result: result
+        :return:
+        """
         if not isinstance(result, dict):
             raise ValueError("result must be a dict")
         if not all(isinstance(k, str) for k in result):
             raise ValueError("result keys must be strings")
         return result
 
+    @classmethod
+    def transform_batch_caller(cls, code: str, inputs_list: Sequence[Mapping[str, Any]]) -> tuple[str, str]:
+        """
+        Transform code to a runner calling the main function once for each inputs
+        :param code: code
+        :param inputs_list: list of inputs
+        :return: runner, preload
+        """
+        script = cls.get_batch_runner_script()
+        if script is None:
+            raise ValueError(f"{cls.__name__} does not support batch execution")
+
+        script = script.replace(cls._code_placeholder, code)
+        inputs_str = b64encode(json.dumps(inputs_list, ensure_ascii=False).encode()).decode("utf-8")
+        script = script.replace(cls._inputs_placeholder, inputs_str)
+        return script, cls.get_preload_script()
+
+    @classmethod
+    def transform_batch_response(cls, response: str) -> list[Mapping[str, Any]]:
+        """
+        Transform the response of a batch runner to a list of dicts, with either the "output" of the main
+        function or the "error" it raised for each inputs
+        :param response: response
+        :return:
+        """
+        try:
+            items = json.loads(cls.extract_result_str_from_response(response))
+        except json.JSONDecodeError:
+            raise ValueError("failed to parse response")
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValueError("batch result must be a list of dicts")
+        return items
+
     @classmethod
     @abstractmethod
     def get_runner_script(cls) -> str:
@@ -56,6 +98,13 @@ class TemplateTransformer(ABC):
         """
         pass
 
+    @classmethod
+    def get_batch_runner_script(cls) -> Optional[str]:
+        """
+        Get the runner script calling the main function once for each inputs, None if not supported
+        """
+        return None
+
     @classmethod
     def serialize_inputs(cls, inputs: Mapping[str, Any]) -> str:
         inputs_json_str = json.dumps(inputs, ensure_ascii=False).encode()
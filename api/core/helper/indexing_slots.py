@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+# seconds a slot is held at most, a slot of a worker killed while indexing is freed once expired
+_SLOT_LEASE = 3600
+# seconds between two attempts to acquire a slot
+_POLL_INTERVAL = 1.0
+
+# KEYS: slots. ARGV: now, lease expiry, limit, token, lease. Returns whether the slot was acquired.
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class IndexingSlots:
+    """
+    Counting semaphore shared by all the workers through redis, bounding the documents indexed at once for a
+    dataset or a tenant.
+    """
+
+    def __init__(self, key: str, limit: int) -> None:
+        self.key = key
+        self.limit = limit
+        self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+
+    def try_acquire(self) -> Optional[str]:
+        """
+        Acquire a slot if one is free.
+
+        :return: token of the slot to release, None if all the slots are held
+        """
+        token = str(uuid.uuid4())
+        now = time.time()
+        acquired = self._acquire_script(keys=[self.key], args=[now, now + _SLOT_LEASE, self.limit, token, _SLOT_LEASE])
+        return token if acquired else None
+
+    def release(self, token: str) -> None:
+        redis_client.zrem(self.key, token)
+
+    def active(self) -> int:
+        return int(redis_client.zcount(self.key, time.time(), "+inf"))
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        token = self.try_acquire()
+        if token is None:
+            indexing_scheduler_stats.incr("waiting")
+            try:
+                while token is None:
+                    time.sleep(_POLL_INTERVAL)
+                    token = self.try_acquire()
+            finally:
+                indexing_scheduler_stats.incr("waiting", -1)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+
+class IndexingSchedulerStats:
+    """
+    Process-wide counters of the documents indexed concurrently.
+    """
+
+    FIELDS = ("waiting", "running", "completed", "failed", "paused")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[field] += amount
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+indexing_scheduler_stats = IndexingSchedulerStats()
+
+
+@contextmanager
+def hold_indexing_slots(tenant_id: str, dataset_id: str) -> Iterator[None]:
+    """
+    Wait for a slot of the dataset and then of the tenant, and hold both while the document is indexed.
+    """
+    dataset_slots = IndexingSlots(
+        f"indexing_slots:dataset:{dataset_id}", dify_config.INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_DATASET
+    )
+    tenant_slots = IndexingSlots(
+        f"indexing_slots:tenant:{tenant_id}", dify_config.INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_TENANT
+    )
+    with dataset_slots.hold(), tenant_slots.hold():
+        yield
@@ -50,3 +50,26 @@ class ProviderCredentialsCache:
         :return:
         """
         redis_client.delete(self.cache_key)
+
+
+class ProviderConfigurationsVersion:
+    def __init__(self, tenant_id: str):
+        self.cache_key = f"provider_configurations_version:tenant_id:{tenant_id}"
+
+    def get(self) -> int:
+        """
+        Get the version of the provider configurations of the workspace.
+
+        :return:
+        """
+        version = redis_client.get(self.cache_key)
+        return int(version) if version else 0
+
+    def bump(self) -> None:
+        """
+        Bump the version of the provider configurations of the workspace after a change,
+        so that every process reloads its cached configurations.
+
+        :return:
+        """
+        redis_client.incr(self.cache_key)
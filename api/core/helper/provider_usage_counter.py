@@ -0,0 +1,375 @@
+import logging
+import os
+import threading
+import time
+from datetime import UTC, datetime
+from typing import Optional
+
+from sqlalchemy import Engine, func, update
+from sqlalchemy.orm import Session
+
+from configs import dify_config
+from core.entities.provider_entities import QuotaConfiguration
+from core.helper.model_provider_cache import ProviderConfigurationsVersion
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.provider import Provider, ProviderQuotaType, ProviderType
+
+logger = logging.getLogger(__name__)
+
+# all the keys share a hash tag so that the scripts can use several of them on a redis cluster
+_KEY_PREFIX = "{provider_usage}"
+_DIRTY_QUOTAS_KEY = f"{_KEY_PREFIX}:dirty_quotas"
+_LAST_USED_KEY = f"{_KEY_PREFIX}:last_used"
+_FLUSH_LOCK_KEY = f"{_KEY_PREFIX}:flush_lock"
+
+# seconds a counter is kept in redis once written to the database and no longer used, it is then reloaded
+# from the database so that the changes made there, like a quota reset, are picked up by idle counters too
+_IDLE_COUNTER_TTL = 60
+
+# A counter holds the quota used read from the database as base, the quota deducted since as pending, and the
+# quota being written to the database as flushing.
+
+# KEYS: counter, dirty quotas. ARGV: amount. Returns nil when the counter is not loaded, else used, limit and
+# whether the amount was deducted, which it is not when the quota is already used up.
+_DEDUCT_SCRIPT = """
+local counter = redis.call('HMGET', KEYS[1], 'limit', 'base', 'pending', 'flushing')
+if not counter[1] then
+    return nil
+end
+local limit = tonumber(counter[1])
+local used = tonumber(counter[2]) + tonumber(counter[3]) + tonumber(counter[4])
+if limit <= used then
+    return {used, limit, 0}
+end
+redis.call('HINCRBY', KEYS[1], 'pending', ARGV[1])
+redis.call('PERSIST', KEYS[1])
+redis.call('SADD', KEYS[2], KEYS[1])
+return {used + tonumber(ARGV[1]), limit, 1}
+"""
+
+# KEYS: counter. ARGV: used, limit, ttl.
+_LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'base', ARGV[1], 'pending', 0, 'flushing', 0, 'limit', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+# KEYS: counter, dirty quotas. Moves the pending quota to the quota being written, which is still there if the
+# previous write of the counter failed, and returns it. Returns nil when the counter is not loaded.
+_TAKE_SCRIPT = """
+local pending = redis.call('HGET', KEYS[1], 'pending')
+if not pending then
+    redis.call('SREM', KEYS[2], KEYS[1])
+    return nil
+end
+redis.call('HSET', KEYS[1], 'pending', 0)
+return redis.call('HINCRBY', KEYS[1], 'flushing', pending)
+"""
+
+# KEYS: counter, dirty quotas. ARGV: quota used and limit read back from the database, empty when the provider
+# record is gone, and ttl. The counter stays dirty if it was deducted while written.
+_FLUSHED_SCRIPT = """
+if ARGV[1] == '' then
+    redis.call('DEL', KEYS[1])
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[2], KEYS[1])
+    return 1
+end
+redis.call('HSET', KEYS[1], 'base', ARGV[1], 'flushing', 0)
+if ARGV[2] ~= '' then
+    redis.call('HSET', KEYS[1], 'limit', ARGV[2])
+end
+if tonumber(redis.call('HGET', KEYS[1], 'pending')) == 0 then
+    redis.call('SREM', KEYS[2], KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+# KEYS: last used. ARGV: field, value written to the database.
+_LAST_USED_FLUSHED_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class ProviderUsageCounter:
+    """
+    Quota usage and last used time of the providers of the workspaces, counted in redis and written to the
+    providers table in the background.
+
+    A quota counter is loaded from its provider record on first use, the quota is deducted and checked against
+    its limit atomically in redis. Every flush_interval seconds one of the processes adds the quota deducted
+    since the last write of each counter to the providers table with `quota_used = quota_used + delta`, and
+    reloads the counter from the quota used and limit returned, so that the changes made in the database, like a
+    quota reset, are kept. The delta being written stays in the counter until the write is acknowledged and is
+    written again if it failed, counters are only lost with the redis data, up to flush_interval seconds of usage.
+    """
+
+    def __init__(self, engine: Engine, flush_interval: float) -> None:
+        self.flush_interval = flush_interval
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._deduct_script = redis_client.register_script(_DEDUCT_SCRIPT)
+        self._load_script = redis_client.register_script(_LOAD_SCRIPT)
+        self._take_script = redis_client.register_script(_TAKE_SCRIPT)
+        self._flushed_script = redis_client.register_script(_FLUSHED_SCRIPT)
+        self._last_used_flushed_script = redis_client.register_script(_LAST_USED_FLUSHED_SCRIPT)
+
+    def deduct_quota(
+        self, tenant_id: str, provider_name: str, quota_type: ProviderQuotaType, amount: int
+    ) -> Optional[tuple[int, int, bool]]:
+        """
+        Deduct quota of a provider if it is not used up.
+
+        :param tenant_id: workspace id
+        :param provider_name: provider name
+        :param quota_type: quota type
+        :param amount: quota to deduct
+        :return: quota used and limit, and whether it was deducted, None if the provider has no record of the quota
+        """
+        self._start_worker()
+        key = self._quota_key(tenant_id, provider_name, quota_type)
+        result = self._deduct_script(keys=[key, _DIRTY_QUOTAS_KEY], args=[amount])
+        if result is None:
+            provider_record = (
+                db.session.query(Provider.quota_used, Provider.quota_limit)
+                .filter(
+                    Provider.tenant_id == tenant_id,
+                    Provider.provider_name == provider_name,
+                    Provider.provider_type == ProviderType.SYSTEM.value,
+                    Provider.quota_type == quota_type.value,
+                )
+                .first()
+            )
+            if not provider_record:
+                return None
+
+            self._load_script(
+                keys=[key], args=[provider_record.quota_used or 0, provider_record.quota_limit, _IDLE_COUNTER_TTL]
+            )
+            result = self._deduct_script(keys=[key, _DIRTY_QUOTAS_KEY], args=[amount])
+            if result is None:
+                return None
+
+        used, limit, deducted = result
+        return int(used), int(limit), bool(deducted)
+
+    def get_quota_used(self, tenant_id: str, provider_name: str, quota_type: ProviderQuotaType) -> Optional[int]:
+        """
+        Get the quota used of a provider counted in redis.
+
+        :return: quota used, None if the counter is not loaded
+        """
+        counter = redis_client.hmget(
+            self._quota_key(tenant_id, provider_name, quota_type), "base", "pending", "flushing"
+        )
+        if counter[0] is None:
+            return None
+        return sum(int(value) for value in counter)
+
+    def touch(self, tenant_id: str, provider_name: str) -> None:
+        """
+        Record the use of a provider.
+
+        :param tenant_id: workspace id
+        :param provider_name: provider name
+        """
+        self._start_worker()
+        redis_client.hset(_LAST_USED_KEY, f"{tenant_id}:{provider_name}", repr(time.time()))
+
+    def flush(self) -> bool:
+        """
+        Write the counters to the providers table, unless another process is writing them.
+
+        :return: whether the counters were written
+        """
+        lock = redis_client.lock(_FLUSH_LOCK_KEY, timeout=max(60, self.flush_interval * 6))
+        if not lock.acquire(blocking=False):
+            return False
+
+        try:
+            self._flush_quotas()
+            self._flush_last_used()
+        finally:
+            lock.release()
+        return True
+
+    def _flush_quotas(self) -> None:
+        keys = [key.decode() if isinstance(key, bytes) else key for key in redis_client.smembers(_DIRTY_QUOTAS_KEY)]
+        if not keys:
+            return
+
+        deltas = [(key, self._take_script(keys=[key, _DIRTY_QUOTAS_KEY])) for key in keys]
+
+        written: list[tuple[str, Optional[int], Optional[int]]] = []
+        with Session(self._engine) as session:
+            for key, delta in deltas:
+                if delta is None:
+                    continue
+
+                tenant_id, provider_name, quota_type = key.removeprefix(f"{_KEY_PREFIX}:quota:").split(":", 2)
+                provider_record = session.execute(
+                    update(Provider)
+                    .where(
+                        Provider.tenant_id == tenant_id,
+                        Provider.provider_name == provider_name,
+                        Provider.provider_type == ProviderType.SYSTEM.value,
+                        Provider.quota_type == quota_type,
+                    )
+                    .values(quota_used=func.coalesce(Provider.quota_used, 0) + int(delta))
+                    .returning(Provider.quota_used, Provider.quota_limit)
+                ).first()
+                if provider_record:
+                    written.append((key, provider_record.quota_used, provider_record.quota_limit))
+                else:
+                    written.append((key, None, None))
+            session.commit()
+
+        for key, quota_used, quota_limit in written:
+            self._flushed_script(
+                keys=[key, _DIRTY_QUOTAS_KEY],
+                args=[
+                    quota_used if quota_used is not None else "",
+                    quota_limit if quota_limit is not None else "",
+                    _IDLE_COUNTER_TTL,
+                ],
+            )
+
+    def _flush_last_used(self) -> None:
+        last_used = {
+            (field.decode() if isinstance(field, bytes) else field): (
+                value.decode() if isinstance(value, bytes) else value
+            )
+            for field, value in redis_client.hgetall(_LAST_USED_KEY).items()
+        }
+        if not last_used:
+            return
+
+        with Session(self._engine) as session:
+            for field, value in last_used.items():
+                tenant_id, provider_name = field.split(":", 1)
+                session.execute(
+                    update(Provider)
+                    .where(Provider.tenant_id == tenant_id, Provider.provider_name == provider_name)
+                    .values(last_used=datetime.fromtimestamp(float(value), UTC).replace(tzinfo=None))
+                )
+            session.commit()
+
+        for field, value in last_used.items():
+            self._last_used_flushed_script(keys=[_LAST_USED_KEY], args=[field, value])
+
+    def _start_worker(self) -> None:
+        if self._worker is not None:
+            return
+
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="provider_usage_counter", daemon=True)
+                self._worker.start()
+
+    def _work(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write provider usage counters")
+
+    @staticmethod
+    def _quota_key(tenant_id: str, provider_name: str, quota_type: ProviderQuotaType) -> str:
+        return f"{_KEY_PREFIX}:quota:{tenant_id}:{provider_name}:{quota_type.value}"
+
+
+_provider_usage_counter: Optional[ProviderUsageCounter] = None
+_provider_usage_counter_lock = threading.Lock()
+
+
+def get_provider_usage_counter() -> ProviderUsageCounter:
+    global _provider_usage_counter
+    if _provider_usage_counter is None:
+        with _provider_usage_counter_lock:
+            if _provider_usage_counter is None:
+                _provider_usage_counter = ProviderUsageCounter(
+                    engine=db.engine, flush_interval=dify_config.PROVIDER_USAGE_FLUSH_INTERVAL
+                )
+    return _provider_usage_counter
+
+
+def _reset_counter() -> None:
+    # the flush thread does not survive a fork
+    global _provider_usage_counter, _provider_usage_counter_lock
+    _provider_usage_counter = None
+    _provider_usage_counter_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_counter)
+
+
+def deduct_provider_quota(
+    tenant_id: str, provider_name: str, quota_configuration: QuotaConfiguration, amount: int
+) -> None:
+    """
+    Deduct quota of a hosted provider, counted in redis if PROVIDER_USAGE_COUNTER_ENABLED.
+
+    :param tenant_id: workspace id
+    :param provider_name: provider name
+    :param quota_configuration: configuration of the quota in use
+    :param amount: quota to deduct
+    """
+    if dify_config.PROVIDER_USAGE_COUNTER_ENABLED:
+        result = get_provider_usage_counter().deduct_quota(
+            tenant_id=tenant_id,
+            provider_name=provider_name,
+            quota_type=quota_configuration.quota_type,
+            amount=amount,
+        )
+        if result is None:
+            return
+
+        used, limit, deducted = result
+        exhausted = not deducted or used >= limit
+    else:
+        updated = (
+            db.session.query(Provider)
+            .filter(
+                Provider.tenant_id == tenant_id,
+                Provider.provider_name == provider_name,
+                Provider.provider_type == ProviderType.SYSTEM.value,
+                Provider.quota_type == quota_configuration.quota_type.value,
+                Provider.quota_limit > Provider.quota_used,
+            )
+            .update({"quota_used": Provider.quota_used + amount})
+        )
+        db.session.commit()
+        exhausted = not updated or quota_configuration.quota_used + amount >= quota_configuration.quota_limit
+
+    # the cached provider configurations see the quota as valid until they are reloaded
+    if exhausted:
+        ProviderConfigurationsVersion(tenant_id).bump()
+
+
+def update_provider_last_used(tenant_id: str, provider_name: str) -> None:
+    """
+    Record the use of a provider, counted in redis if PROVIDER_USAGE_COUNTER_ENABLED.
+
+    :param tenant_id: workspace id
+    :param provider_name: provider name
+    """
+    if dify_config.PROVIDER_USAGE_COUNTER_ENABLED:
+        get_provider_usage_counter().touch(tenant_id, provider_name)
+        return
+
+    db.session.query(Provider).filter(
+        Provider.tenant_id == tenant_id,
+        Provider.provider_name == provider_name,
+    ).update({"last_used": datetime.now(UTC).replace(tzinfo=None)})
+    db.session.commit()
@@ -3,7 +3,11 @@ Proxy requests to avoid SSRF
 """
 
 import logging
+import os
+import threading
 import time
+from http.cookiejar import CookieJar
+from typing import Any, Optional
 
 import httpx
 
@@ -21,6 +25,128 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
+class _NoPersistCookieJar(CookieJar):
+    """Cookie jar of the shared clients, cookies set by one response must not be sent with other requests."""
+
+    def set_cookie(self, cookie):
+        pass
+
+    def extract_cookies(self, response, request):
+        pass
+
+
+class _HostLimiter:
+    """Limits the number of concurrent requests per host, entries only exist while a host has requests in flight."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._in_flight: dict[str, int] = {}
+        self.waits = 0
+
+    def acquire(self, host: str, limit: int, timeout: Optional[float]) -> None:
+        with self._condition:
+            if self._in_flight.get(host, 0) >= limit:
+                self.waits += 1
+                if not self._condition.wait_for(lambda: self._in_flight.get(host, 0) < limit, timeout=timeout):
+                    raise httpx.PoolTimeout(f"Timed out waiting for a connection to {host}")
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+
+    def release(self, host: str) -> None:
+        with self._condition:
+            self._in_flight[host] -= 1
+            if not self._in_flight[host]:
+                del self._in_flight[host]
+            self._condition.notify_all()
+
+
+_clients: dict[tuple[Optional[str], ...], httpx.Client] = {}
+_clients_lock = threading.Lock()
+_host_limiter = _HostLimiter()
+_stats_lock = threading.Lock()
+_request_count = 0
+
+
+def _get_client() -> httpx.Client:
+    """
+    Get the long-lived client of the current proxy configuration, its connections are kept alive between requests.
+    """
+    proxy_config = (
+        dify_config.SSRF_PROXY_ALL_URL,
+        dify_config.SSRF_PROXY_HTTP_URL,
+        dify_config.SSRF_PROXY_HTTPS_URL,
+    )
+    client = _clients.get(proxy_config)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(proxy_config)
+        if client is not None:
+            return client
+
+        limits = httpx.Limits(
+            max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+        )
+        http2 = dify_config.SSRF_POOL_HTTP2_ENABLED
+        cookies = _NoPersistCookieJar()
+        if dify_config.SSRF_PROXY_ALL_URL:
+            client = httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL, limits=limits, http2=http2, cookies=cookies)
+        elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
+            proxy_mounts = {
+                "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL, limits=limits, http2=http2),
+                "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL, limits=limits, http2=http2),
+            }
+            client = httpx.Client(mounts=proxy_mounts, limits=limits, http2=http2, cookies=cookies)
+        else:
+            client = httpx.Client(limits=limits, http2=http2, cookies=cookies)
+        _clients[proxy_config] = client
+        return client
+
+
+def _reset_clients() -> None:
+    # connections must not be shared with forked worker processes
+    global _clients_lock, _host_limiter
+    _clients.clear()
+    _clients_lock = threading.Lock()
+    _host_limiter = _HostLimiter()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_clients)
+
+
+def _request(client: httpx.Client, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    global _request_count
+    with _stats_lock:
+        _request_count += 1
+
+    limit = dify_config.SSRF_POOL_MAX_CONNECTIONS_PER_HOST
+    if not limit:
+        return client.request(method=method, url=url, **kwargs)
+
+    host = httpx.URL(url).netloc.decode("ascii")
+    timeout = httpx.Timeout(kwargs.get("timeout"))
+    _host_limiter.acquire(host, limit, timeout.pool or timeout.connect)
+    try:
+        return client.request(method=method, url=url, **kwargs)
+    finally:
+        _host_limiter.release(host)
+
+
+def get_pool_stats() -> dict[str, Any]:
+    """
+    Get statistics of the shared clients, for monitoring.
+    Connection counts are left out, httpx does not expose its connection pools.
+    """
+    pools = [
+        {"proxy": "all" if proxy_config[0] else "http_https" if proxy_config[1] and proxy_config[2] else "none"}
+        for proxy_config in list(_clients)
+    ]
+    return {"pools": pools, "requests": _request_count, "host_limit_waits": _host_limiter.waits}
+
+
 def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
@@ -39,19 +165,7 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     stream = kwargs.pop("stream", False)
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL),
-                }
-                with httpx.Client(mounts=proxy_mounts) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client() as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            response = _request(_get_client(), method, url, **kwargs)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
@@ -0,0 +1,92 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any, Generic, Optional, TypeVar
+
+
+class WorkItem:
+    """A task submitted to a thread pool, completing its future when run."""
+
+    def __init__(self, tenant_id: str, future: Future, fn: Callable, args: tuple, kwargs: dict[str, Any]) -> None:
+        self.tenant_id = tenant_id
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self) -> bool:
+        """
+        Run the task unless its future was cancelled.
+
+        :return: whether the task ran
+        """
+        if not self.future.set_running_or_notify_cancel():
+            return False
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+        return True
+
+
+WorkItemT = TypeVar("WorkItemT", bound=WorkItem)
+
+
+class TenantFairQueue(Generic[WorkItemT]):
+    """
+    Queue of work items per tenant, taken round-robin across tenants so one tenant submitting many tasks
+    does not starve the others.
+
+    Not thread-safe, the pools using it guard it with their own lock.
+    """
+
+    def __init__(self) -> None:
+        self._tenant_queues: dict[str, deque[WorkItemT]] = {}
+        self._ready_tenants: deque[str] = deque()
+        self._depth = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return self._depth
+
+    @property
+    def tenant_count(self) -> int:
+        return len(self._tenant_queues)
+
+    def put(self, item: WorkItemT) -> None:
+        queue = self._tenant_queues.get(item.tenant_id)
+        if queue is None:
+            queue = self._tenant_queues[item.tenant_id] = deque()
+            self._ready_tenants.append(item.tenant_id)
+        queue.append(item)
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+
+    def take(self, can_start: Optional[Callable[[WorkItemT], bool]] = None) -> Optional[WorkItemT]:
+        """
+        Take the oldest item of the next tenant in turn.
+
+        :param can_start: only take items it accepts, tenants without such an item are skipped
+        :return: the item, or None if no item can be taken
+        """
+        for _ in range(len(self._ready_tenants)):
+            tenant_id = self._ready_tenants.popleft()
+            queue = self._tenant_queues[tenant_id]
+            index: Optional[int] = 0
+            if can_start is not None:
+                index = next((i for i, item in enumerate(queue) if can_start(item)), None)
+            if index is None:
+                self._ready_tenants.append(tenant_id)
+                continue
+
+            item = queue[index]
+            del queue[index]
+            if queue:
+                self._ready_tenants.append(tenant_id)
+            else:
+                del self._tenant_queues[tenant_id]
+            self._depth -= 1
+            return item
+        return None
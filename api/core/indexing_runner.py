@@ -1,25 +1,31 @@
 import concurrent.futures
 import datetime
+import itertools
 import json
 import logging
 import re
 import threading
 import time
 import uuid
-from typing import Any, Optional, cast
+from collections import deque
+from collections.abc import Callable, Generator, Iterator
+from typing import Any, Optional
 
 from flask import current_app
 from flask_login import current_user  # type: ignore
+from sqlalchemy import func
 from sqlalchemy.orm.exc import ObjectDeletedError
 
 from configs import dify_config
 from core.entities.knowledge_entities import IndexingEstimate, PreviewDetail, QAPreviewDetail
 from core.errors.error import ProviderTokenNotInitError
+from core.helper.indexing_slots import hold_indexing_slots, indexing_scheduler_stats
 from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
 from core.rag.docstore.dataset_docstore import DatasetDocumentStore
+from core.rag.embedding.embedding_batcher import embedding_batcher
 from core.rag.extractor.entity.extract_setting import ExtractSetting
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.index_processor.index_processor_base import BaseIndexProcessor
@@ -38,66 +44,104 @@ from libs import helper
 from models.dataset import ChildChunk, Dataset, DatasetProcessRule, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from models.model import UploadFile
+from services.entities.knowledge_entities.knowledge_entities import ParentMode
 from services.feature_service import FeatureService
 
+# lanes loading the chunks of a document
+_MAX_LANES = 10
+
 
 class IndexingRunner:
     def __init__(self):
         self.storage = storage
         self.model_manager = ModelManager()
+        # documents indexed at once by the run, they share the database connections of the process
+        self._concurrent_documents = 1
 
     def run(self, dataset_documents: list[DatasetDocument]):
-        """Run the indexing process."""
-        for dataset_document in dataset_documents:
-            try:
-                # get dataset
-                dataset = Dataset.query.filter_by(id=dataset_document.dataset_id).first()
+        """Run the indexing process, indexing the documents concurrently."""
+        max_workers = min(len(dataset_documents), dify_config.INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_DATASET)
+        self._concurrent_documents = max(max_workers, 1)
+        if max_workers <= 1:
+            for dataset_document in dataset_documents:
+                self._run_scheduled(dataset_document)
+        else:
+            flask_app = current_app._get_current_object()  # type: ignore
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(self._run_in_app_context, flask_app, dataset_document.id)
+                    for dataset_document in dataset_documents
+                ]
+            # the documents paused do not stop the indexing of the others
+            for future in futures:
+                future.result()
+        logging.info(
+            "indexing scheduler: %s, embedding batcher: %s",
+            indexing_scheduler_stats.snapshot(),
+            embedding_batcher.snapshot() if embedding_batcher else None,
+        )
 
-                if not dataset:
-                    raise ValueError("no dataset found")
+    def _run_in_app_context(self, flask_app, dataset_document_id: str):
+        with flask_app.app_context():
+            dataset_document = (
+                db.session.query(DatasetDocument).filter(DatasetDocument.id == dataset_document_id).first()
+            )
+            if dataset_document:
+                self._run_scheduled(dataset_document)
 
-                # get the process rule
-                processing_rule = (
-                    db.session.query(DatasetProcessRule)
-                    .filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
-                    .first()
-                )
-                if not processing_rule:
-                    raise ValueError("no process rule found")
-                index_type = dataset_document.doc_form
-                index_processor = IndexProcessorFactory(index_type).init_index_processor()
-                # extract
-                text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-                # transform
-                documents = self._transform(
-                    index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-                )
-                # save segment
-                self._load_segments(dataset, dataset_document, documents)
-
-                # load
-                self._load(
-                    index_processor=index_processor,
-                    dataset=dataset,
-                    dataset_document=dataset_document,
-                    documents=documents,
-                )
+    def _run_scheduled(self, dataset_document: DatasetDocument):
+        """Run the indexing process of a document once a slot of its dataset and of its tenant is free."""
+        with hold_indexing_slots(dataset_document.tenant_id, dataset_document.dataset_id):
+            indexing_scheduler_stats.incr("running")
+            try:
+                indexed = self._run_document(dataset_document)
             except DocumentIsPausedError:
-                raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
-            except ProviderTokenNotInitError as e:
-                dataset_document.indexing_status = "error"
-                dataset_document.error = str(e.description)
-                dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
-                db.session.commit()
-            except ObjectDeletedError:
-                logging.warning("Document deleted, document id: {}".format(dataset_document.id))
-            except Exception as e:
-                logging.exception("consume document failed")
-                dataset_document.indexing_status = "error"
-                dataset_document.error = str(e)
-                dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
-                db.session.commit()
+                indexing_scheduler_stats.incr("paused")
+                raise
+            finally:
+                indexing_scheduler_stats.incr("running", -1)
+            indexing_scheduler_stats.incr("completed" if indexed else "failed")
+
+    def _run_document(self, dataset_document: DatasetDocument) -> bool:
+        """Run the indexing process of a document, returning whether it was indexed."""
+        try:
+            # get dataset
+            dataset = Dataset.query.filter_by(id=dataset_document.dataset_id).first()
+
+            if not dataset:
+                raise ValueError("no dataset found")
+
+            # get the process rule
+            processing_rule = (
+                db.session.query(DatasetProcessRule)
+                .filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
+                .first()
+            )
+            if not processing_rule:
+                raise ValueError("no process rule found")
+            index_type = dataset_document.doc_form
+            index_processor = IndexProcessorFactory(index_type).init_index_processor()
+            # extract, transform, save segments and load
+            self._run_pipeline(index_processor, dataset, dataset_document, processing_rule.to_dict())
+            return True
+        except DocumentIsPausedError:
+            raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
+        except ProviderTokenNotInitError as e:
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e.description)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+            return False
+        except ObjectDeletedError:
+            logging.warning("Document deleted, document id: {}".format(dataset_document.id))
+            return False
+        except Exception as e:
+            logging.exception("consume document failed")
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+            return False
 
     def run_in_splitting_status(self, dataset_document: DatasetDocument):
         """Run the indexing process when the index_status is splitting."""
@@ -108,11 +152,19 @@ class IndexingRunner:
             if not dataset:
                 raise ValueError("no dataset found")
 
+            index_type = dataset_document.doc_form
+            index_processor = IndexProcessorFactory(index_type).init_index_processor()
+
             # get exist document_segment list and delete
             document_segments = DocumentSegment.query.filter_by(
                 dataset_id=dataset.id, document_id=dataset_document.id
             ).all()
 
+            # the batches loaded before the indexing stopped left their segments in the index
+            index_node_ids = [document_segment.index_node_id for document_segment in document_segments]
+            if index_node_ids:
+                index_processor.clean(dataset, index_node_ids, with_keywords=True, delete_child_chunks=True)
+
             for document_segment in document_segments:
                 db.session.delete(document_segment)
                 if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
@@ -128,22 +180,8 @@ class IndexingRunner:
             if not processing_rule:
                 raise ValueError("no process rule found")
 
-            index_type = dataset_document.doc_form
-            index_processor = IndexProcessorFactory(index_type).init_index_processor()
-            # extract
-            text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-            # transform
-            documents = self._transform(
-                index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-            )
-            # save segment
-            self._load_segments(dataset, dataset_document, documents)
-
-            # load
-            self._load(
-                index_processor=index_processor, dataset=dataset, dataset_document=dataset_document, documents=documents
-            )
+            # extract, transform, save segments and load
+            self._run_pipeline(index_processor, dataset, dataset_document, processing_rule.to_dict())
         except DocumentIsPausedError:
             raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
         except ProviderTokenNotInitError as e:
@@ -327,15 +365,18 @@ class IndexingRunner:
             return IndexingEstimate(total_segments=total_segments * 20, qa_preview=preview_texts, preview=[])
         return IndexingEstimate(total_segments=total_segments, preview=preview_texts)  # type: ignore
 
-    def _extract(
+    def _extract_iter(
         self, index_processor: BaseIndexProcessor, dataset_document: DatasetDocument, process_rule: dict
-    ) -> list[Document]:
+    ) -> Generator[Document, None, None]:
+        """
+        Lazily extract the pages of the document.
+        """
         # load file
         if dataset_document.data_source_type not in {"upload_file", "notion_import", "website_crawl"}:
-            return []
+            return
 
         data_source_info = dataset_document.data_source_info_dict
-        text_docs = []
+        text_docs: Iterator[Document] = iter([])
         if dataset_document.data_source_type == "upload_file":
             if not data_source_info or "upload_file_id" not in data_source_info:
                 raise ValueError("no upload file found")
@@ -348,7 +389,7 @@ class IndexingRunner:
                 extract_setting = ExtractSetting(
                     datasource_type="upload_file", upload_file=file_detail, document_model=dataset_document.doc_form
                 )
-                text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
+                text_docs = index_processor.extract_iter(extract_setting, process_rule_mode=process_rule["mode"])
         elif dataset_document.data_source_type == "notion_import":
             if (
                 not data_source_info
@@ -367,7 +408,7 @@ class IndexingRunner:
                 },
                 document_model=dataset_document.doc_form,
             )
-            text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
+            text_docs = index_processor.extract_iter(extract_setting, process_rule_mode=process_rule["mode"])
         elif dataset_document.data_source_type == "website_crawl":
             if (
                 not data_source_info
@@ -388,25 +429,13 @@ class IndexingRunner:
                 },
                 document_model=dataset_document.doc_form,
             )
-            text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
-        # update document status to splitting
-        self._update_document_index_status(
-            document_id=dataset_document.id,
-            after_indexing_status="splitting",
-            extra_update_params={
-                DatasetDocument.word_count: sum(len(text_doc.page_content) for text_doc in text_docs),
-                DatasetDocument.parsing_completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-            },
-        )
-
+            text_docs = index_processor.extract_iter(extract_setting, process_rule_mode=process_rule["mode"])
         # replace doc id to document model id
-        text_docs = cast(list[Document], text_docs)
         for text_doc in text_docs:
             if text_doc.metadata is not None:
                 text_doc.metadata["document_id"] = dataset_document.id
                 text_doc.metadata["dataset_id"] = dataset_document.dataset_id
-
-        return text_docs
+            yield text_doc
 
     @staticmethod
     def filter_string(text):
@@ -616,17 +645,21 @@ class IndexingRunner:
             # check document is paused
             self._check_document_paused_status(dataset_document.id)
 
-            tokens = 0
-            if embedding_model_instance:
-                tokens += sum(
-                    embedding_model_instance.get_text_embedding_num_tokens([document.page_content])
-                    for document in chunk_documents
-                )
-
             # load index
             index_processor.load(dataset, chunk_documents, with_keywords=False)
 
             document_ids = [document.metadata["doc_id"] for document in chunk_documents]
+            # the tokens of the segments were counted when they were saved, do not count them twice
+            tokens = 0
+            if embedding_model_instance:
+                tokens = (
+                    db.session.query(func.coalesce(func.sum(DocumentSegment.tokens), 0))
+                    .filter(
+                        DocumentSegment.document_id == dataset_document.id,
+                        DocumentSegment.index_node_id.in_(document_ids),
+                    )
+                    .scalar()
+                )
             db.session.query(DocumentSegment).filter(
                 DocumentSegment.document_id == dataset_document.id,
                 DocumentSegment.dataset_id == dataset.id,
@@ -673,13 +706,20 @@ class IndexingRunner:
         DatasetDocument.query.filter_by(id=document_id).update(update_params)
         db.session.commit()
 
-    @staticmethod
-    def _update_segments_by_document(dataset_document_id: str, update_params: dict) -> None:
-        """
-        Update the document segment by document id.
-        """
-        DocumentSegment.query.filter_by(document_id=dataset_document_id).update(update_params)
-        db.session.commit()
+    def _get_embedding_model_instance(self, dataset: Dataset) -> Optional[ModelInstance]:
+        if dataset.indexing_technique != "high_quality":
+            return None
+        if dataset.embedding_model_provider:
+            return self.model_manager.get_model_instance(
+                tenant_id=dataset.tenant_id,
+                provider=dataset.embedding_model_provider,
+                model_type=ModelType.TEXT_EMBEDDING,
+                model=dataset.embedding_model,
+            )
+        return self.model_manager.get_default_model_instance(
+            tenant_id=dataset.tenant_id,
+            model_type=ModelType.TEXT_EMBEDDING,
+        )
 
     def _transform(
         self,
@@ -688,23 +728,8 @@ class IndexingRunner:
         text_docs: list[Document],
         doc_language: str,
         process_rule: dict,
+        embedding_model_instance: Optional[ModelInstance],
     ) -> list[Document]:
-        # get embedding model instance
-        embedding_model_instance = None
-        if dataset.indexing_technique == "high_quality":
-            if dataset.embedding_model_provider:
-                embedding_model_instance = self.model_manager.get_model_instance(
-                    tenant_id=dataset.tenant_id,
-                    provider=dataset.embedding_model_provider,
-                    model_type=ModelType.TEXT_EMBEDDING,
-                    model=dataset.embedding_model,
-                )
-            else:
-                embedding_model_instance = self.model_manager.get_default_model_instance(
-                    tenant_id=dataset.tenant_id,
-                    model_type=ModelType.TEXT_EMBEDDING,
-                )
-
         documents = index_processor.transform(
             text_docs,
             embedding_model_instance=embedding_model_instance,
@@ -715,35 +740,211 @@ class IndexingRunner:
 
         return documents
 
-    def _load_segments(self, dataset, dataset_document, documents):
-        # save node to document segment
+    def _save_segments(
+        self, doc_store: DatasetDocumentStore, dataset_document: DatasetDocument, documents: list[Document]
+    ) -> None:
+        # add document segments
+        doc_store.add_documents(docs=documents, save_child=dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX)
+
+        # update the status of the segments saved to indexing
+        document_ids = [document.metadata["doc_id"] for document in documents]
+        DocumentSegment.query.filter(
+            DocumentSegment.document_id == dataset_document.id,
+            DocumentSegment.index_node_id.in_(document_ids),
+        ).update(
+            {
+                DocumentSegment.status: "indexing",
+                DocumentSegment.indexing_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+    def _lane_count(self) -> int:
+        """
+        Get the number of lanes loading the chunks of a document.
+
+        Besides its lanes, each document indexed at once holds a session and a keyword thread, and the run holds a
+        session of its own, so the lanes of all the documents fit in the database pool of the process.
+        """
+        if not dify_config.SQLALCHEMY_POOL_SIZE:
+            # the pool is not limited
+            return _MAX_LANES
+        connections = dify_config.SQLALCHEMY_POOL_SIZE + dify_config.SQLALCHEMY_MAX_OVERFLOW
+        return max(1, min(_MAX_LANES, (connections - 1) // self._concurrent_documents - 2))
+
+    def _run_pipeline(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        process_rule: dict,
+    ) -> None:
+        """
+        Extract, transform, save and load the document in batches of pages.
+
+        The chunks of a batch are embedded and loaded in the background while the next batches are extracted and
+        split, and at most INDEXING_MAX_PENDING_BATCHES batches are waiting to be loaded, so only a bounded number
+        of pages and chunks are kept in memory whatever the size of the document.
+        """
+        flask_app = current_app._get_current_object()  # type: ignore
+        embedding_model_instance = self._get_embedding_model_instance(dataset)
         doc_store = DatasetDocumentStore(
             dataset=dataset, user_id=dataset_document.created_by, document_id=dataset_document.id
         )
+        with_keywords = dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX
+        batch_size: Optional[int] = dify_config.INDEXING_PAGE_BATCH_SIZE
+        if (process_rule.get("rules") or {}).get("parent_mode") == ParentMode.FULL_DOC:
+            # the whole document is a single parent chunk
+            batch_size = None
 
-        # add document segments
-        doc_store.add_documents(docs=documents, save_child=dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX)
+        stats = _IndexingStats()
+        indexing_start_at = time.perf_counter()
+        word_count = 0
+        tokens = 0
+        pending: deque[list[concurrent.futures.Future]] = deque()
+        # Distribute documents into multiple lanes based on the hash values of page_content
+        # This is done to prevent multiple threads from processing the same document,
+        # Thereby avoiding potential database insertion deadlocks
+        lanes = [concurrent.futures.ThreadPoolExecutor(max_workers=1) for _ in range(self._lane_count())]
+        keyword_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        pages = self._extract_iter(index_processor, dataset_document, process_rule)
+        try:
+            while True:
+                start_at = time.perf_counter()
+                text_docs = list(itertools.islice(pages, batch_size))
+                stats.add("extract", len(text_docs), time.perf_counter() - start_at)
+                if not text_docs:
+                    break
+
+                # update document progress, it stays splitting until all the segments are saved
+                word_count += sum(len(text_doc.page_content) for text_doc in text_docs)
+                self._update_document_index_status(
+                    document_id=dataset_document.id,
+                    after_indexing_status="splitting",
+                    extra_update_params={DatasetDocument.word_count: word_count},
+                )
+
+                start_at = time.perf_counter()
+                documents = self._transform(
+                    index_processor,
+                    dataset,
+                    text_docs,
+                    dataset_document.doc_language,
+                    process_rule,
+                    embedding_model_instance,
+                )
+                stats.add("split", len(documents), time.perf_counter() - start_at)
+                del text_docs
+                if not documents:
+                    continue
+
+                start_at = time.perf_counter()
+                self._save_segments(doc_store, dataset_document, documents)
+                stats.add("save", len(documents), time.perf_counter() - start_at)
+
+                futures = []
+                if with_keywords:
+                    futures.append(
+                        keyword_executor.submit(
+                            stats.timed,
+                            "keyword",
+                            len(documents),
+                            self._process_keyword_index,
+                            flask_app,
+                            dataset.id,
+                            dataset_document.id,
+                            documents,
+                        )
+                    )
+                if dataset.indexing_technique == "high_quality":
+                    document_groups: list[list[Document]] = [[] for _ in lanes]
+                    for document in documents:
+                        hash = helper.generate_text_hash(document.page_content)
+                        document_groups[int(hash, 16) % len(lanes)].append(document)
+                    for lane, chunk_documents in zip(lanes, document_groups):
+                        if not chunk_documents:
+                            continue
+                        futures.append(
+                            lane.submit(
+                                stats.timed,
+                                "index",
+                                len(chunk_documents),
+                                self._process_chunk,
+                                flask_app,
+                                index_processor,
+                                chunk_documents,
+                                dataset,
+                                dataset_document,
+                                embedding_model_instance,
+                            )
+                        )
+                pending.append(futures)
+                while len(pending) >= dify_config.INDEXING_MAX_PENDING_BATCHES:
+                    tokens += sum(future.result() or 0 for future in pending.popleft())
+
+            cur_time = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            self._update_document_index_status(
+                document_id=dataset_document.id,
+                after_indexing_status="indexing",
+                extra_update_params={
+                    DatasetDocument.parsing_completed_at: cur_time,
+                    DatasetDocument.cleaning_completed_at: cur_time,
+                    DatasetDocument.splitting_completed_at: cur_time,
+                },
+            )
+
+            while pending:
+                tokens += sum(future.result() or 0 for future in pending.popleft())
+        finally:
+            pages.close()
+            for executor in [*lanes, keyword_executor]:
+                executor.shutdown(wait=True, cancel_futures=True)
+        indexing_end_at = time.perf_counter()
+        logging.info("indexing document %s, %s", dataset_document.id, stats.summary())
 
-        # update document status to indexing
-        cur_time = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        # update document status to completed
         self._update_document_index_status(
             document_id=dataset_document.id,
-            after_indexing_status="indexing",
+            after_indexing_status="completed",
             extra_update_params={
-                DatasetDocument.cleaning_completed_at: cur_time,
-                DatasetDocument.splitting_completed_at: cur_time,
+                DatasetDocument.tokens: tokens,
+                DatasetDocument.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
+                DatasetDocument.error: None,
             },
         )
 
-        # update segment status to indexing
-        self._update_segments_by_document(
-            dataset_document_id=dataset_document.id,
-            update_params={
-                DocumentSegment.status: "indexing",
-                DocumentSegment.indexing_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-            },
-        )
-        pass
+
+class _IndexingStats:
+    """
+    Thread safe counters of the items processed by each stage of the indexing pipeline and of the time spent.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._items: dict[str, int] = {}
+        self._seconds: dict[str, float] = {}
+
+    def add(self, stage: str, items: int, seconds: float) -> None:
+        with self._lock:
+            self._items[stage] = self._items.get(stage, 0) + items
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+
+    def timed(self, stage: str, items: int, func: Callable[..., Any], *args: Any) -> Any:
+        start_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add(stage, items, time.perf_counter() - start_at)
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(
+                f"{stage}: {items} in {self._seconds[stage]:.2f}s "
+                f"({items / self._seconds[stage] if self._seconds[stage] else 0:.1f}/s)"
+                for stage, items in self._items.items()
+            )
 
 
 class DocumentIsPausedError(Exception):
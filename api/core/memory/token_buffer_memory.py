@@ -1,8 +1,11 @@
+import hashlib
+import logging
+from collections import defaultdict
 from collections.abc import Sequence
-from typing import Optional
+from typing import Any, Optional
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -15,9 +18,15 @@ from core.model_runtime.entities import (
 )
 from core.prompt.utils.extract_thread_messages import extract_thread_messages
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from factories import file_factory
 from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.workflow import Workflow, WorkflowRun
+
+logger = logging.getLogger(__name__)
+
+# token counts only depend on the model and the message content
+MESSAGE_NUM_TOKENS_CACHE_TTL = 24 * 60 * 60
 
 
 class TokenBufferMemory:
@@ -68,24 +77,26 @@ class TokenBufferMemory:
 
         messages = list(reversed(thread_messages))
 
+        # load the files of the whole thread at once
+        message_files: dict[str, list[MessageFile]] = defaultdict(list)
+        if messages:
+            files = (
+                db.session.query(MessageFile)
+                .filter(MessageFile.message_id.in_([message.id for message in messages]))
+                .all()
+            )
+            for message_file in files:
+                message_files[message_file.message_id].append(message_file)
+
+        file_extra_configs = self._get_file_extra_configs(
+            [message for message in messages if message.id in message_files]
+        )
+
         prompt_messages: list[PromptMessage] = []
         for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
+            files = message_files.get(message.id, [])
             if files:
-                file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
-
+                file_extra_config = file_extra_configs.get(message.id)
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
                     file_objs = file_factory.build_from_message_files(
@@ -122,13 +133,113 @@ class TokenBufferMemory:
         curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
 
         if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+            prompt_messages = self._prune_prompt_messages(prompt_messages, curr_message_tokens, max_token_limit)
+
+        return prompt_messages
+
+    def _get_file_extra_configs(self, messages: Sequence[Any]) -> dict[str, Optional[FileUploadConfig]]:
+        """
+        Get the file upload config of each message with files, loading the workflows of the thread at once.
+        """
+        if not messages:
+            return {}
+
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+            return {message.id: file_extra_config for message in messages}
+
+        workflow_run_ids = {message.workflow_run_id for message in messages if message.workflow_run_id}
+        workflow_ids: dict[str, str] = {}
+        workflow_configs: dict[str, Optional[FileUploadConfig]] = {}
+        if workflow_run_ids:
+            workflow_runs = (
+                db.session.query(WorkflowRun.id, WorkflowRun.workflow_id)
+                .filter(WorkflowRun.id.in_(workflow_run_ids))
+                .all()
+            )
+            workflow_ids = {workflow_run.id: workflow_run.workflow_id for workflow_run in workflow_runs}
+        if workflow_ids:
+            workflows = db.session.query(Workflow).filter(Workflow.id.in_(set(workflow_ids.values()))).all()
+            workflow_configs = {
+                workflow.id: FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
+                for workflow in workflows
+            }
+
+        return {
+            message.id: workflow_configs.get(workflow_ids.get(message.workflow_run_id, ""))
+            for message in messages
+            if message.workflow_run_id
+        }
+
+    def _prune_prompt_messages(
+        self, prompt_messages: list[PromptMessage], curr_message_tokens: int, max_token_limit: int
+    ) -> list[PromptMessage]:
+        """
+        Drop the oldest prompt messages until the rest fits into the max token limit.
+
+        The token count of each message is cached, the fixed overhead counted once per request is
+        derived from the total, and the prefix to drop is found in a single pass. Tokenizers are not
+        always additive, so the result is verified once and pruned message by message if still too long.
+        """
+        message_tokens = self._get_message_num_tokens(prompt_messages)
+        # every single message count includes the per-request overhead that the total only includes once
+        overhead = (sum(message_tokens) - curr_message_tokens) / (len(prompt_messages) - 1)
+
+        tokens = float(curr_message_tokens)
+        pruned_count = 0
+        for count in message_tokens[:-1]:
+            if tokens <= max_token_limit:
+                break
+            tokens -= count - overhead
+            pruned_count += 1
+        prompt_messages = prompt_messages[pruned_count:]
+
+        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
+            prompt_messages.pop(0)
+            curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
 
         return prompt_messages
 
+    def _get_message_num_tokens(self, prompt_messages: list[PromptMessage]) -> list[int]:
+        """
+        Get the token count of each prompt message, cached in redis by model and message content.
+        """
+        cache_keys = [
+            "message_num_tokens:{}:{}:{}".format(
+                self.model_instance.provider,
+                self.model_instance.model,
+                hashlib.sha256(prompt_message.model_dump_json().encode()).hexdigest(),
+            )
+            for prompt_message in prompt_messages
+        ]
+        try:
+            cached_counts = redis_client.mget(cache_keys)
+        except Exception:
+            logger.exception("Failed to get cached message token counts")
+            cached_counts = [None] * len(cache_keys)
+
+        message_tokens = []
+        new_counts = {}
+        for prompt_message, cache_key, cached_count in zip(prompt_messages, cache_keys, cached_counts):
+            if cached_count is not None:
+                message_tokens.append(int(cached_count))
+                continue
+            count = self.model_instance.get_llm_num_tokens([prompt_message])
+            message_tokens.append(count)
+            new_counts[cache_key] = count
+
+        if new_counts:
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for cache_key, count in new_counts.items():
+                    pipeline.setex(cache_key, MESSAGE_NUM_TOKENS_CACHE_TTL, count)
+                pipeline.execute()
+            except Exception:
+                logger.exception("Failed to cache message token counts")
+
+        return message_tokens
+
     def get_history_prompt_text(
         self,
         human_prefix: str = "Human",
@@ -213,6 +213,27 @@ class ModelInstance:
             ),
         )
 
+    def get_text_embedding_num_tokens_batch(self, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens of each text for text embedding, counted in one pass
+
+        :param texts: texts to embed
+        :return: number of tokens of each text
+        """
+        if not isinstance(self.model_type_instance, TextEmbeddingModel):
+            raise Exception("Model type instance is not TextEmbeddingModel")
+
+        self.model_type_instance = cast(TextEmbeddingModel, self.model_type_instance)
+        return cast(
+            list[int],
+            self._round_robin_invoke(
+                function=self.model_type_instance.get_num_tokens_batch,
+                model=self.model,
+                credentials=self.credentials,
+                texts=texts,
+            ),
+        )
+
     def invoke_rerank(
         self,
         query: str,
@@ -345,7 +366,7 @@ class ModelInstance:
             try:
                 if "credentials" in kwargs:
                     del kwargs["credentials"]
-                return function(*args, **kwargs, credentials=lb_config.credentials)
+                return function(*args, **kwargs, credentials=lb_config.credentials.copy())
             except InvokeRateLimitError as e:
                 # expire in 60 seconds
                 self.load_balancing_manager.cooldown(lb_config, expire=60)
@@ -449,15 +470,21 @@ class LBModelManager:
         self._provider = provider
         self._model_type = model_type
         self._model = model
-        self._load_balancing_configs = load_balancing_configs
+        self._load_balancing_configs = []
 
-        for load_balancing_config in self._load_balancing_configs[:]:  # Iterate over a shallow copy of the list
+        # the configurations are shared by the cached provider configurations, copy instead of changing them
+        for load_balancing_config in load_balancing_configs:
             if load_balancing_config.name == "__inherit__":
                 if not managed_credentials:
                     # remove __inherit__ if managed credentials is not provided
-                    self._load_balancing_configs.remove(load_balancing_config)
-                else:
-                    load_balancing_config.credentials = managed_credentials
+                    continue
+
+                load_balancing_config = load_balancing_config.model_copy(update={"credentials": managed_credentials})
+            self._load_balancing_configs.append(load_balancing_config)
+
+    @property
+    def configs_count(self) -> int:
+        return len(self._load_balancing_configs)
 
     def fetch_next(self) -> Optional[ModelLoadBalancingConfiguration]:
         """
@@ -332,3 +332,12 @@ class AIModel(ABC):
         :return: number of tokens
         """
         return GPT2Tokenizer.get_num_tokens(text)
+
+    def _get_num_tokens_by_gpt2_batch(self, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens of each text by gpt2, in one pass over the texts
+
+        :param texts: plain texts
+        :return: number of tokens of each text
+        """
+        return GPT2Tokenizer.get_num_tokens_batch(texts)
@@ -78,6 +78,20 @@ class TextEmbeddingModel(AIModel):
         """
         raise NotImplementedError
 
+    def get_num_tokens_batch(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens of each text
+
+        Models counting tokens with a local tokenizer or with a tokenize endpoint accepting several texts override it
+        to count all the texts in one pass.
+
+        :param model: model name
+        :param credentials: model credentials
+        :param texts: texts to embed
+        :return: number of tokens of each text
+        """
+        return [self.get_num_tokens(model, credentials, [text]) for text in texts]
+
     def _get_context_size(self, model: str, credentials: dict) -> int:
         """
         Get context size for given embedding model
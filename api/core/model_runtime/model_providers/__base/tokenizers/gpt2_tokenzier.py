@@ -27,6 +27,16 @@ class GPT2Tokenizer:
         # return cast(int, result)
         return GPT2Tokenizer._get_num_tokens_by_gpt2(text)
 
+    @staticmethod
+    def get_num_tokens_batch(texts: list[str]) -> list[int]:
+        """
+        use gpt2 tokenizer to get the num tokens of each text, tiktoken encodes them in parallel on its own threads
+        """
+        _tokenizer = GPT2Tokenizer.get_encoder()
+        if hasattr(_tokenizer, "encode_batch"):
+            return [len(tokens) for tokens in _tokenizer.encode_batch(texts)]
+        return [len(_tokenizer.encode(text)) for text in texts]
+
     @staticmethod
     def get_encoder() -> Any:
         global _tokenizer, _lock
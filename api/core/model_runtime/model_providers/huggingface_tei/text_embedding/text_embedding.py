@@ -126,7 +126,9 @@ class HuggingfaceTeiTextEmbeddingModel(TextEmbeddingModel):
         :param texts: texts to embed
         :return:
         """
-        num_tokens = 0
+        return sum(self.get_num_tokens_batch(model, credentials, texts))
+
+    def get_num_tokens_batch(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
         server_url = credentials["server_url"]
 
         server_url = server_url.removesuffix("/")
@@ -136,8 +138,7 @@ class HuggingfaceTeiTextEmbeddingModel(TextEmbeddingModel):
         }
 
         batch_tokens = TeiHelper.invoke_tokenize(server_url, texts, headers)
-        num_tokens = sum(len(tokens) for tokens in batch_tokens)
-        return num_tokens
+        return [len(tokens) for tokens in batch_tokens]
 
     def validate_credentials(self, model: str, credentials: dict) -> None:
         """
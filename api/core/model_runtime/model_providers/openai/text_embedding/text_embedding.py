@@ -116,21 +116,19 @@ class OpenAITextEmbeddingModel(_CommonOpenAI, TextEmbeddingModel):
         :param texts: texts to embed
         :return:
         """
+        return sum(self.get_num_tokens_batch(model, credentials, texts))
+
+    def get_num_tokens_batch(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
         if len(texts) == 0:
-            return 0
+            return []
 
         try:
             enc = tiktoken.encoding_for_model(model)
         except KeyError:
             enc = tiktoken.get_encoding("cl100k_base")
 
-        total_num_tokens = 0
-        for text in texts:
-            # calculate the number of tokens in the encoded text
-            tokenized_text = enc.encode(text)
-            total_num_tokens += len(tokenized_text)
-
-        return total_num_tokens
+        # calculate the number of tokens in the encoded texts, tiktoken encodes them in parallel
+        return [len(tokenized_text) for tokenized_text in enc.encode_batch(texts)]
 
     def validate_credentials(self, model: str, credentials: dict) -> None:
         """
@@ -122,7 +122,10 @@ class OAICompatEmbeddingModel(_CommonOaiApiCompat, TextEmbeddingModel):
         :param texts: texts to embed
         :return:
         """
-        return sum(self._get_num_tokens_by_gpt2(text) for text in texts)
+        return sum(self._get_num_tokens_by_gpt2_batch(texts))
+
+    def get_num_tokens_batch(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
+        return self._get_num_tokens_by_gpt2_batch(texts)
 
     def validate_credentials(self, model: str, credentials: dict) -> None:
         """
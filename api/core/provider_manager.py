@@ -1,8 +1,13 @@
 import json
+import os
+import threading
+import time
 from collections import defaultdict
+from collections.abc import Iterable
 from json import JSONDecodeError
-from typing import Optional, cast
+from typing import Any, Optional, cast
 
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
@@ -19,8 +24,14 @@ from core.entities.provider_entities import (
     SystemConfiguration,
 )
 from core.helper import encrypter
-from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.lru_cache import LRUCache
+from core.helper.model_provider_cache import (
+    ProviderConfigurationsVersion,
+    ProviderCredentialsCache,
+    ProviderCredentialsCacheType,
+)
 from core.helper.position_helper import is_filtered
+from core.helper.provider_usage_counter import get_provider_usage_counter
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -45,6 +56,65 @@ from models.provider import (
 from services.feature_service import FeatureService
 
 
+class _ProviderConfigurationsSnapshot:
+    """
+    Provider records of a workspace at a version of its provider configurations,
+    the configuration of each provider is built from them on first use.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        version: int,
+        expires_at: float,
+        provider_entities: dict[str, ProviderEntity],
+        provider_records: dict[str, list[Provider]],
+        provider_model_records: dict[str, list[ProviderModel]],
+        preferred_model_provider_records: dict[str, TenantPreferredModelProvider],
+        provider_model_settings: dict[str, list[ProviderModelSetting]],
+        provider_load_balancing_configs: dict[str, list[LoadBalancingModelConfig]],
+    ) -> None:
+        self.tenant_id = tenant_id
+        self.version = version
+        self.expires_at = expires_at
+        self.provider_entities = provider_entities
+        self.provider_records = provider_records
+        self.provider_model_records = provider_model_records
+        self.preferred_model_provider_records = preferred_model_provider_records
+        self.provider_model_settings = provider_model_settings
+        self.provider_load_balancing_configs = provider_load_balancing_configs
+        self.configurations: dict[str, ProviderConfiguration] = {}
+
+
+_snapshots: Optional[LRUCache] = None
+_snapshots_lock = threading.Lock()
+
+
+def _get_snapshots() -> Optional[LRUCache]:
+    """
+    Get the per-process cache of the provider configurations snapshots of the workspaces, None if disabled.
+    """
+    global _snapshots
+    if not dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE:
+        return None
+
+    if _snapshots is None:
+        with _snapshots_lock:
+            if _snapshots is None:
+                _snapshots = LRUCache(capacity=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE)
+    return _snapshots
+
+
+def _reset_snapshots() -> None:
+    global _snapshots, _snapshots_lock
+    _snapshots = None
+    _snapshots_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_snapshots)
+
+
 class ProviderManager:
     """
     ProviderManager is a class that manages the model providers includes Hosting and Customize Model Providers.
@@ -88,112 +158,34 @@ class ProviderManager:
         - Get provider instance
         - Switch selection priority
 
+        The configurations are built from a snapshot of the records of the workspace cached in the process
+        until they are changed, see `_get_snapshot`.
+
         :param tenant_id:
         :return:
         """
-        # Get all provider records of the workspace
-        provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
-
-        # Initialize trial provider records if not exist
-        provider_name_to_provider_records_dict = self._init_trial_provider_records(
-            tenant_id, provider_name_to_provider_records_dict
-        )
-
-        # Get all provider model records of the workspace
-        provider_name_to_provider_model_records_dict = self._get_all_provider_models(tenant_id)
-
-        # Get all provider entities
-        provider_entities = model_provider_factory.get_providers()
-
-        # Get All preferred provider types of the workspace
-        provider_name_to_preferred_model_provider_records_dict = self._get_all_preferred_model_providers(tenant_id)
-
-        # Get All provider model settings
-        provider_name_to_provider_model_settings_dict = self._get_all_provider_model_settings(tenant_id)
-
-        # Get All load balancing configs
-        provider_name_to_provider_load_balancing_model_configs_dict = self._get_all_provider_load_balancing_configs(
-            tenant_id
-        )
+        snapshot = self._get_snapshot(tenant_id)
 
         provider_configurations = ProviderConfigurations(tenant_id=tenant_id)
+        for provider_name in snapshot.provider_entities:
+            provider_configurations[provider_name] = self._get_provider_configuration(snapshot, provider_name)
 
-        # Construct ProviderConfiguration objects for each provider
-        for provider_entity in provider_entities:
-            # handle include, exclude
-            if is_filtered(
-                include_set=cast(set[str], dify_config.POSITION_PROVIDER_INCLUDES_SET),
-                exclude_set=cast(set[str], dify_config.POSITION_PROVIDER_EXCLUDES_SET),
-                data=provider_entity,
-                name_func=lambda x: x.provider,
-            ):
-                continue
-
-            provider_name = provider_entity.provider
-            provider_records = provider_name_to_provider_records_dict.get(provider_entity.provider, [])
-            provider_model_records = provider_name_to_provider_model_records_dict.get(provider_entity.provider, [])
-
-            # Convert to custom configuration
-            custom_configuration = self._to_custom_configuration(
-                tenant_id, provider_entity, provider_records, provider_model_records
-            )
-
-            # Convert to system configuration
-            system_configuration = self._to_system_configuration(tenant_id, provider_entity, provider_records)
-
-            # Get preferred provider type
-            preferred_provider_type_record = provider_name_to_preferred_model_provider_records_dict.get(provider_name)
-
-            if preferred_provider_type_record:
-                preferred_provider_type = ProviderType.value_of(preferred_provider_type_record.preferred_provider_type)
-            elif custom_configuration.provider or custom_configuration.models:
-                preferred_provider_type = ProviderType.CUSTOM
-            elif system_configuration.enabled:
-                preferred_provider_type = ProviderType.SYSTEM
-            else:
-                preferred_provider_type = ProviderType.CUSTOM
-
-            using_provider_type = preferred_provider_type
-            has_valid_quota = any(quota_conf.is_valid for quota_conf in system_configuration.quota_configurations)
-
-            if preferred_provider_type == ProviderType.SYSTEM:
-                if not system_configuration.enabled or not has_valid_quota:
-                    using_provider_type = ProviderType.CUSTOM
-
-            else:
-                if not custom_configuration.provider and not custom_configuration.models:
-                    if system_configuration.enabled and has_valid_quota:
-                        using_provider_type = ProviderType.SYSTEM
-
-            # Get provider load balancing configs
-            provider_model_settings = provider_name_to_provider_model_settings_dict.get(provider_name)
-
-            # Get provider load balancing configs
-            provider_load_balancing_configs = provider_name_to_provider_load_balancing_model_configs_dict.get(
-                provider_name
-            )
-
-            # Convert to model settings
-            model_settings = self._to_model_settings(
-                provider_entity=provider_entity,
-                provider_model_settings=provider_model_settings,
-                load_balancing_model_configs=provider_load_balancing_configs,
-            )
+        # Return the encapsulated object
+        return provider_configurations
 
-            provider_configuration = ProviderConfiguration(
-                tenant_id=tenant_id,
-                provider=provider_entity,
-                preferred_provider_type=preferred_provider_type,
-                using_provider_type=using_provider_type,
-                system_configuration=system_configuration,
-                custom_configuration=custom_configuration,
-                model_settings=model_settings,
-            )
+    def get_provider_configuration(self, tenant_id: str, provider: str) -> Optional[ProviderConfiguration]:
+        """
+        Get the configuration of a model provider, building only the configuration of this provider.
 
-            provider_configurations[provider_name] = provider_configuration
+        :param tenant_id: workspace id
+        :param provider: provider name
+        :return:
+        """
+        snapshot = self._get_snapshot(tenant_id)
+        if provider not in snapshot.provider_entities:
+            return None
 
-        # Return the encapsulated object
-        return provider_configurations
+        return self._get_provider_configuration(snapshot, provider)
 
     def get_provider_model_bundle(self, tenant_id: str, provider: str, model_type: ModelType) -> ProviderModelBundle:
         """
@@ -203,10 +195,7 @@ class ProviderManager:
         :param model_type: model type
         :return:
         """
-        provider_configurations = self.get_configurations(tenant_id)
-
-        # get provider instance
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -346,6 +335,197 @@ class ProviderManager:
 
         return default_model
 
+    def _get_snapshot(self, tenant_id: str) -> _ProviderConfigurationsSnapshot:
+        """
+        Get the snapshot of the provider records of the workspace.
+
+        The snapshot is cached in the process until the version of the provider configurations of the workspace,
+        bumped in redis on each change, is changed or until it expires for the changes made outside of the api.
+
+        :param tenant_id: workspace id
+        :return:
+        """
+        snapshots = _get_snapshots()
+        if snapshots is None:
+            return self._load_snapshot(tenant_id, version=0)
+
+        # read the version before loading the records, a change during the loading bumps it again
+        version = ProviderConfigurationsVersion(tenant_id).get()
+        with _snapshots_lock:
+            snapshot = cast(Optional[_ProviderConfigurationsSnapshot], snapshots.get(tenant_id))
+        if snapshot and snapshot.version == version and snapshot.expires_at > time.monotonic():
+            return snapshot
+
+        snapshot = self._load_snapshot(tenant_id, version=version)
+        with _snapshots_lock:
+            snapshots.put(tenant_id, snapshot)
+
+        return snapshot
+
+    def _load_snapshot(self, tenant_id: str, version: int) -> _ProviderConfigurationsSnapshot:
+        """
+        Load the provider records of the workspace.
+
+        :param tenant_id: workspace id
+        :param version: version of the provider configurations of the workspace
+        :return:
+        """
+        # Get all provider records of the workspace
+        provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
+
+        # Initialize trial provider records if not exist
+        provider_name_to_provider_records_dict = self._init_trial_provider_records(
+            tenant_id, provider_name_to_provider_records_dict
+        )
+
+        # Get all provider model records of the workspace
+        provider_name_to_provider_model_records_dict = self._get_all_provider_models(tenant_id)
+
+        # Get All preferred provider types of the workspace
+        provider_name_to_preferred_model_provider_records_dict = self._get_all_preferred_model_providers(tenant_id)
+
+        # Get All provider model settings
+        provider_name_to_provider_model_settings_dict = self._get_all_provider_model_settings(tenant_id)
+
+        # Get All load balancing configs
+        provider_name_to_provider_load_balancing_model_configs_dict = self._get_all_provider_load_balancing_configs(
+            tenant_id
+        )
+
+        # Get all provider entities, handle include, exclude
+        provider_entities = {
+            provider_entity.provider: provider_entity
+            for provider_entity in model_provider_factory.get_providers()
+            if not is_filtered(
+                include_set=cast(set[str], dify_config.POSITION_PROVIDER_INCLUDES_SET),
+                exclude_set=cast(set[str], dify_config.POSITION_PROVIDER_EXCLUDES_SET),
+                data=provider_entity,
+                name_func=lambda x: x.provider,
+            )
+        }
+
+        snapshot = _ProviderConfigurationsSnapshot(
+            tenant_id=tenant_id,
+            version=version,
+            expires_at=time.monotonic() + dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL,
+            provider_entities=provider_entities,
+            provider_records=provider_name_to_provider_records_dict,
+            provider_model_records=provider_name_to_provider_model_records_dict,
+            preferred_model_provider_records=provider_name_to_preferred_model_provider_records_dict,
+            provider_model_settings=provider_name_to_provider_model_settings_dict,
+            provider_load_balancing_configs=provider_name_to_provider_load_balancing_model_configs_dict,
+        )
+
+        # The records outlive the session of the request, detach them so that its commits do not expire them
+        self._detach_records(
+            record
+            for records_dict in (
+                provider_name_to_provider_records_dict,
+                provider_name_to_provider_model_records_dict,
+                provider_name_to_provider_model_settings_dict,
+                provider_name_to_provider_load_balancing_model_configs_dict,
+            )
+            for records in records_dict.values()
+            for record in records
+        )
+        self._detach_records(provider_name_to_preferred_model_provider_records_dict.values())
+
+        return snapshot
+
+    @staticmethod
+    def _detach_records(records: Iterable[Any]) -> None:
+        """
+        Detach records from the session, reloading the records expired by a commit.
+
+        :param records: records
+        :return:
+        """
+        for record in records:
+            if record is None or record not in db.session:
+                continue
+
+            if sa_inspect(record).expired:
+                db.session.refresh(record)
+            db.session.expunge(record)
+
+    def _get_provider_configuration(
+        self, snapshot: _ProviderConfigurationsSnapshot, provider_name: str
+    ) -> ProviderConfiguration:
+        """
+        Get the configuration of a provider from a snapshot, building it on first use.
+
+        :param snapshot: snapshot of the provider records of the workspace
+        :param provider_name: provider name
+        :return:
+        """
+        provider_configuration = snapshot.configurations.get(provider_name)
+        if provider_configuration:
+            return provider_configuration
+
+        tenant_id = snapshot.tenant_id
+        provider_entity = snapshot.provider_entities[provider_name]
+        provider_records = snapshot.provider_records.get(provider_name, [])
+        provider_model_records = snapshot.provider_model_records.get(provider_name, [])
+
+        # Convert to custom configuration
+        custom_configuration = self._to_custom_configuration(
+            tenant_id, provider_entity, provider_records, provider_model_records
+        )
+
+        # Convert to system configuration
+        system_configuration = self._to_system_configuration(tenant_id, provider_entity, provider_records)
+
+        # Get preferred provider type
+        preferred_provider_type_record = snapshot.preferred_model_provider_records.get(provider_name)
+
+        if preferred_provider_type_record:
+            preferred_provider_type = ProviderType.value_of(preferred_provider_type_record.preferred_provider_type)
+        elif custom_configuration.provider or custom_configuration.models:
+            preferred_provider_type = ProviderType.CUSTOM
+        elif system_configuration.enabled:
+            preferred_provider_type = ProviderType.SYSTEM
+        else:
+            preferred_provider_type = ProviderType.CUSTOM
+
+        using_provider_type = preferred_provider_type
+        has_valid_quota = any(quota_conf.is_valid for quota_conf in system_configuration.quota_configurations)
+
+        if preferred_provider_type == ProviderType.SYSTEM:
+            if not system_configuration.enabled or not has_valid_quota:
+                using_provider_type = ProviderType.CUSTOM
+
+        else:
+            if not custom_configuration.provider and not custom_configuration.models:
+                if system_configuration.enabled and has_valid_quota:
+                    using_provider_type = ProviderType.SYSTEM
+
+        # Get provider model settings
+        provider_model_settings = snapshot.provider_model_settings.get(provider_name)
+
+        # Get provider load balancing configs
+        provider_load_balancing_configs = snapshot.provider_load_balancing_configs.get(provider_name)
+
+        # Convert to model settings
+        model_settings = self._to_model_settings(
+            provider_entity=provider_entity,
+            provider_model_settings=provider_model_settings,
+            load_balancing_model_configs=provider_load_balancing_configs,
+        )
+
+        provider_configuration = ProviderConfiguration(
+            tenant_id=tenant_id,
+            provider=provider_entity,
+            preferred_provider_type=preferred_provider_type,
+            using_provider_type=using_provider_type,
+            system_configuration=system_configuration,
+            custom_configuration=custom_configuration,
+            model_settings=model_settings,
+        )
+
+        # concurrent requests sharing the snapshot may both build it, the configurations are the same
+        snapshot.configurations[provider_name] = provider_configuration
+        return provider_configuration
+
     @staticmethod
     def _get_all_providers(tenant_id: str) -> dict[str, list[Provider]]:
         """
@@ -710,13 +890,22 @@ class ProviderManager:
             else:
                 provider_record = quota_type_to_provider_records_dict[provider_quota.quota_type]
 
+                quota_used = provider_record.quota_used
+                if dify_config.PROVIDER_USAGE_COUNTER_ENABLED:
+                    # the quota used counted in redis may not be written to the record yet, and the counter is
+                    # reloaded from the record when written
+                    counted_quota_used = get_provider_usage_counter().get_quota_used(
+                        tenant_id, provider_entity.provider, provider_quota.quota_type
+                    )
+                    if counted_quota_used is not None:
+                        quota_used = counted_quota_used
+
                 quota_configuration = QuotaConfiguration(
                     quota_type=provider_quota.quota_type,
                     quota_unit=provider_hosting_configuration.quota_unit or QuotaUnit.TOKENS,
-                    quota_used=provider_record.quota_used,
+                    quota_used=quota_used,
                     quota_limit=provider_record.quota_limit,
-                    is_valid=provider_record.quota_limit > provider_record.quota_used
-                    or provider_record.quota_limit == -1,
+                    is_valid=provider_record.quota_limit > quota_used or provider_record.quota_limit == -1,
                     restrict_models=provider_quota.restrict_models,
                 )
 
@@ -0,0 +1,160 @@
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.keyword_base import BaseKeyword
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import DatasetKeywordPosting, DocumentSegment
+
+# keywords longer than the posting column are never produced by jieba in practice, skip them defensively
+MAX_KEYWORD_LENGTH = 255
+
+
+class JiebaPosting(Jieba):
+    """
+    Jieba keyword index stored as one posting row per (keyword, segment) pair.
+
+    Unlike `Jieba`, which keeps the whole dataset keyword table in a single JSON document,
+    writes only touch the rows of the affected segments and a search only reads the postings
+    of the keywords extracted from the query, so no dataset-wide lock is needed.
+    """
+
+    def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
+        self.add_texts(texts, **kwargs)
+        return self
+
+    def add_texts(self, texts: list[Document], **kwargs):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords_list = kwargs.get("keywords_list")
+        postings: dict[str, list[str]] = {}
+        for i, text in enumerate(texts):
+            keywords = keywords_list[i] if keywords_list else None
+            if not keywords:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                postings[text.metadata["doc_id"]] = list(keywords)
+
+        self.add_postings(postings)
+
+    def text_exists(self, id: str) -> bool:
+        posting = (
+            db.session.query(DatasetKeywordPosting.id)
+            .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id == id)
+            .first()
+        )
+        return posting is not None
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        if not ids:
+            return
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id,
+            DatasetKeywordPosting.index_node_id.in_(ids),
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def search(self, query: str, **kwargs: Any) -> list[Document]:
+        k = kwargs.get("top_k", 4)
+
+        sorted_chunk_indices = self._retrieve_ids_by_keywords(query, k)
+        if not sorted_chunk_indices:
+            return []
+
+        segments = (
+            db.session.query(DocumentSegment)
+            .filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(sorted_chunk_indices),
+            )
+            .all()
+        )
+        segment_map = {segment.index_node_id: segment for segment in segments}
+
+        documents = []
+        for chunk_index in sorted_chunk_indices:
+            segment = segment_map.get(chunk_index)
+            if segment:
+                documents.append(
+                    Document(
+                        page_content=segment.content,
+                        metadata={
+                            "doc_id": chunk_index,
+                            "doc_hash": segment.index_node_hash,
+                            "document_id": segment.document_id,
+                            "dataset_id": segment.dataset_id,
+                        },
+                    )
+                )
+
+        return documents
+
+    def delete(self) -> None:
+        db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == self.dataset.id).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        # drop the legacy keyword table as well if the dataset was indexed before switching stores
+        super().delete()
+
+    def create_segment_keywords(self, node_id: str, keywords: list[str]):
+        self._update_segment_keywords(self.dataset.id, node_id, keywords)
+        self.add_postings({node_id: keywords})
+
+    def multi_create_segment_keywords(self, pre_segment_data_list: list):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        postings: dict[str, list[str]] = {}
+        for pre_segment_data in pre_segment_data_list:
+            segment = pre_segment_data["segment"]
+            if pre_segment_data["keywords"]:
+                segment.keywords = pre_segment_data["keywords"]
+            else:
+                keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
+                segment.keywords = list(keywords)
+            postings[segment.index_node_id] = list(segment.keywords)
+        self.add_postings(postings)
+
+    def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
+        self.add_postings({node_id: keywords})
+
+    def add_postings(self, postings: dict[str, list[str]]) -> None:
+        values = [
+            {"dataset_id": self.dataset.id, "keyword": keyword, "index_node_id": node_id}
+            for node_id, keywords in postings.items()
+            for keyword in set(keywords)
+            if keyword and len(keyword) <= MAX_KEYWORD_LENGTH
+        ]
+        if not values:
+            return
+        statement = insert(DatasetKeywordPosting).on_conflict_do_nothing(
+            index_elements=["dataset_id", "keyword", "index_node_id"]
+        )
+        db.session.execute(statement, values)
+        db.session.commit()
+
+    def _retrieve_ids_by_keywords(self, query: str, k: int = 4) -> list[str]:
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords = [keyword for keyword in keyword_table_handler.extract_keywords(query) if keyword]
+        if not keywords:
+            return []
+
+        # rank text chunks by the number of matching keywords, like Jieba._retrieve_ids_by_query
+        hits = func.count(DatasetKeywordPosting.keyword).label("hits")
+        rows = (
+            db.session.query(DatasetKeywordPosting.index_node_id, hits)
+            .filter(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.keyword.in_(keywords),
+            )
+            .group_by(DatasetKeywordPosting.index_node_id)
+            .order_by(hits.desc())
+            .limit(k)
+            .all()
+        )
+        return [row.index_node_id for row in rows]
@@ -4,6 +4,7 @@ from configs import dify_config
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.datasource.keyword.keyword_type import KeyWordType
 from core.rag.models.document import Document
+from core.rag.retrieval.retrieval_cache import bump_dataset_retrieval_version
 from models.dataset import Dataset
 
 
@@ -24,23 +25,31 @@ class Keyword:
                 from core.rag.datasource.keyword.jieba.jieba import Jieba
 
                 return Jieba
+            case KeyWordType.JIEBA_POSTING:
+                from core.rag.datasource.keyword.jieba.jieba_posting import JiebaPosting
+
+                return JiebaPosting
             case _:
                 raise ValueError(f"Keyword store {keyword_type} is not supported.")
 
     def create(self, texts: list[Document], **kwargs):
         self._keyword_processor.create(texts, **kwargs)
+        bump_dataset_retrieval_version(self._dataset.id)
 
     def add_texts(self, texts: list[Document], **kwargs):
         self._keyword_processor.add_texts(texts, **kwargs)
+        bump_dataset_retrieval_version(self._dataset.id)
 
     def text_exists(self, id: str) -> bool:
         return self._keyword_processor.text_exists(id)
 
     def delete_by_ids(self, ids: list[str]) -> None:
         self._keyword_processor.delete_by_ids(ids)
+        bump_dataset_retrieval_version(self._dataset.id)
 
     def delete(self) -> None:
         self._keyword_processor.delete()
+        bump_dataset_retrieval_version(self._dataset.id)
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
         return self._keyword_processor.search(query, **kwargs)
@@ -1,8 +1,9 @@
-import threading
+from concurrent.futures import Future
 from typing import Optional
 
 from flask import Flask, current_app
 
+from configs import dify_config
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
 from core.rag.datasource.vdb.vector_factory import Vector
@@ -10,6 +11,8 @@ from core.rag.embedding.retrieval import RetrievalSegments
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
+from core.rag.retrieval.retrieval_cache import RetrievalCache
+from core.rag.retrieval.retrieval_executor import get_retrieval_executor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_database import db
 from models.dataset import ChildChunk, Dataset, DocumentSegment
@@ -46,64 +49,81 @@ class RetrievalService:
 
         if not dataset or dataset.available_document_count == 0 or dataset.available_segment_count == 0:
             return []
+
+        cache_key = RetrievalCache.get_cache_key(
+            [dataset_id],
+            query,
+            {
+                "retrieval_method": retrieval_method,
+                "top_k": top_k,
+                "score_threshold": score_threshold,
+                "reranking_model": reranking_model,
+                "reranking_mode": reranking_mode,
+                "weights": weights,
+            },
+        )
+        cached_documents = RetrievalCache.get(cache_key)
+        if cached_documents is not None:
+            return cached_documents
+
         all_documents: list[Document] = []
-        threads: list[threading.Thread] = []
+        futures: list[Future] = []
         exceptions: list[str] = []
+        executor = get_retrieval_executor()
+        tenant_id = str(dataset.tenant_id)
+        flask_app = current_app._get_current_object()  # type: ignore
         # retrieval_model source with keyword
         if retrieval_method == "keyword_search":
-            keyword_thread = threading.Thread(
-                target=RetrievalService.keyword_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                    "exceptions": exceptions,
-                },
+            futures.append(
+                executor.submit(
+                    tenant_id,
+                    RetrievalService.keyword_search,
+                    flask_app=flask_app,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    all_documents=all_documents,
+                    exceptions=exceptions,
+                )
             )
-            threads.append(keyword_thread)
-            keyword_thread.start()
         # retrieval_model source with semantic
         if RetrievalMethod.is_support_semantic_search(retrieval_method):
-            embedding_thread = threading.Thread(
-                target=RetrievalService.embedding_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "top_k": top_k,
-                    "score_threshold": score_threshold,
-                    "reranking_model": reranking_model,
-                    "all_documents": all_documents,
-                    "retrieval_method": retrieval_method,
-                    "exceptions": exceptions,
-                },
+            futures.append(
+                executor.submit(
+                    tenant_id,
+                    RetrievalService.embedding_search,
+                    flask_app=flask_app,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    score_threshold=score_threshold,
+                    reranking_model=reranking_model,
+                    all_documents=all_documents,
+                    retrieval_method=retrieval_method,
+                    exceptions=exceptions,
+                )
             )
-            threads.append(embedding_thread)
-            embedding_thread.start()
 
         # retrieval source with full text
         if RetrievalMethod.is_support_fulltext_search(retrieval_method):
-            full_text_index_thread = threading.Thread(
-                target=RetrievalService.full_text_index_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "retrieval_method": retrieval_method,
-                    "score_threshold": score_threshold,
-                    "top_k": top_k,
-                    "reranking_model": reranking_model,
-                    "all_documents": all_documents,
-                    "exceptions": exceptions,
-                },
+            futures.append(
+                executor.submit(
+                    tenant_id,
+                    RetrievalService.full_text_index_search,
+                    flask_app=flask_app,
+                    dataset_id=dataset_id,
+                    query=query,
+                    retrieval_method=retrieval_method,
+                    score_threshold=score_threshold,
+                    top_k=top_k,
+                    reranking_model=reranking_model,
+                    all_documents=all_documents,
+                    exceptions=exceptions,
+                )
             )
-            threads.append(full_text_index_thread)
-            full_text_index_thread.start()
 
-        for thread in threads:
-            thread.join()
+        if not executor.wait(futures, timeout=dify_config.RETRIEVAL_TIMEOUT):
+            raise ValueError(f"Retrieval timed out after {dify_config.RETRIEVAL_TIMEOUT} seconds.")
 
         if exceptions:
             exception_message = ";\n".join(exceptions)
@@ -120,6 +140,7 @@ class RetrievalService:
                 top_n=top_k,
             )
 
+        RetrievalCache.set(cache_key, all_documents)
         return all_documents
 
     @classmethod
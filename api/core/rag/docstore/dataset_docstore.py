@@ -86,6 +86,13 @@ class DatasetDocumentStore:
             if doc.metadata is None:
                 raise ValueError("doc.metadata must be a dict")
 
+        # calc embedding use tokens of all the docs at once
+        if embedding_model:
+            doc_tokens = embedding_model.get_text_embedding_num_tokens_batch(texts=[doc.page_content for doc in docs])
+        else:
+            doc_tokens = [0] * len(docs)
+
+        for doc, tokens in zip(docs, doc_tokens):
             segment_document = self.get_document_segment(doc_id=doc.metadata["doc_id"])
 
             # NOTE: doc could already exist in the store, but we overwrite it
@@ -94,12 +101,6 @@ class DatasetDocumentStore:
                     f"doc_id {doc.metadata['doc_id']} already exists. Set allow_update to True to overwrite."
                 )
 
-            # calc embedding use tokens
-            if embedding_model:
-                tokens = embedding_model.get_text_embedding_num_tokens(texts=[doc.page_content])
-            else:
-                tokens = 0
-
             if not segment_document:
                 max_position += 1
 
@@ -1,16 +1,21 @@
-import base64
 import logging
+import threading
+from collections.abc import Iterator
 from typing import Any, Optional, cast
 
 import numpy as np
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
+from core.helper.lru_cache import LRUCache
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_batcher import embedding_batcher
+from core.rag.embedding.embedding_codec import decode_cached_embedding, decode_embedding, encode_embedding
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from libs import helper
@@ -19,6 +24,59 @@ from models.dataset import Embedding
 logger = logging.getLogger(__name__)
 
 
+class EmbeddingCacheStats:
+    """
+    Process-wide hit and miss counters of the embedding cache tiers.
+    """
+
+    FIELDS = ("memory_hits", "redis_hits", "database_hits", "misses")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        if amount:
+            with self._lock:
+                self._counters[field] += amount
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self.FIELDS, 0)
+
+
+class MemoryEmbeddingCache:
+    """
+    Thread-safe in-process LRU tier in front of Redis and the embedding cache table.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._lock = threading.Lock()
+        self._cache = LRUCache(capacity)
+
+    def get(self, key: tuple) -> Optional[list[float]]:
+        with self._lock:
+            embedding = cast(Optional[tuple[float, ...]], self._cache.get(key))
+        # callers get a list of their own, the cached embedding can never be modified
+        return list(embedding) if embedding is not None else None
+
+    def put(self, key: tuple, embedding: list[float]) -> None:
+        embedding_tuple = tuple(embedding)
+        with self._lock:
+            self._cache.put(key, embedding_tuple)
+
+
+embedding_cache_stats = EmbeddingCacheStats()
+
+memory_embedding_cache: Optional[MemoryEmbeddingCache] = (
+    MemoryEmbeddingCache(dify_config.EMBEDDING_CACHE_MEMORY_SIZE) if dify_config.EMBEDDING_CACHE_MEMORY_SIZE else None
+)
+
+
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
@@ -28,23 +86,21 @@ class CacheEmbedding(Embeddings):
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._get_cached_document_embeddings(list(dict.fromkeys(text_hashes)))
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(text_hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
-            embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+            # embed every distinct text only once
+            embedding_queue_texts: dict[str, str] = {}
+            for i in embedding_queue_indices:
+                embedding_queue_texts.setdefault(text_hashes[i], texts[i])
+            embedding_queue_hashes = list(embedding_queue_texts.keys())
+            embedding_queue_embeddings: dict[str, list[float]] = {}
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
                 model_schema = model_type_instance.get_model_schema(
@@ -55,14 +111,10 @@ class CacheEmbedding(Embeddings):
                     if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties
                     else 1
                 )
-                for i in range(0, len(embedding_queue_texts), max_chunks):
-                    batch_texts = embedding_queue_texts[i : i + max_chunks]
-
-                    embedding_result = self._model_instance.invoke_text_embedding(
-                        texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
-                    )
-
-                    for vector in embedding_result.embeddings:
+                for batch_hashes, batch_embeddings in self._embed_batches(
+                    embedding_queue_hashes, embedding_queue_texts, max_chunks
+                ):
+                    for hash, vector in zip(batch_hashes, batch_embeddings):
                         try:
                             # FIXME: type ignore for numpy here
                             normalized_embedding = (vector / np.linalg.norm(vector)).tolist()  # type: ignore
@@ -71,28 +123,15 @@ class CacheEmbedding(Embeddings):
                                 # for issue #11827  float values are not json compliant
                                 logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
                                 continue
-                            embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
+                            embedding_queue_embeddings[hash] = normalized_embedding
                         except Exception as e:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                self._save_document_embeddings(embedding_queue_embeddings)
+                failed_hashes = [hash for hash in embedding_queue_hashes if hash not in embedding_queue_embeddings]
+                if failed_hashes:
+                    raise ValueError(f"Failed to embed {len(failed_hashes)} of {len(texts)} texts, please try again")
+                for i in embedding_queue_indices:
+                    text_embeddings[i] = embedding_queue_embeddings[text_hashes[i]]
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
@@ -100,16 +139,48 @@ class CacheEmbedding(Embeddings):
 
         return text_embeddings
 
+    def _embed_batches(
+        self, hashes: list[str], texts: dict[str, str], max_chunks: int
+    ) -> Iterator[tuple[list[str], list[list[float]]]]:
+        """
+        Embed the texts by batches of the model, yielding the hashes and embeddings of each batch.
+        """
+        if embedding_batcher:
+            # the texts of the documents indexed concurrently share the model batches
+            yield (
+                hashes,
+                embedding_batcher.embed(self._model_instance, [texts[hash] for hash in hashes], max_chunks, self._user),
+            )
+            return
+
+        for i in range(0, len(hashes), max_chunks):
+            batch_hashes = hashes[i : i + max_chunks]
+            embedding_result = self._model_instance.invoke_text_embedding(
+                texts=[texts[hash] for hash in batch_hashes], user=self._user, input_type=EmbeddingInputType.DOCUMENT
+            )
+            yield batch_hashes, embedding_result.embeddings
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
-        embedding_cache_key = f"{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+        memory_cache_key = self._memory_cache_key(EmbeddingInputType.QUERY, hash)
+        if memory_embedding_cache:
+            cached_embedding = memory_embedding_cache.get(memory_cache_key)
+            if cached_embedding is not None:
+                embedding_cache_stats.incr("memory_hits")
+                return cached_embedding
+
+        embedding_cache_key = self._redis_cache_key(EmbeddingInputType.QUERY, hash)
         embedding = redis_client.get(embedding_cache_key)
         if embedding:
-            redis_client.expire(embedding_cache_key, 600)
-            decoded_embedding = np.frombuffer(base64.b64decode(embedding), dtype="float")
-            return [float(x) for x in decoded_embedding]
+            redis_client.expire(embedding_cache_key, dify_config.EMBEDDING_CACHE_REDIS_TTL)
+            embedding_cache_stats.incr("redis_hits")
+            embedding_results = decode_cached_embedding(embedding)
+            if memory_embedding_cache:
+                memory_embedding_cache.put(memory_cache_key, embedding_results)
+            return embedding_results
+        embedding_cache_stats.incr("misses")
         try:
             embedding_result = self._model_instance.invoke_text_embedding(
                 texts=[text], user=self._user, input_type=EmbeddingInputType.QUERY
@@ -126,17 +197,142 @@ class CacheEmbedding(Embeddings):
             raise ex
 
         try:
-            # encode embedding to base64
-            embedding_vector = np.array(embedding_results)
-            vector_bytes = embedding_vector.tobytes()
-            # Transform to Base64
-            encoded_vector = base64.b64encode(vector_bytes)
-            # Transform to string
-            encoded_str = encoded_vector.decode("utf-8")
-            redis_client.setex(embedding_cache_key, 600, encoded_str)
+            redis_client.setex(
+                embedding_cache_key,
+                dify_config.EMBEDDING_CACHE_REDIS_TTL,
+                encode_embedding(embedding_results, dify_config.EMBEDDING_CACHE_STORAGE_FORMAT),
+            )
         except Exception as ex:
             if dify_config.DEBUG:
                 logging.exception(f"Failed to add embedding to redis for the text '{text[:10]}...({len(text)} chars)'")
             raise ex
+        if memory_embedding_cache:
+            memory_embedding_cache.put(memory_cache_key, embedding_results)
 
         return embedding_results
+
+    def _memory_cache_key(self, input_type: EmbeddingInputType, hash: str) -> tuple:
+        return self._model_instance.provider, self._model_instance.model, input_type.value, hash
+
+    def _redis_cache_key(self, input_type: EmbeddingInputType, hash: str) -> str:
+        if input_type == EmbeddingInputType.QUERY:
+            return f"{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+        return f"{self._model_instance.provider}_{self._model_instance.model}_{input_type.value}_{hash}"
+
+    def _get_cached_document_embeddings(self, hashes: list[str]) -> dict[str, list[float]]:
+        """
+        Look up document embeddings in the memory, Redis and database tiers, in that order.
+
+        :param hashes: distinct text hashes
+        :return: embeddings found in any tier, keyed by text hash
+        """
+        cached_embeddings: dict[str, list[float]] = {}
+        remaining_hashes = hashes
+
+        if memory_embedding_cache and remaining_hashes:
+            for hash in remaining_hashes:
+                embedding = memory_embedding_cache.get(self._memory_cache_key(EmbeddingInputType.DOCUMENT, hash))
+                if embedding is not None:
+                    cached_embeddings[hash] = embedding
+            embedding_cache_stats.incr("memory_hits", len(cached_embeddings))
+            remaining_hashes = [hash for hash in remaining_hashes if hash not in cached_embeddings]
+
+        if dify_config.EMBEDDING_CACHE_REDIS_ENABLED and remaining_hashes:
+            redis_embeddings = self._get_redis_document_embeddings(remaining_hashes)
+            embedding_cache_stats.incr("redis_hits", len(redis_embeddings))
+            self._put_memory_document_embeddings(redis_embeddings)
+            cached_embeddings.update(redis_embeddings)
+            remaining_hashes = [hash for hash in remaining_hashes if hash not in redis_embeddings]
+
+        if remaining_hashes:
+            database_embeddings = self._get_database_document_embeddings(remaining_hashes)
+            embedding_cache_stats.incr("database_hits", len(database_embeddings))
+            self._put_memory_document_embeddings(database_embeddings)
+            self._put_redis_document_embeddings(database_embeddings)
+            cached_embeddings.update(database_embeddings)
+            remaining_hashes = [hash for hash in remaining_hashes if hash not in database_embeddings]
+
+        embedding_cache_stats.incr("misses", len(remaining_hashes))
+        logger.debug(
+            "Embedding cache lookup for %s texts of %s/%s: %s hits, %s misses",
+            len(hashes),
+            self._model_instance.provider,
+            self._model_instance.model,
+            len(cached_embeddings),
+            len(remaining_hashes),
+        )
+        return cached_embeddings
+
+    def _get_redis_document_embeddings(self, hashes: list[str]) -> dict[str, list[float]]:
+        keys = [self._redis_cache_key(EmbeddingInputType.DOCUMENT, hash) for hash in hashes]
+        try:
+            values = redis_client.mget(keys)
+        except Exception:
+            logger.exception("Failed to get document embeddings from redis")
+            return {}
+        return {hash: decode_cached_embedding(value) for hash, value in zip(hashes, values) if value}
+
+    def _get_database_document_embeddings(self, hashes: list[str]) -> dict[str, list[float]]:
+        database_embeddings: dict[str, list[float]] = {}
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        for i in range(0, len(hashes), batch_size):
+            rows = (
+                db.session.query(Embedding.hash, Embedding.embedding)
+                .filter(
+                    Embedding.model_name == self._model_instance.model,
+                    Embedding.provider_name == self._model_instance.provider,
+                    Embedding.hash.in_(hashes[i : i + batch_size]),
+                )
+                .all()
+            )
+            for hash, embedding in rows:
+                database_embeddings[hash] = decode_embedding(embedding)
+        return database_embeddings
+
+    def _put_memory_document_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        if not memory_embedding_cache:
+            return
+        for hash, embedding in embeddings.items():
+            memory_embedding_cache.put(self._memory_cache_key(EmbeddingInputType.DOCUMENT, hash), embedding)
+
+    def _put_redis_document_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        if not dify_config.EMBEDDING_CACHE_REDIS_ENABLED or not embeddings:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for hash, embedding in embeddings.items():
+                pipeline.setex(
+                    self._redis_cache_key(EmbeddingInputType.DOCUMENT, hash),
+                    dify_config.EMBEDDING_CACHE_REDIS_TTL,
+                    encode_embedding(embedding, dify_config.EMBEDDING_CACHE_STORAGE_FORMAT),
+                )
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to add document embeddings to redis")
+
+    def _save_document_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        """
+        Bulk insert new document embeddings into every cache tier,
+        ignoring rows another worker inserted concurrently.
+        """
+        if not embeddings:
+            return
+        values = [
+            {
+                "model_name": self._model_instance.model,
+                "hash": hash,
+                "provider_name": self._model_instance.provider,
+                "embedding": encode_embedding(embedding, dify_config.EMBEDDING_CACHE_STORAGE_FORMAT),
+            }
+            for hash, embedding in embeddings.items()
+        ]
+        statement = insert(Embedding).on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        try:
+            for i in range(0, len(values), batch_size):
+                db.session.execute(statement, values[i : i + batch_size])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        self._put_memory_document_embeddings(embeddings)
+        self._put_redis_document_embeddings(embeddings)
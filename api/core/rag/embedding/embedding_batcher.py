@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from configs import dify_config
+from core.entities.embedding_type import EmbeddingInputType
+from core.model_manager import ModelInstance
+from core.model_runtime.errors.invoke import InvokeRateLimitError
+
+logger = logging.getLogger(__name__)
+
+# seconds a model queue without texts is kept before its worker thread exits
+_IDLE_TIMEOUT = 60.0
+# retries of a batch rate limited by the provider, waiting twice longer each time
+_RATE_LIMIT_RETRIES = 3
+_RATE_LIMIT_BACKOFF = 2.0
+
+
+class _ModelQueue:
+    def __init__(
+        self,
+        model_instance: ModelInstance,
+        user: Optional[str],
+        max_chunks: int,
+        concurrency: int,
+        lock: threading.Lock,
+    ):
+        self.model_instance = model_instance
+        self.user = user
+        self.max_chunks = max_chunks
+        self.items: deque[tuple[str, Future, float]] = deque()
+        self.condition = threading.Condition(lock)
+        # batches being sent, the next full batches wait in the queue for a free sender
+        self.senders = threading.BoundedSemaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding_batcher")
+
+
+class EmbeddingBatcher:
+    """
+    Process-wide queues of the document texts to embed, one per model.
+
+    The texts embedded at the same time by the documents indexed concurrently are coalesced into batches of the
+    maximum size of the model, so that many small documents fill the model batches instead of each sending its own
+    small batch. A batch is sent once full, or max_wait seconds after its first text was queued, and up to
+    max_concurrency batches per credentials of the model are sent at once.
+    """
+
+    def __init__(self, max_wait: float, max_concurrency: int) -> None:
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._queues: dict[tuple, _ModelQueue] = {}
+        self._stats_lock = threading.Lock()
+        self._counters = dict.fromkeys(("batches", "texts", "rate_limit_retries", "errors"), 0)
+
+    def embed(
+        self, model_instance: ModelInstance, texts: list[str], max_chunks: int, user: Optional[str] = None
+    ) -> list[list[float]]:
+        """
+        Embed document texts, waiting for the batches they were queued in.
+
+        :param model_instance: embedding model instance
+        :param texts: texts to embed
+        :param max_chunks: maximum number of texts of a batch of the model
+        :param user: unique user id
+        :return: embeddings of the texts, not normalized
+        """
+        key = (
+            model_instance.provider_model_bundle.configuration.tenant_id,
+            model_instance.provider,
+            model_instance.model,
+            user,
+        )
+        futures: list[Future] = [Future() for _ in texts]
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = _ModelQueue(model_instance, user, max_chunks, self._concurrency(model_instance), self._lock)
+                self._queues[key] = queue
+                threading.Thread(target=self._work, args=(key, queue), daemon=True).start()
+            # the batches are sent with the credentials of the latest model instance
+            queue.model_instance = model_instance
+            queued_at = time.perf_counter()
+            queue.items.extend((text, future, queued_at) for text, future in zip(texts, futures))
+            queue.condition.notify()
+        return [future.result() for future in futures]
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            queued = sum(len(queue.items) for queue in self._queues.values())
+            models = len(self._queues)
+        with self._stats_lock:
+            return {**self._counters, "queued_texts": queued, "models": models}
+
+    def _incr(self, field: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._counters[field] += amount
+
+    def _concurrency(self, model_instance: ModelInstance) -> int:
+        # each load balancing config has its own credentials and rate limit
+        load_balancing_manager = model_instance.load_balancing_manager
+        configs_count = load_balancing_manager.configs_count if load_balancing_manager else 1
+        return self.max_concurrency * max(configs_count, 1)
+
+    def _work(self, key: tuple, queue: _ModelQueue) -> None:
+        while True:
+            # wait for a free sender, the texts queued meanwhile fill the next batch
+            queue.senders.acquire()
+            with self._lock:
+                while not queue.items:
+                    if not queue.condition.wait(timeout=_IDLE_TIMEOUT) and not queue.items:
+                        del self._queues[key]
+                        queue.senders.release()
+                        queue.executor.shutdown(wait=False)
+                        return
+                # wait for the batch to fill up
+                while len(queue.items) < queue.max_chunks:
+                    remaining = queue.items[0][2] + self.max_wait - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    queue.condition.wait(timeout=remaining)
+                batch = [queue.items.popleft() for _ in range(min(queue.max_chunks, len(queue.items)))]
+
+            queue.executor.submit(self._send, queue, batch)
+
+    def _send(self, queue: _ModelQueue, batch: list[tuple[str, Future, float]]) -> None:
+        try:
+            try:
+                embeddings = self._invoke(queue, [text for text, _, _ in batch])
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+            except Exception as e:
+                self._incr("errors")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            self._incr("batches")
+            self._incr("texts", len(batch))
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+        finally:
+            queue.senders.release()
+
+    def _invoke(self, queue: _ModelQueue, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                embedding_result = queue.model_instance.invoke_text_embedding(
+                    texts=texts, user=queue.user, input_type=EmbeddingInputType.DOCUMENT
+                )
+                return embedding_result.embeddings
+            except InvokeRateLimitError:
+                if attempt >= _RATE_LIMIT_RETRIES:
+                    raise
+                self._incr("rate_limit_retries")
+                backoff = _RATE_LIMIT_BACKOFF * 2**attempt
+                logger.warning("Embedding rate limited by %s, retrying in %ss", queue.model_instance.provider, backoff)
+                time.sleep(backoff)
+                attempt += 1
+
+    def _reset(self) -> None:
+        # the worker threads do not survive a fork, the queues of the parent are dropped
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._stats_lock = threading.Lock()
+
+
+embedding_batcher: Optional[EmbeddingBatcher] = (
+    EmbeddingBatcher(dify_config.EMBEDDING_BATCH_MAX_WAIT, dify_config.EMBEDDING_BATCH_MAX_CONCURRENCY)
+    if dify_config.EMBEDDING_BATCH_MAX_WAIT
+    else None
+)
+
+if embedding_batcher and hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=embedding_batcher._reset)
@@ -0,0 +1,94 @@
+import base64
+import pickle
+from collections.abc import Sequence
+from enum import StrEnum
+from typing import Union, cast
+
+import numpy as np
+
+
+class EmbeddingStorageFormat(StrEnum):
+    """
+    Binary formats of embedding vectors kept in the embedding cache table and in Redis.
+    """
+
+    PICKLE = "pickle"
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+
+
+# 4-byte headers keep the float payload aligned and can never start a pickle stream (b"\x80")
+_FORMAT_HEADERS = {
+    EmbeddingStorageFormat.FLOAT32: b"EV32",
+    EmbeddingStorageFormat.FLOAT16: b"EV16",
+}
+_HEADER_DTYPES: dict[bytes, np.dtype] = {
+    b"EV32": np.dtype("<f4"),
+    b"EV16": np.dtype("<f2"),
+}
+_HEADER_LENGTH = 4
+_PICKLE_PROTOCOL_PREFIX = b"\x80"
+
+EmbeddingData = Union[Sequence[float], np.ndarray]
+EncodedEmbedding = Union[bytes, bytearray, memoryview]
+
+
+def encode_embedding(embedding: EmbeddingData, storage_format: str = EmbeddingStorageFormat.FLOAT32) -> bytes:
+    """
+    Encode an embedding vector.
+
+    :param embedding: embedding vector
+    :param storage_format: one of EmbeddingStorageFormat
+    :return: encoded bytes
+    """
+    storage_format = EmbeddingStorageFormat(storage_format)
+    if storage_format == EmbeddingStorageFormat.PICKLE:
+        return pickle.dumps([float(x) for x in embedding], protocol=pickle.HIGHEST_PROTOCOL)
+
+    header = _FORMAT_HEADERS[storage_format]
+    array: np.ndarray = np.asarray(embedding, dtype=_HEADER_DTYPES[header])
+    return header + array.tobytes()
+
+
+def get_embedding_storage_format(data: EncodedEmbedding) -> EmbeddingStorageFormat:
+    """
+    Detect the format of encoded embedding bytes, anything without a known header is a legacy pickle.
+    """
+    header = bytes(data[:_HEADER_LENGTH])
+    for storage_format, format_header in _FORMAT_HEADERS.items():
+        if header == format_header:
+            return storage_format
+    return EmbeddingStorageFormat.PICKLE
+
+
+def decode_embedding_array(data: EncodedEmbedding) -> np.ndarray:
+    """
+    Decode embedding bytes into a numpy array.
+    Binary formats are read-only views over `data` without copying.
+    """
+    dtype = _HEADER_DTYPES.get(bytes(data[:_HEADER_LENGTH]))
+    array: np.ndarray
+    if dtype is None:
+        array = np.asarray(pickle.loads(data), dtype=np.float64)
+    else:
+        array = np.frombuffer(data, dtype=dtype, offset=_HEADER_LENGTH)
+    return array
+
+
+def decode_embedding(data: EncodedEmbedding) -> list[float]:
+    """
+    Decode embedding bytes into a list of floats.
+    This copies every value into a Python float, use decode_embedding_array where an array will do.
+    """
+    if bytes(data[:_HEADER_LENGTH]) not in _HEADER_DTYPES:
+        return cast(list[float], pickle.loads(data))
+    return cast(list[float], decode_embedding_array(data).tolist())
+
+
+def decode_cached_embedding(data: bytes) -> list[float]:
+    """
+    Decode an embedding cached in Redis, accepting the legacy base64 float64 encoding.
+    """
+    if data[:_HEADER_LENGTH] in _HEADER_DTYPES or data.startswith(_PICKLE_PROTOCOL_PREFIX):
+        return decode_embedding(data)
+    return cast(list[float], np.frombuffer(base64.b64decode(data), dtype=np.float64).tolist())
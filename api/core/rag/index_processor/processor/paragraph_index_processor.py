@@ -1,6 +1,7 @@
 """Paragraph index processor."""
 
 import uuid
+from collections.abc import Iterator
 from typing import Optional
 
 from core.rag.cleaner.clean_processor import CleanProcessor
@@ -28,6 +29,14 @@ class ParagraphIndexProcessor(BaseIndexProcessor):
 
         return text_docs
 
+    def extract_iter(self, extract_setting: ExtractSetting, **kwargs) -> Iterator[Document]:
+        return ExtractProcessor.extract_iter(
+            extract_setting=extract_setting,
+            is_automatic=(
+                kwargs.get("process_rule_mode") == "automatic" or kwargs.get("process_rule_mode") == "hierarchical"
+            ),
+        )
+
     def transform(self, documents: list[Document], **kwargs) -> list[Document]:
         process_rule = kwargs.get("process_rule")
         if not process_rule:
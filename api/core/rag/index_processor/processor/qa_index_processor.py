@@ -4,6 +4,7 @@ import logging
 import re
 import threading
 import uuid
+from collections.abc import Iterator
 from typing import Optional
 
 import pandas as pd
@@ -34,6 +35,14 @@ class QAIndexProcessor(BaseIndexProcessor):
         )
         return text_docs
 
+    def extract_iter(self, extract_setting: ExtractSetting, **kwargs) -> Iterator[Document]:
+        return ExtractProcessor.extract_iter(
+            extract_setting=extract_setting,
+            is_automatic=(
+                kwargs.get("process_rule_mode") == "automatic" or kwargs.get("process_rule_mode") == "hierarchical"
+            ),
+        )
+
     def transform(self, documents: list[Document], **kwargs) -> list[Document]:
         preview = kwargs.get("preview")
         process_rule = kwargs.get("process_rule")
@@ -0,0 +1,112 @@
+from collections.abc import Iterable, Sequence
+from typing import cast
+
+import numpy as np
+
+from configs import dify_config
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import DocumentSegment
+
+
+def calculate_tfidf_cosine_scores(
+    query_keywords: Iterable[str], documents_keywords: Sequence[Iterable[str]]
+) -> list[float]:
+    """
+    Calculate the TF-IDF cosine similarity between the query keywords and each document's keywords.
+
+    Keywords are sets, so every term frequency is 1 and IDF is computed over the given documents:
+    idf = log((1 + N) / (1 + df)) + 1. The keyword-document incidence matrix is kept in
+    coordinate form and all dot products and norms are computed with numpy in one pass.
+
+    :param query_keywords: query keywords
+    :param documents_keywords: keywords of each document
+    :return: similarity of each document, in order
+    """
+    total_documents = len(documents_keywords)
+    if not total_documents:
+        return []
+
+    vocabulary: dict[str, int] = {}
+    row_ids: list[int] = []
+    column_ids: list[int] = []
+    for row_id, document_keywords in enumerate(documents_keywords):
+        for keyword in set(document_keywords):
+            row_ids.append(row_id)
+            column_ids.append(vocabulary.setdefault(keyword, len(vocabulary)))
+    if not vocabulary:
+        return [0.0] * total_documents
+
+    rows = np.asarray(row_ids, dtype=np.int64)
+    columns = np.asarray(column_ids, dtype=np.int64)
+
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log((1 + total_documents) / (1 + document_frequency)) + 1
+    squared_idf = idf * idf
+
+    query_columns = [vocabulary[keyword] for keyword in set(query_keywords) if keyword in vocabulary]
+    query_mask = np.zeros(len(vocabulary), dtype=bool)
+    query_mask[query_columns] = True
+    query_norm = np.sqrt(squared_idf[query_mask].sum())
+    if not query_norm:
+        return [0.0] * total_documents
+
+    numerators = np.bincount(
+        rows, weights=np.where(query_mask[columns], squared_idf[columns], 0.0), minlength=total_documents
+    )
+    document_norms = np.sqrt(np.bincount(rows, weights=squared_idf[columns], minlength=total_documents))
+    denominators = document_norms * query_norm
+    similarities = np.divide(numerators, denominators, out=np.zeros(total_documents), where=denominators > 0)
+    return cast(list[float], similarities.tolist())
+
+
+def get_documents_keywords(
+    documents: list[Document], keyword_table_handler: JiebaKeywordTableHandler
+) -> list[set[str]]:
+    """
+    Get the keywords of each document and store them in the document metadata.
+
+    When RETRIEVAL_KEYWORD_SCORE_USE_SEGMENT_KEYWORDS is enabled, keywords saved on the
+    document segments at indexing time are loaded in one query instead of re-running jieba.
+    """
+    segment_keywords: dict[str, list[str]] = {}
+    if dify_config.RETRIEVAL_KEYWORD_SCORE_USE_SEGMENT_KEYWORDS:
+        doc_ids = [document.metadata["doc_id"] for document in documents if document.metadata]
+        dataset_ids = {document.metadata.get("dataset_id") for document in documents if document.metadata}
+        if doc_ids:
+            segments = (
+                db.session.query(DocumentSegment.index_node_id, DocumentSegment.keywords)
+                .filter(
+                    DocumentSegment.dataset_id.in_([dataset_id for dataset_id in dataset_ids if dataset_id]),
+                    DocumentSegment.index_node_id.in_(doc_ids),
+                )
+                .all()
+            )
+            segment_keywords = {segment.index_node_id: segment.keywords for segment in segments if segment.keywords}
+
+    documents_keywords = []
+    for document in documents:
+        doc_id = document.metadata.get("doc_id") if document.metadata else None
+        if doc_id in segment_keywords:
+            document_keywords = set(segment_keywords[doc_id])
+        else:
+            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
+        if document.metadata is not None:
+            document.metadata["keywords"] = document_keywords
+        documents_keywords.append(document_keywords)
+    return documents_keywords
+
+
+def calculate_keyword_scores(query: str, documents: list[Document]) -> list[float]:
+    """
+    Calculate the keyword similarity of each document with the query.
+
+    :param query: search query
+    :param documents: documents for reranking
+    :return: similarity of each document, in order
+    """
+    keyword_table_handler = JiebaKeywordTableHandler()
+    query_keywords = keyword_table_handler.extract_keywords(query, None)
+    documents_keywords = get_documents_keywords(documents, keyword_table_handler)
+    return calculate_tfidf_cosine_scores(query_keywords, documents_keywords)
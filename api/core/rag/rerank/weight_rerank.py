@@ -1,15 +1,13 @@
-import math
-from collections import Counter
 from typing import Optional
 
 import numpy as np
 
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.models.document import Document
 from core.rag.rerank.entity.weight import VectorSetting, Weights
+from core.rag.rerank.keyword_scorer import calculate_keyword_scores
 from core.rag.rerank.rerank_base import BaseRerankRunner
 
 
@@ -65,83 +63,20 @@ class WeightRerankRunner(BaseRerankRunner):
 
     def _calculate_keyword_score(self, query: str, documents: list[Document]) -> list[float]:
         """
-        Calculate BM25 scores
+        Calculate TF-IDF cosine scores
         :param query: search query
         :param documents: documents for reranking
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            # get the document keywords
-            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-            if document.metadata is not None:
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
-
-        # for idx, similarity in enumerate(similarities):
-        #     print(f"Document {idx + 1} similarity: {similarity}")
-
-        return similarities
+        return calculate_keyword_scores(query, documents)
 
     def _calculate_cosine(
-        self, tenant_id: str, query: str, documents: list[Document], vector_setting: VectorSetting
+        self,
+        tenant_id: str,
+        query: str,
+        documents: list[Document],
+        vector_setting: VectorSetting,
     ) -> list[float]:
         """
         Calculate Cosine scores
@@ -150,7 +85,15 @@ class WeightRerankRunner(BaseRerankRunner):
 
         :return:
         """
-        query_vector_scores = []
+        query_vector_scores = [
+            document.metadata["score"] if document.metadata and "score" in document.metadata else 0.0
+            for document in documents
+        ]
+        unscored_indices = [
+            i for i, document in enumerate(documents) if not document.metadata or "score" not in document.metadata
+        ]
+        if not unscored_indices:
+            return query_vector_scores
 
         model_manager = ModelManager()
 
@@ -162,24 +105,31 @@ class WeightRerankRunner(BaseRerankRunner):
         )
         cache_embedding = CacheEmbedding(embedding_model)
         query_vector = cache_embedding.embed_query(query)
-        for document in documents:
-            # calculate cosine similarity
-            if document.metadata and "score" in document.metadata:
-                query_vector_scores.append(document.metadata["score"])
-            else:
-                # transform to NumPy
-                vec1 = np.array(query_vector)
-                vec2 = np.array(document.vector)
-
-                # calculate dot product
-                dot_product = np.dot(vec1, vec2)
-
-                # calculate norm
-                norm_vec1 = np.linalg.norm(vec1)
-                norm_vec2 = np.linalg.norm(vec2)
-
-                # calculate cosine similarity
-                cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-                query_vector_scores.append(cosine_sim)
+
+        # embed documents returned without their vector in one batch, mostly served by the embedding cache
+        missing_vector_indices = [i for i in unscored_indices if documents[i].vector is None]
+        missing_vectors = {}
+        if missing_vector_indices:
+            embeddings = cache_embedding.embed_documents([documents[i].page_content for i in missing_vector_indices])
+            missing_vectors = dict(zip(missing_vector_indices, embeddings))
+            # a document that could not be embedded keeps a score of 0
+            unscored_indices = [
+                i for i in unscored_indices if i not in missing_vectors or missing_vectors[i] is not None
+            ]
+            if not unscored_indices:
+                return query_vector_scores
+
+        # calculate cosine similarity of all documents with one matrix product
+        document_vectors = np.asarray(
+            [missing_vectors[i] if i in missing_vectors else documents[i].vector for i in unscored_indices],
+            dtype=np.float64,
+        )
+        query_array = np.asarray(query_vector, dtype=np.float64)
+        norms = np.linalg.norm(document_vectors, axis=1) * np.linalg.norm(query_array)
+        cosine_similarities = np.divide(
+            document_vectors @ query_array, norms, out=np.zeros(len(unscored_indices)), where=norms > 0
+        )
+        for i, cosine_similarity in zip(unscored_indices, cosine_similarities.tolist()):
+            query_vector_scores[i] = cosine_similarity
 
         return query_vector_scores
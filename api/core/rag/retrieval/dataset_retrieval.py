@@ -1,10 +1,10 @@
-import math
-import threading
-from collections import Counter
+import logging
+from concurrent.futures import Future
 from typing import Any, Optional, cast
 
 from flask import Flask, current_app
 
+from configs import dify_config
 from core.app.app_config.entities import DatasetEntity, DatasetRetrieveConfigEntity
 from core.app.entities.app_invoke_entities import InvokeFrom, ModelConfigWithCredentialsEntity
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
@@ -18,11 +18,13 @@ from core.ops.entities.trace_entity import TraceTaskName
 from core.ops.ops_trace_manager import TraceQueueManager, TraceTask
 from core.ops.utils import measure_time
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.entities.context_entities import DocumentContext
 from core.rag.models.document import Document
+from core.rag.rerank.keyword_scorer import calculate_keyword_scores
 from core.rag.rerank.rerank_type import RerankMode
+from core.rag.retrieval.retrieval_cache import RetrievalCache
+from core.rag.retrieval.retrieval_executor import get_retrieval_executor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from core.rag.retrieval.router.multi_dataset_function_call_router import FunctionCallMultiDatasetRouter
 from core.rag.retrieval.router.multi_dataset_react_route import ReactMultiDatasetRouter
@@ -34,6 +36,8 @@ from models.dataset import Dataset, DatasetQuery, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -351,8 +355,6 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
-        all_documents: list[Document] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
             item.indexing_technique == available_datasets[0].indexing_technique for item in available_datasets
@@ -385,36 +387,45 @@ class DatasetRetrieval:
                     ].embedding_model_provider
                     weights["vector_setting"]["embedding_model_name"] = available_datasets[0].embedding_model
 
-        for dataset in available_datasets:
-            index_type = dataset.indexing_technique
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset.id,
-                    "query": query,
+        cache_key = None
+        # external knowledge bases have no index version to invalidate cached results with
+        if all(dataset.provider != "external" for dataset in available_datasets):
+            cache_key = RetrievalCache.get_cache_key(
+                dataset_ids,
+                query,
+                {
                     "top_k": top_k,
-                    "all_documents": all_documents,
+                    "score_threshold": score_threshold,
+                    "reranking_enable": reranking_enable,
+                    "reranking_mode": reranking_mode,
+                    "reranking_model": reranking_model,
+                    "weights": weights,
                 },
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
-
-        with measure_time() as timer:
-            if reranking_enable:
-                # do rerank for searched documents
-                data_post_processor = DataPostProcessor(tenant_id, reranking_mode, reranking_model, weights, False)
-
-                all_documents = data_post_processor.invoke(
-                    query=query, documents=all_documents, score_threshold=score_threshold, top_n=top_k
-                )
-            else:
-                if index_type == "economy":
-                    all_documents = self.calculate_keyword_score(query, all_documents, top_k)
-                elif index_type == "high_quality":
-                    all_documents = self.calculate_vector_score(all_documents, top_k, score_threshold)
+        cached_documents = RetrievalCache.get(cache_key)
+        if cached_documents is not None:
+            with measure_time() as timer:
+                all_documents = cached_documents
+        else:
+            all_documents, completed = self._search_datasets(tenant_id, available_datasets, query, top_k)
+
+            with measure_time() as timer:
+                if reranking_enable:
+                    # do rerank for searched documents
+                    data_post_processor = DataPostProcessor(tenant_id, reranking_mode, reranking_model, weights, False)
+
+                    all_documents = data_post_processor.invoke(
+                        query=query, documents=all_documents, score_threshold=score_threshold, top_n=top_k
+                    )
+                else:
+                    if index_type == "economy":
+                        all_documents = self.calculate_keyword_score(query, all_documents, top_k)
+                    elif index_type == "high_quality":
+                        all_documents = self.calculate_vector_score(all_documents, top_k, score_threshold)
+
+            # partial results of failed or timed out searches are not cached
+            if completed:
+                RetrievalCache.set(cache_key, all_documents)
 
         self._on_query(query, dataset_ids, app_id, user_from, user_id)
 
@@ -423,6 +434,42 @@ class DatasetRetrieval:
 
         return all_documents
 
+    def _search_datasets(
+        self, tenant_id: str, available_datasets: list, query: str, top_k: int
+    ) -> tuple[list[Document], bool]:
+        """
+        Search the datasets in parallel on the shared retrieval executor.
+
+        :return: the found documents and whether every dataset search completed
+        """
+        executor = get_retrieval_executor()
+        flask_app = current_app._get_current_object()  # type: ignore
+        retrievals: list[tuple[Future, list[Document]]] = []
+        for dataset in available_datasets:
+            # each dataset gets its own result list, so searches finishing after the deadline are dropped
+            dataset_documents: list[Document] = []
+            future = executor.submit(
+                tenant_id,
+                self._retriever,
+                flask_app=flask_app,
+                dataset_id=dataset.id,
+                query=query,
+                top_k=top_k,
+                all_documents=dataset_documents,
+            )
+            retrievals.append((future, dataset_documents))
+        completed = executor.wait([future for future, _ in retrievals], timeout=dify_config.RETRIEVAL_TIMEOUT)
+
+        all_documents: list[Document] = []
+        for future, dataset_documents in retrievals:
+            if future.done() and not future.cancelled():
+                if future.exception():
+                    logger.exception("Retrieval failed", exc_info=future.exception())
+                    completed = False
+                    continue
+                all_documents.extend(dataset_documents)
+        return all_documents, completed
+
     def _on_retrieval_end(
         self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None
     ) -> None:
@@ -624,69 +671,7 @@ class DatasetRetrieval:
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            if document.metadata is not None:
-                # get the document keywords
-                document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
+        similarities = calculate_keyword_scores(query, documents)
 
         for document, score in zip(documents, similarities):
             # format document
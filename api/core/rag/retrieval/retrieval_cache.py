@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from pydantic import TypeAdapter
+
+from configs import dify_config
+from core.rag.models.document import Document
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+_documents_adapter = TypeAdapter(list[Document])
+
+
+def _dataset_version_key(dataset_id: str) -> str:
+    return f"retrieval_cache_version:{dataset_id}"
+
+
+def bump_dataset_retrieval_version(dataset_id: str) -> None:
+    """
+    Invalidate the cached retrieval results of a dataset after its index changed.
+
+    Versions are bumped even when the cache is disabled, so enabling it again never serves
+    results cached before the change.
+    """
+    try:
+        redis_client.incr(_dataset_version_key(dataset_id))
+    except Exception:
+        logger.exception("Failed to bump retrieval cache version of dataset %s", dataset_id)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class RetrievalCache:
+    """
+    Redis cache of retrieval results.
+
+    Keys are built from the dataset ids with their current version, the normalized query and the
+    retrieval config, so a bumped dataset version makes every previous entry of that dataset
+    unreachable and the entries then expire with RETRIEVAL_CACHE_TTL.
+    """
+
+    @staticmethod
+    def get_cache_key(dataset_ids: Sequence[str], query: str, retrieval_config: dict[str, Any]) -> Optional[str]:
+        """
+        Get the cache key of a retrieval, None if the cache is disabled or unavailable.
+        """
+        if not dify_config.RETRIEVAL_CACHE_ENABLED or not dataset_ids:
+            return None
+
+        sorted_dataset_ids = sorted(set(dataset_ids))
+        try:
+            versions = redis_client.mget([_dataset_version_key(dataset_id) for dataset_id in sorted_dataset_ids])
+        except Exception:
+            logger.exception("Failed to get retrieval cache versions")
+            return None
+
+        key_content = json.dumps(
+            {
+                "datasets": [
+                    [dataset_id, int(version) if version else 0]
+                    for dataset_id, version in zip(sorted_dataset_ids, versions)
+                ],
+                "query": normalize_query(query),
+                "config": retrieval_config,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return f"retrieval_cache:{hashlib.sha256(key_content.encode()).hexdigest()}"
+
+    @staticmethod
+    def get(cache_key: Optional[str]) -> Optional[list[Document]]:
+        if not cache_key:
+            return None
+        try:
+            cached = redis_client.get(cache_key)
+            if cached is None:
+                return None
+            return _documents_adapter.validate_json(cached)
+        except Exception:
+            logger.exception("Failed to get cached retrieval result")
+            return None
+
+    @staticmethod
+    def set(cache_key: Optional[str], documents: list[Document]) -> None:
+        if not cache_key:
+            return
+        try:
+            value = _documents_adapter.dump_json(documents)
+            if len(value) > dify_config.RETRIEVAL_CACHE_MAX_ENTRY_SIZE:
+                return
+            redis_client.setex(cache_key, dify_config.RETRIEVAL_CACHE_TTL, value)
+        except Exception:
+            logger.exception("Failed to cache retrieval result")
@@ -0,0 +1,171 @@
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, wait
+from typing import Any, Optional
+
+from configs import dify_config
+from core.helper.tenant_fair_queue import TenantFairQueue, WorkItem
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalExecutor:
+    """
+    Bounded thread pool shared by all retrievals of a process.
+
+    Tasks are queued per tenant and workers take them round-robin across tenants, so a tenant
+    searching many datasets at once does not starve the others. Tasks submitted from one of the
+    executor's own workers, such as the searches of a dataset retrieved in parallel with others,
+    go to a nested pool with workers of its own: the tasks waiting on them cannot take all the
+    workers they need, and the searches of one retrieval still run in parallel. Tasks submitted
+    from the nested pool run inline.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        thread_name_prefix: str = "retrieval",
+        *,
+        nested: bool = True,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._thread_name_prefix = thread_name_prefix
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._queue: TenantFairQueue[WorkItem] = TenantFairQueue()
+        self._workers: list[threading.Thread] = []
+        self._idle_workers = 0
+        self._active = 0
+        self._completed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._shutdown = False
+        # 0 for the executor, 1 for its nested pool
+        self._level = 0
+        self._nested: Optional[RetrievalExecutor] = None
+        if nested:
+            self._nested = RetrievalExecutor(max_workers, max_queue_size, f"{thread_name_prefix}_nested", nested=False)
+            self._nested._level = 1
+            # the workers of both pools record their level in the same thread local
+            self._nested._local = self._local
+
+    def submit(self, tenant_id: str, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        worker_level = getattr(self._local, "worker_level", None)
+        is_worker = worker_level is not None and worker_level >= self._level
+        if is_worker and self._nested is not None:
+            return self._nested.submit(tenant_id, fn, *args, **kwargs)
+        future: Future = Future()
+        item = WorkItem(tenant_id, future, fn, args, kwargs)
+        if is_worker:
+            item.run()
+            return future
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Retrieval executor is shut down.")
+            if len(self._queue) >= self.max_queue_size:
+                self._rejected += 1
+                raise ValueError(f"Max queue size {self.max_queue_size} of retrieval executor reached.")
+
+            self._queue.put(item)
+            if self._idle_workers < len(self._queue) and len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._work, name=f"{self._thread_name_prefix}_{len(self._workers)}", daemon=True
+                )
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+        return future
+
+    def wait(self, futures: Iterable[Future], timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the futures until the deadline, cancelling the ones still queued when it expires.
+
+        Tasks that are already running cannot be interrupted and finish in the background.
+
+        :return: whether all futures completed in time
+        """
+        futures = list(futures)
+        _, not_done = wait(futures, timeout=timeout or None)
+        if not not_done:
+            return True
+
+        for future in not_done:
+            future.cancel()
+        with self._condition:
+            self._timed_out += 1
+        logger.warning(
+            "Retrieval deadline of %ss expired with %d of %d searches unfinished", timeout, len(not_done), len(futures)
+        )
+        return False
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "workers": len(self._workers),
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._queue.max_depth,
+                "queued_tenants": self._queue.tenant_count,
+                "completed": self._completed,
+                "cancelled": self._cancelled,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._nested is not None:
+            self._nested.shutdown(wait)
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _next_item(self) -> Optional[WorkItem]:
+        with self._condition:
+            while (item := self._queue.take()) is None:
+                if self._shutdown:
+                    return None
+                self._idle_workers += 1
+                self._condition.wait()
+                self._idle_workers -= 1
+
+            self._active += 1
+            return item
+
+    def _work(self) -> None:
+        self._local.worker_level = self._level
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            ran = item.run()
+            with self._condition:
+                self._active -= 1
+                if ran:
+                    self._completed += 1
+                else:
+                    self._cancelled += 1
+
+
+_retrieval_executor: Optional[RetrievalExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def get_retrieval_executor() -> RetrievalExecutor:
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = RetrievalExecutor(
+                    max_workers=dify_config.RETRIEVAL_EXECUTOR_MAX_WORKERS,
+                    max_queue_size=dify_config.RETRIEVAL_EXECUTOR_MAX_QUEUE_SIZE,
+                )
+    return _retrieval_executor
@@ -1,15 +1,17 @@
-import threading
+from concurrent.futures import Future
 from typing import Any
 
 from flask import Flask, current_app
 from pydantic import BaseModel, Field
 
+from configs import dify_config
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.models.document import Document as RagDocument
 from core.rag.rerank.rerank_model import RerankModelRunner
+from core.rag.retrieval.retrieval_executor import get_retrieval_executor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from core.tools.tool.dataset_retriever.dataset_retriever_base_tool import DatasetRetrieverBaseTool
 from extensions.ext_database import db
@@ -45,23 +47,26 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
         )
 
     def _run(self, query: str) -> str:
-        threads = []
         all_documents: list[RagDocument] = []
+        executor = get_retrieval_executor()
+        flask_app = current_app._get_current_object()  # type: ignore
+        retrievals: list[tuple[Future, list[RagDocument]]] = []
         for dataset_id in self.dataset_ids:
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "all_documents": all_documents,
-                    "hit_callbacks": self.hit_callbacks,
-                },
+            dataset_documents: list[RagDocument] = []
+            future = executor.submit(
+                self.tenant_id,
+                self._retriever,
+                flask_app=flask_app,
+                dataset_id=dataset_id,
+                query=query,
+                all_documents=dataset_documents,
+                hit_callbacks=self.hit_callbacks,
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            retrievals.append((future, dataset_documents))
+        executor.wait([future for future, _ in retrievals], timeout=dify_config.RETRIEVAL_TIMEOUT)
+        for future, dataset_documents in retrievals:
+            if future.done() and not future.cancelled() and not future.exception():
+                all_documents.extend(dataset_documents)
         # do rerank for searched documents
         model_manager = ModelManager()
         rerank_model_instance = model_manager.get_model_instance(
@@ -14,6 +14,7 @@ from .segments import (
     Segment,
     StringSegment,
 )
+from .spilled_array import SpilledArray
 from .types import SegmentType
 from .variables import (
     ArrayAnyVariable,
@@ -59,6 +60,7 @@ __all__ = [
     "Segment",
     "SegmentGroup",
     "SegmentType",
+    "SpilledArray",
     "StringSegment",
     "StringVariable",
     "Variable",
@@ -1,5 +1,4 @@
 import json
-import sys
 from collections.abc import Mapping, Sequence
 from typing import Any
 
@@ -7,7 +6,9 @@ from pydantic import BaseModel, ConfigDict, field_validator
 
 from core.file import File
 
+from .spilled_array import SpilledArray
 from .types import SegmentType
+from .utils import deep_getsizeof
 
 
 class Segment(BaseModel):
@@ -42,9 +43,9 @@ class Segment(BaseModel):
     @property
     def size(self) -> int:
         """
-        Return the size of the value in bytes.
+        Return the size of the value in bytes, including the objects it contains.
         """
-        return sys.getsizeof(self.value)
+        return deep_getsizeof(self.value)
 
     def to_object(self) -> Any:
         return self.value
@@ -107,6 +108,12 @@ class ArraySegment(Segment):
             items.append(str(item))
         return "\n".join(items)
 
+    def to_object(self) -> Any:
+        # spilled arrays are only read item by item, consumers of the whole object get a list
+        if isinstance(self.value, SpilledArray):
+            return list(self.value)
+        return self.value
+
 
 class FileSegment(Segment):
     value_type: SegmentType = SegmentType.FILE
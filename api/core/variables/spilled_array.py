@@ -0,0 +1,154 @@
+import copy
+import pickle
+import tempfile
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any, Optional, overload
+
+_UNSET = object()
+
+
+class SpilledArray(Sequence[Any]):
+    """
+    Array that keeps at most a few chunks of items in memory and writes every complete chunk to a temporary
+    file, for arrays too large to hold in memory such as the outputs of a streaming iteration.
+
+    Items can be set in any order, a chunk is written once all of its items are set. Reading the array in
+    order loads one chunk at a time, so downstream nodes iterating over it never load the whole array.
+    The temporary file is deleted by close, which the owner of the array calls once nothing reads it anymore.
+    """
+
+    def __init__(self, chunk_size: int, length: int = 0) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self._length = length
+        self._lock = threading.Lock()
+        self._file = tempfile.TemporaryFile()  # noqa: SIM115
+        # chunk index -> (offset, size) of the chunks written to the file
+        self._spilled: dict[int, tuple[int, int]] = {}
+        # chunks still in memory, with _UNSET for the items not set yet
+        self._chunks: dict[int, list[Any]] = {}
+        self._unset_counts: dict[int, int] = {}
+        self._cached_chunk: Optional[tuple[int, list[Any]]] = None
+        # applied to the items read through a view, see map
+        self._transform: Optional[Callable[[Any], Any]] = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Any]: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        index = self._normalize_index(index)
+        with self._lock:
+            item = self._load_chunk(index // self.chunk_size)[index % self.chunk_size]
+        return self._read(item)
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        self._check_writable()
+        index = self._normalize_index(index)
+        with self._lock:
+            self._set(index, value)
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk_index in range((self._length + self.chunk_size - 1) // self.chunk_size):
+            with self._lock:
+                chunk = self._load_chunk(chunk_index)
+            start = chunk_index * self.chunk_size
+            for item in chunk[: self._length - start]:
+                yield self._read(item)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, value: Any) -> None:
+        self._check_writable()
+        with self._lock:
+            self._length += 1
+            self._set(self._length - 1, value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.append(value)
+
+    def map(self, func: Callable[[Any], Any]) -> "SpilledArray":
+        """
+        Return a read-only view of the array applying func to every item read, without copying the items.
+        The view shares the temporary file of the array, closing either one closes both.
+        """
+        view = copy.copy(self)
+        transform = self._transform
+        view._transform = func if transform is None else lambda item: func(transform(item))
+        view._cached_chunk = None
+        return view
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _read(self, item: Any) -> Any:
+        if item is _UNSET:
+            return None
+        return item if self._transform is None else self._transform(item)
+
+    def _check_writable(self) -> None:
+        if self._transform is not None:
+            raise TypeError("SpilledArray view is read-only")
+
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("SpilledArray index out of range")
+        return index
+
+    def _set(self, index: int, value: Any) -> None:
+        chunk_index, offset = divmod(index, self.chunk_size)
+        if chunk_index in self._spilled:
+            # items of a written chunk are rarely set again, write the chunk again with the new item
+            written_chunk = list(self._load_chunk(chunk_index))
+            written_chunk[offset] = value
+            self._write_chunk(chunk_index, written_chunk)
+            return
+
+        chunk = self._chunks.get(chunk_index)
+        if chunk is None:
+            chunk = self._chunks[chunk_index] = [_UNSET] * self.chunk_size
+            self._unset_counts[chunk_index] = self.chunk_size
+        if chunk[offset] is _UNSET:
+            self._unset_counts[chunk_index] -= 1
+        chunk[offset] = value
+
+        if not self._unset_counts[chunk_index]:
+            del self._chunks[chunk_index]
+            del self._unset_counts[chunk_index]
+            self._write_chunk(chunk_index, chunk)
+
+    def _write_chunk(self, chunk_index: int, chunk: list[Any]) -> None:
+        data = pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.seek(0, 2)
+        self._spilled[chunk_index] = (self._file.tell(), len(data))
+        self._file.write(data)
+        if self._cached_chunk is not None and self._cached_chunk[0] == chunk_index:
+            self._cached_chunk = None
+
+    def _load_chunk(self, chunk_index: int) -> list[Any]:
+        chunk = self._chunks.get(chunk_index)
+        if chunk is not None:
+            return chunk
+        if chunk_index not in self._spilled:
+            return [_UNSET] * self.chunk_size
+        if self._cached_chunk is not None and self._cached_chunk[0] == chunk_index:
+            return self._cached_chunk[1]
+
+        offset, size = self._spilled[chunk_index]
+        self._file.seek(offset)
+        loaded_chunk: list[Any] = pickle.loads(self._file.read(size))
+        self._cached_chunk = (chunk_index, loaded_chunk)
+        return loaded_chunk
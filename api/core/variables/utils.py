@@ -0,0 +1,109 @@
+import json
+import sys
+from collections.abc import Mapping
+from itertools import islice
+from typing import Any
+
+from pydantic import BaseModel
+
+from .spilled_array import SpilledArray
+
+
+def deep_getsizeof(value: Any) -> int:
+    """
+    Return the size in bytes of a value and of all the objects it contains, counting shared objects once.
+    """
+    size = 0
+    seen: set[int] = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, Mapping):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, list | tuple | set | frozenset):
+            stack.extend(obj)
+        elif isinstance(obj, BaseModel):
+            stack.append(obj.__dict__)
+    return size
+
+
+def truncate_value(value: Any, max_length: int) -> Any:
+    """
+    Return a preview of a value for logs, cutting the strings longer than max_length characters and the arrays
+    longer than max_length items, at any depth. Cut strings end with a note of their length, cut arrays keep
+    only items of their own so they still match the type of the variable.
+    """
+    if isinstance(value, str):
+        if len(value) <= max_length:
+            return value
+        return f"{value[:max_length]}...[truncated, {len(value)} characters in total]"
+    if isinstance(value, Mapping):
+        return {key: truncate_value(item, max_length) for key, item in value.items()}
+    if isinstance(value, list | tuple | SpilledArray):
+        # a spilled array is read one chunk at a time up to max_length items
+        return [truncate_value(item, max_length) for item in islice(value, max_length)]
+    return value
+
+
+def preview_spilled_arrays(value: Any, max_length: int) -> Any:
+    """
+    Replace the spilled arrays in a value with lists of their first max_length items, or of all their items if
+    max_length is 0, leaving the other values as they are.
+    """
+    if isinstance(value, SpilledArray):
+        return list(islice(value, max_length)) if max_length else list(value)
+    if isinstance(value, Mapping):
+        return {key: preview_spilled_arrays(item, max_length) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [preview_spilled_arrays(item, max_length) for item in value]
+    return value
+
+
+class _SpilledArrayFoundError(Exception):
+    pass
+
+
+class _SpilledArrayList(list):  # noqa: FURB189
+    """
+    Empty list standing for a spilled array, iterated by the pure python json encoder one chunk at a time.
+    It subclasses list since the encoder only encodes lists and tuples as json arrays.
+    """
+
+    def __init__(self, array: SpilledArray) -> None:
+        super().__init__()
+        self._array = array
+
+    def __iter__(self):
+        return iter(self._array)
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+
+def _find_spilled_array(obj: Any) -> Any:
+    if isinstance(obj, SpilledArray):
+        raise _SpilledArrayFoundError
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _encode_spilled_array(obj: Any) -> Any:
+    if isinstance(obj, SpilledArray):
+        return _SpilledArrayList(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dump_json(value: Any) -> str:
+    """
+    Serialize a value to json like json.dumps, reading the spilled arrays in it one chunk at a time instead of
+    building lists of all their items.
+    """
+    try:
+        return json.dumps(value, default=_find_spilled_array)
+    except _SpilledArrayFoundError:
+        # the C encoder reads lists directly, only the pure python one iterates over them
+        return "".join(json.JSONEncoder(default=_encode_spilled_array).iterencode(value))
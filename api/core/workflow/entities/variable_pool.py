@@ -1,20 +1,51 @@
+import json
+import logging
 import re
+import threading
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Any, Union
+from typing import Any, Optional, Union
+from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
+from configs import dify_config
 from core.file import File, FileAttribute, file_manager
-from core.variables import Segment, SegmentGroup, Variable
-from core.variables.segments import FileSegment
+from core.helper.lru_cache import LRUCache
+from core.variables import Segment, SegmentGroup, SpilledArray, Variable
+from core.variables.segments import (
+    ArrayAnySegment,
+    ArrayNumberSegment,
+    ArrayObjectSegment,
+    ArrayStringSegment,
+    FileSegment,
+    ObjectSegment,
+    StringSegment,
+)
+from extensions.ext_storage import storage
 from factories import variable_factory
 
 from ..constants import CONVERSATION_VARIABLE_NODE_ID, ENVIRONMENT_VARIABLE_NODE_ID, SYSTEM_VARIABLE_NODE_ID
 from ..enums import SystemVariableKey
 
+logger = logging.getLogger(__name__)
+
 VariableValue = Union[str, int, float, dict, list, File]
 
+# segments whose value can be written to the storage as json
+_SPILLABLE_SEGMENT_TYPES = (
+    StringSegment,
+    ObjectSegment,
+    ArrayAnySegment,
+    ArrayStringSegment,
+    ArrayNumberSegment,
+    ArrayObjectSegment,
+)
+# smaller variables are kept in memory even when the memory budget is reached
+_MIN_SPILL_SIZE = 64 * 1024
+# the spilled variables read last stay loaded, as a node usually reads its inputs more than once
+_LOADED_SPILLED_VARIABLES = 2
+
 
 VARIABLE_PATTERN = re.compile(r"\{\{#([a-zA-Z0-9_]{1,50}(?:\.[a-zA-Z_][a-zA-Z0-9_]{0,29}){1,10})#\}\}")
 
@@ -43,6 +74,14 @@ class VariablePool(BaseModel):
         description="Conversation variables.",
         default_factory=list,
     )
+    # A child pool only stores its own writes and removals, see create_child
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed_node_ids: set[str] = PrivateAttr(default_factory=set)
+    _removed_keys: set[tuple[str, int]] = PrivateAttr(default_factory=set)
+    # memory accounting shared with the child pools, see _add_key
+    _memory: "_PoolMemory" = PrivateAttr(default_factory=lambda: _PoolMemory())
+    _variable_sizes: dict[tuple[str, int], int] = PrivateAttr(default_factory=dict)
+    _spilled_variables: dict[tuple[str, int], "_SpilledVariable"] = PrivateAttr(default_factory=dict)
 
     def __init__(
         self,
@@ -104,7 +143,7 @@ class VariablePool(BaseModel):
             variable = variable_factory.segment_to_variable(segment=segment, selector=selector)
 
         hash_key = hash(tuple(selector[1:]))
-        self.variable_dictionary[selector[0]][hash_key] = variable
+        self._add_key(selector[0], hash_key, variable)
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -123,7 +162,9 @@ class VariablePool(BaseModel):
             return None
 
         hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._lookup(selector[0], hash_key)
+        if isinstance(value, _SpilledVariable):
+            value = self._load_spilled(value)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -153,9 +194,148 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            for key in [key for key in self._spilled_variables if key[0] == selector[0]]:
+                del self._spilled_variables[key]
+            with self._memory.lock:
+                for key in [key for key in self._variable_sizes if key[0] == selector[0]]:
+                    self._memory.usage -= self._variable_sizes.pop(key)
+            if self._parent is not None:
+                self._removed_node_ids.add(selector[0])
+                self._removed_keys = {key for key in self._removed_keys if key[0] != selector[0]}
             return
         hash_key = hash(tuple(selector[1:]))
-        self.variable_dictionary[selector[0]].pop(hash_key, None)
+        self._remove_key(selector[0], hash_key)
+
+    def create_child(self) -> "VariablePool":
+        """
+        Create a copy-on-write child of this pool.
+
+        The child reads the variables of this pool without copying them and keeps its own writes and
+        removals to itself, so parallel iterations and branches can share one large pool cheaply.
+        Segments are frozen and nodes assign a variable by adding a new segment, so sharing the segments,
+        environment and conversation variables of this pool is safe: a variable assigned in the child,
+        conversation variables included, only changes in the child.
+        The parent must not remove variables the child still reads while the child is in use.
+        The variables of the child count against the memory budget of the parent until it is discarded.
+
+        Returns:
+            VariablePool: The child pool.
+        """
+        child = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=tuple(self.environment_variables),
+            conversation_variables=tuple(self.conversation_variables),
+        )
+        child._parent = self
+        child._memory = self._memory
+        return child
+
+    def discard(self) -> None:
+        """
+        Give back the share of the memory budget taken by the variables of this child pool, once it is not used
+        anymore.
+        """
+        with self._memory.lock:
+            self._memory.usage -= sum(self._variable_sizes.values())
+            self._variable_sizes.clear()
+
+    @property
+    def memory_usage(self) -> int:
+        """
+        Size in bytes of the variables kept in memory by this pool, its parent and its child pools.
+        """
+        return self._memory.usage
+
+    def release_spilled(self) -> None:
+        """
+        Delete the variables of this pool and its child pools spilled to the storage, once the run is over.
+        """
+        memory = self._memory
+        with memory.lock:
+            memory.loaded.cache.clear()
+        while memory.spilled_keys:
+            storage_key = memory.spilled_keys.pop()
+            try:
+                storage.delete(storage_key)
+            except Exception:
+                logger.exception("Failed to delete spilled workflow variable %s", storage_key)
+
+    def _add_key(self, node_id: str, hash_key: int, variable: "Segment | _SpilledVariable") -> None:
+        key = (node_id, hash_key)
+        memory = self._memory
+        with memory.lock:
+            memory.usage -= self._variable_sizes.pop(key, 0)
+
+        if isinstance(variable, _SPILLABLE_SEGMENT_TYPES) and not isinstance(variable.value, SpilledArray):
+            budget = dify_config.WORKFLOW_VARIABLE_POOL_MEMORY_BUDGET
+            threshold = dify_config.WORKFLOW_VARIABLE_SPILL_THRESHOLD
+            if budget or threshold:
+                size = variable.size
+                if (threshold and size >= threshold) or (
+                    budget and size >= _MIN_SPILL_SIZE and memory.usage + size > budget
+                ):
+                    variable = self._spill(variable) or variable
+                if isinstance(variable, Segment):
+                    with memory.lock:
+                        memory.usage += size
+                        self._variable_sizes[key] = size
+
+        if isinstance(variable, _SpilledVariable):
+            self.variable_dictionary[node_id].pop(hash_key, None)
+            self._spilled_variables[key] = variable
+        else:
+            self.variable_dictionary[node_id][hash_key] = variable
+            self._spilled_variables.pop(key, None)
+        self._removed_keys.discard(key)
+
+    def _remove_key(self, node_id: str, hash_key: int) -> None:
+        self.variable_dictionary[node_id].pop(hash_key, None)
+        self._spilled_variables.pop((node_id, hash_key), None)
+        with self._memory.lock:
+            self._memory.usage -= self._variable_sizes.pop((node_id, hash_key), 0)
+        if self._parent is not None:
+            self._removed_keys.add((node_id, hash_key))
+
+    def _spill(self, variable: Segment) -> Optional["_SpilledVariable"]:
+        try:
+            data = json.dumps(variable.value, ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError):
+            return None
+
+        storage_key = f"workflow_variables/{uuid4()}.json"
+        try:
+            storage.save(storage_key, data)
+        except Exception:
+            # the variable is kept in memory, the run goes on over its budget
+            logger.exception("Failed to spill workflow variable of %d bytes", len(data))
+            return None
+        self._memory.spilled_keys.append(storage_key)
+        return _SpilledVariable(variable, storage_key)
+
+    def _load_spilled(self, variable: "_SpilledVariable") -> Segment:
+        memory = self._memory
+        with memory.lock:
+            segment: Optional[Segment] = memory.loaded.get(variable.storage_key)
+        if segment is None:
+            segment = variable.load()
+            with memory.lock:
+                memory.loaded.put(variable.storage_key, segment)
+        return segment
+
+    def _lookup(self, node_id: str, hash_key: int) -> "Segment | _SpilledVariable | None":
+        variables = self.variable_dictionary.get(node_id)
+        if variables is not None:
+            value = variables.get(hash_key)
+            if value is not None:
+                return value
+        spilled_variable = self._spilled_variables.get((node_id, hash_key))
+        if spilled_variable is not None:
+            return spilled_variable
+        if self._parent is None or node_id in self._removed_node_ids or (node_id, hash_key) in self._removed_keys:
+            return None
+        return self._parent._lookup(node_id, hash_key)
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
@@ -172,3 +352,32 @@ class VariablePool(BaseModel):
         if isinstance(segment, FileSegment):
             return segment
         return None
+
+
+class _PoolMemory:
+    """
+    Memory accounting and spilled variables of a pool, shared with its child pools.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # size in bytes of the variables kept in memory
+        self.usage = 0
+        # storage keys of the spilled variables, deleted by release_spilled
+        self.spilled_keys: list[str] = []
+        # storage key -> segment of the spilled variables read last
+        self.loaded = LRUCache(_LOADED_SPILLED_VARIABLES)
+
+
+class _SpilledVariable:
+    """
+    Placeholder of a variable whose value was written to the storage, see VariablePool._load_spilled.
+    """
+
+    def __init__(self, variable: Segment, storage_key: str) -> None:
+        self.variable = variable.model_copy(update={"value": None})
+        self.storage_key = storage_key
+
+    def load(self) -> Segment:
+        value = json.loads(storage.load_once(self.storage_key))
+        return self.variable.model_copy(update={"value": value})
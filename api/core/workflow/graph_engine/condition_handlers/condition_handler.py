@@ -1,7 +1,6 @@
 from core.workflow.graph_engine.condition_handlers.base_handler import RunConditionHandler
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
-from core.workflow.utils.condition.processor import ConditionProcessor
 
 
 class ConditionRunConditionHandlerHandler(RunConditionHandler):
@@ -17,11 +16,8 @@ class ConditionRunConditionHandlerHandler(RunConditionHandler):
             return True
 
         # process condition
-        condition_processor = ConditionProcessor()
-        _, _, final_result = condition_processor.process_conditions(
-            variable_pool=graph_runtime_state.variable_pool,
-            conditions=self.condition.conditions,
-            operator="and",
+        _, _, final_result = self.condition.compiled_conditions.evaluate(
+            graph_runtime_state.variable_pool, record_inputs=False
         )
 
         return final_result
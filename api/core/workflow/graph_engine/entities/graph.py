@@ -1,17 +1,22 @@
+import threading
 import uuid
 from collections import defaultdict
-from collections.abc import Mapping
-from typing import Any, Optional, cast
+from collections.abc import Mapping, Sequence
+from typing import Any, Literal, Optional, cast
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from configs import dify_config
+from core.helper.lru_cache import LRUCache
+from core.workflow.graph_engine.entities.reachability_index import ReachabilityIndex
 from core.workflow.graph_engine.entities.run_condition import RunCondition
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.answer.answer_stream_generate_router import AnswerStreamGeneratorRouter
 from core.workflow.nodes.answer.entities import AnswerStreamGenerateRoute
 from core.workflow.nodes.end.end_stream_generate_router import EndStreamGeneratorRouter
 from core.workflow.nodes.end.entities import EndStreamParam
+from core.workflow.utils.condition.entities import Condition
+from core.workflow.utils.condition.processor import CompiledConditions
 
 
 class GraphEdge(BaseModel):
@@ -33,6 +38,8 @@ class GraphParallel(BaseModel):
 
 
 class Graph(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     root_node_id: str = Field(..., description="root node id of the graph")
     node_ids: list[str] = Field(default_factory=list, description="graph node ids")
     node_id_config_mapping: dict[str, dict] = Field(
@@ -53,6 +60,11 @@ class Graph(BaseModel):
     answer_stream_generate_routes: AnswerStreamGenerateRoute = Field(..., description="answer stream generate routes")
     end_stream_param: EndStreamParam = Field(..., description="end stream param")
 
+    # conditions of the nodes compiled on their first run, see get_compiled_conditions
+    _compiled_conditions: dict[str, CompiledConditions] = PrivateAttr(default_factory=dict)
+    # built on first use, see reachability_index
+    _reachability_index: Optional[ReachabilityIndex] = PrivateAttr(default=None)
+
     @classmethod
     def init(cls, graph_config: Mapping[str, Any], root_node_id: Optional[str] = None) -> "Graph":
         """
@@ -204,6 +216,58 @@ class Graph(BaseModel):
 
         return graph
 
+    @classmethod
+    def init_cached(
+        cls, graph_config: Mapping[str, Any], cache_key: str, root_node_id: Optional[str] = None
+    ) -> "Graph":
+        """
+        Init graph, reusing the graph compiled before for the same cache key and root node in this process.
+
+        The returned graph is shared by concurrent runs and must not be modified.
+
+        :param graph_config: graph config
+        :param cache_key: key that changes whenever the graph config changes, e.g. Workflow.unique_hash
+        :param root_node_id: root node id
+        :return: graph
+        """
+        if _graph_cache is None:
+            return cls.init(graph_config=graph_config, root_node_id=root_node_id)
+
+        key = (cache_key, root_node_id)
+        with _graph_cache_lock:
+            graph = cast(Optional[Graph], _graph_cache.get(key))
+        if graph is None:
+            graph = cls.init(graph_config=graph_config, root_node_id=root_node_id)
+            with _graph_cache_lock:
+                _graph_cache.put(key, graph)
+        return graph
+
+    @property
+    def reachability_index(self) -> ReachabilityIndex:
+        """
+        Reachability index of the graph, built on first use and shared by the runs of the graph.
+        """
+        if self._reachability_index is None:
+            self._reachability_index = ReachabilityIndex(self)
+        return self._reachability_index
+
+    def get_compiled_conditions(
+        self, key: str, conditions: Sequence[Condition], operator: Literal["and", "or"]
+    ) -> CompiledConditions:
+        """
+        Get the conditions compiled for the key, compiling them on the first call for the graph.
+
+        :param key: key of the conditions in the graph, e.g. the node id and the case id of an if-else case
+        :param conditions: conditions
+        :param operator: logical operator of the conditions
+        :return: compiled conditions
+        """
+        compiled = self._compiled_conditions.get(key)
+        if compiled is None:
+            # concurrent runs sharing the graph may both compile, either result is kept
+            compiled = self._compiled_conditions[key] = CompiledConditions(conditions=conditions, operator=operator)
+        return compiled
+
     def add_extra_edge(
         self, source_node_id: str, target_node_id: str, run_condition: Optional[RunCondition] = None
     ) -> None:
@@ -228,6 +292,8 @@ class Graph(BaseModel):
         )
 
         self.edge_mapping[source_node_id].append(graph_edge)
+        # the branches reachable changed
+        self._reachability_index = None
 
     def get_leaf_node_ids(self) -> list[str]:
         """
@@ -717,3 +783,8 @@ class Graph(BaseModel):
                 return True
 
         return False
+
+
+# compiled graphs of this process, see Graph.init_cached
+_graph_cache = LRUCache(dify_config.WORKFLOW_GRAPH_CACHE_SIZE) if dify_config.WORKFLOW_GRAPH_CACHE_SIZE else None
+_graph_cache_lock = threading.Lock()
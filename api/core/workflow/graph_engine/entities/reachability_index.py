@@ -0,0 +1,93 @@
+from collections.abc import Iterable, Mapping, Sequence
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from core.workflow.graph_engine.entities.graph import Graph
+
+
+class ReachabilityIndex:
+    """
+    Reachability and dependency index of a graph, built once per graph for the stream processors.
+
+    Sets of nodes are bitsets: python ints with the bit of each node of the graph set. The nodes reachable in
+    a branch are computed once per branch and then shared by every run of the graph, and the stream
+    processors prune their set of remaining nodes incrementally, so checking whether a node or all the
+    dependencies of an answer or end node are finished is a single bit operation.
+    """
+
+    def __init__(self, graph: "Graph") -> None:
+        self.node_ids = list(graph.node_ids)
+        self._bits = {node_id: 1 << i for i, node_id in enumerate(self.node_ids)}
+        self.all_nodes = (1 << len(self.node_ids)) - 1
+        self._root_node_id = graph.root_node_id
+        self._edge_mapping = graph.edge_mapping
+        self._branch_reachable: dict[tuple[str, Optional[str]], int] = {}
+        self.answer_dependencies = self._masks(graph.answer_stream_generate_routes.answer_dependencies)
+        self.end_dependencies = self._masks(graph.end_stream_param.end_dependencies)
+
+    def bit(self, node_id: str) -> int:
+        return self._bits.get(node_id, 0)
+
+    def mask(self, node_ids: Iterable[str]) -> int:
+        mask = 0
+        for node_id in node_ids:
+            mask |= self._bits.get(node_id, 0)
+        return mask
+
+    def reachable_in_branch(self, node_id: str, branch_identify: Optional[str] = None) -> int:
+        """
+        Nodes reachable from the node, following the edges without a branch or of the given branch, and never
+        going back to the root node. The node itself is only included when a path leads back to it.
+        """
+        key = (node_id, branch_identify)
+        reachable = self._branch_reachable.get(key)
+        if reachable is not None:
+            return reachable
+
+        reachable = 0
+        stack = [node_id]
+        visited = {node_id}
+        while stack:
+            for edge in self._edge_mapping.get(stack.pop(), []):
+                if edge.target_node_id == self._root_node_id:
+                    continue
+                if edge.run_condition and edge.run_condition.branch_identify:
+                    if not branch_identify or edge.run_condition.branch_identify != branch_identify:
+                        continue
+                reachable |= self._bits.get(edge.target_node_id, 0)
+                if edge.target_node_id not in visited:
+                    visited.add(edge.target_node_id)
+                    stack.append(edge.target_node_id)
+
+        # concurrent runs sharing the graph may both compute it, the results are the same
+        self._branch_reachable[key] = reachable
+        return reachable
+
+    def prune_branch(self, rest: int, node_id: str, reachable: int) -> int:
+        """
+        Remove from the remaining nodes the node and the remaining nodes after it, stopping at the nodes still
+        reachable and at the nodes already removed.
+
+        :param rest: bitset of the remaining nodes
+        :param node_id: first node of the branch not taken
+        :param reachable: bitset of the nodes reachable in the branch taken
+        :return: bitset of the remaining nodes
+        """
+        if not rest & self.bit(node_id):
+            return rest
+
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            bit = self._bits[current]
+            if not rest & bit:
+                continue
+            rest &= ~bit
+            for edge in self._edge_mapping.get(current, []):
+                target_bit = self._bits.get(edge.target_node_id, 0)
+                if target_bit and rest & target_bit and not reachable & target_bit:
+                    stack.append(edge.target_node_id)
+        return rest
+
+    def _masks(self, dependencies: Mapping[str, Sequence[str]]) -> dict[str, int]:
+        return {node_id: self.mask(dependency_ids) for node_id, dependency_ids in dependencies.items()}
@@ -1,9 +1,10 @@
 import hashlib
 from typing import Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from core.workflow.utils.condition.entities import Condition
+from core.workflow.utils.condition.processor import CompiledConditions
 
 
 class RunCondition(BaseModel):
@@ -16,6 +17,15 @@ class RunCondition(BaseModel):
     conditions: Optional[list[Condition]] = None
     """conditions to run the node, required when type is condition"""
 
+    _compiled_conditions: Optional[CompiledConditions] = PrivateAttr(default=None)
+
+    @property
+    def compiled_conditions(self) -> CompiledConditions:
+        """conditions compiled on first use, for the run condition kept by the graph across runs"""
+        if self._compiled_conditions is None:
+            self._compiled_conditions = CompiledConditions(conditions=self.conditions or [], operator="and")
+        return self._compiled_conditions
+
     @property
     def hash(self) -> str:
         return hashlib.sha256(self.model_dump_json().encode()).hexdigest()
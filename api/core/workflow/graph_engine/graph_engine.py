@@ -3,8 +3,8 @@ import queue
 import time
 import uuid
 from collections.abc import Generator, Mapping
-from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from concurrent.futures import Future, wait
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -38,6 +38,7 @@ from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.graph_engine.workflow_execution_pool import get_workflow_execution_pool
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.answer.answer_stream_processor import AnswerStreamProcessor
 from core.workflow.nodes.answer.base_stream_processor import StreamProcessor
@@ -54,24 +55,26 @@ from models.workflow import WorkflowNodeExecutionStatus, WorkflowType
 logger = logging.getLogger(__name__)
 
 
-class GraphEngineThreadPool(ThreadPoolExecutor):
-    def __init__(
-        self,
-        max_workers=None,
-        thread_name_prefix="",
-        initializer=None,
-        initargs=(),
-        max_submit_count=dify_config.MAX_SUBMIT_COUNT,
-    ) -> None:
-        super().__init__(max_workers, thread_name_prefix, initializer, initargs)
+class GraphEngineThreadPool:
+    """
+    Submissions of a workflow run to the process-wide workflow execution pool, bounded by max_submit_count.
+    """
+
+    def __init__(self, tenant_id: str, app_id: str, max_submit_count: int = dify_config.MAX_SUBMIT_COUNT) -> None:
+        self.tenant_id = tenant_id
+        self.app_id = app_id
         self.max_submit_count = max_submit_count
         self.submit_count = 0
 
-    def submit(self, fn, /, *args, **kwargs):
+    def submit(self, fn, /, *args, **kwargs) -> Future:
         self.submit_count += 1
         self.check_is_full()
 
-        return super().submit(fn, *args, **kwargs)
+        try:
+            return get_workflow_execution_pool().submit(self.tenant_id, self.app_id, fn, *args, **kwargs)
+        except ValueError:
+            self.submit_count -= 1
+            raise
 
     def task_done_callback(self, future):
         self.submit_count -= 1
@@ -102,7 +105,6 @@ class GraphEngine:
         thread_pool_id: Optional[str] = None,
     ) -> None:
         thread_pool_max_submit_count = dify_config.MAX_SUBMIT_COUNT
-        thread_pool_max_workers = 10
 
         # init thread pool
         if thread_pool_id:
@@ -114,7 +116,7 @@ class GraphEngine:
             self.is_main_thread_pool = False
         else:
             self.thread_pool = GraphEngineThreadPool(
-                max_workers=thread_pool_max_workers, max_submit_count=thread_pool_max_submit_count
+                tenant_id=tenant_id, app_id=app_id, max_submit_count=thread_pool_max_submit_count
             )
             self.thread_pool_id = str(uuid.uuid4())
             self.is_main_thread_pool = True
@@ -848,11 +850,11 @@ class GraphEngine:
     def create_copy(self):
         """
         create a graph engine copy
-        :return: with a new variable pool instance of graph engine
+        :return: with a new copy-on-write child of the variable pool of graph engine
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.create_child()
         return new_instance
 
     def _handle_continue_on_error(
@@ -0,0 +1,198 @@
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from configs import dify_config
+from core.helper.tenant_fair_queue import TenantFairQueue, WorkItem
+
+
+class _WorkItem(WorkItem):
+    def __init__(
+        self, tenant_id: str, app_id: str, future: Future, fn: Callable, args: tuple, kwargs: dict[str, Any]
+    ) -> None:
+        super().__init__(tenant_id, future, fn, args, kwargs)
+        self.app_id = app_id
+
+
+class WorkflowExecutionPool:
+    """
+    Bounded thread pool shared by the parallel branches and parallel iterations of all workflow runs of a process.
+
+    Tasks are queued per tenant and taken round-robin across tenants, and a tenant or an app never runs more
+    tasks at once than its configured limit. Tasks submitted from a task of the pool belong to a run that
+    already holds a worker: they get a worker reserved right away when the limits allow it and otherwise run
+    inline in the submitting task, so a task waiting on the tasks it submitted can never deadlock the pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        max_workers_per_tenant: int = 0,
+        max_workers_per_app: int = 0,
+        thread_name_prefix: str = "workflow",
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_workers_per_tenant = max_workers_per_tenant
+        self.max_workers_per_app = max_workers_per_app
+        self._thread_name_prefix = thread_name_prefix
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._queue: TenantFairQueue[_WorkItem] = TenantFairQueue()
+        self._reserved: deque[_WorkItem] = deque()
+        self._workers: list[threading.Thread] = []
+        self._idle_workers = 0
+        # tasks holding a worker, including the reserved ones no worker picked up yet
+        self._active = 0
+        self._tenant_active: dict[str, int] = {}
+        self._app_active: dict[str, int] = {}
+        self._completed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._inline = 0
+        self._shutdown = False
+
+    def submit(self, tenant_id: str, app_id: str, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        item = _WorkItem(tenant_id, app_id, future, fn, args, kwargs)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Workflow execution pool is shut down.")
+
+            if getattr(self._local, "is_worker", False):
+                if not self._can_start(item):
+                    self._inline += 1
+                    run_inline = True
+                else:
+                    self._acquire(item)
+                    self._reserved.append(item)
+                    run_inline = False
+            else:
+                if len(self._queue) >= self.max_queue_size:
+                    self._rejected += 1
+                    raise ValueError(f"Max queue size {self.max_queue_size} of workflow execution pool reached.")
+
+                self._queue.put(item)
+                run_inline = False
+
+            if not run_inline:
+                if (
+                    self._idle_workers < len(self._queue) + len(self._reserved)
+                    and len(self._workers) < self.max_workers
+                ):
+                    worker = threading.Thread(
+                        target=self._work, name=f"{self._thread_name_prefix}_{len(self._workers)}", daemon=True
+                    )
+                    self._workers.append(worker)
+                    worker.start()
+                self._condition.notify()
+
+        if run_inline:
+            item.run()
+        return future
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "workers": len(self._workers),
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._queue.max_depth,
+                "queued_tenants": self._queue.tenant_count,
+                "active_tenants": len(self._tenant_active),
+                "active_apps": len(self._app_active),
+                "completed": self._completed,
+                "cancelled": self._cancelled,
+                "rejected": self._rejected,
+                "inline": self._inline,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _can_start(self, item: _WorkItem) -> bool:
+        if self._active >= self.max_workers:
+            return False
+        if self.max_workers_per_tenant and self._tenant_active.get(item.tenant_id, 0) >= self.max_workers_per_tenant:
+            return False
+        if self.max_workers_per_app and self._app_active.get(item.app_id, 0) >= self.max_workers_per_app:
+            return False
+        return True
+
+    def _acquire(self, item: _WorkItem) -> None:
+        self._active += 1
+        self._tenant_active[item.tenant_id] = self._tenant_active.get(item.tenant_id, 0) + 1
+        self._app_active[item.app_id] = self._app_active.get(item.app_id, 0) + 1
+
+    def _release(self, item: _WorkItem) -> None:
+        self._active -= 1
+        for active, key in ((self._tenant_active, item.tenant_id), (self._app_active, item.app_id)):
+            if active[key] > 1:
+                active[key] -= 1
+            else:
+                del active[key]
+
+    def _take_queued(self) -> Optional[_WorkItem]:
+        if self._active >= self.max_workers:
+            return None
+        # the oldest task of the next tenant whose app is below its limit
+        item = self._queue.take(self._can_start)
+        if item is not None:
+            self._acquire(item)
+        return item
+
+    def _next_item(self) -> Optional[_WorkItem]:
+        with self._condition:
+            while True:
+                if self._reserved:
+                    return self._reserved.popleft()
+                item = self._take_queued()
+                if item is not None:
+                    return item
+                if self._shutdown:
+                    return None
+                self._idle_workers += 1
+                self._condition.wait()
+                self._idle_workers -= 1
+
+    def _work(self) -> None:
+        self._local.is_worker = True
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            # the worker that frees a slot takes the next task itself, no other worker needs waking
+            ran = item.run()
+            with self._condition:
+                self._release(item)
+                if ran:
+                    self._completed += 1
+                else:
+                    self._cancelled += 1
+
+
+_workflow_execution_pool: Optional[WorkflowExecutionPool] = None
+_workflow_execution_pool_lock = threading.Lock()
+
+
+def get_workflow_execution_pool() -> WorkflowExecutionPool:
+    global _workflow_execution_pool
+    if _workflow_execution_pool is None:
+        with _workflow_execution_pool_lock:
+            if _workflow_execution_pool is None:
+                _workflow_execution_pool = WorkflowExecutionPool(
+                    max_workers=dify_config.WORKFLOW_EXECUTION_POOL_MAX_WORKERS,
+                    max_queue_size=dify_config.WORKFLOW_EXECUTION_POOL_MAX_QUEUE_SIZE,
+                    max_workers_per_tenant=dify_config.WORKFLOW_EXECUTION_POOL_MAX_WORKERS_PER_TENANT,
+                    max_workers_per_app=dify_config.WORKFLOW_EXECUTION_POOL_MAX_WORKERS_PER_APP,
+                )
+    return _workflow_execution_pool
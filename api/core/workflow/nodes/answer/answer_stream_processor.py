@@ -30,7 +30,7 @@ class AnswerStreamProcessor(StreamProcessor):
     def process(self, generator: Generator[GraphEngineEvent, None, None]) -> Generator[GraphEngineEvent, None, None]:
         for event in generator:
             if isinstance(event, NodeRunStartedEvent):
-                if event.route_node_state.node_id == self.graph.root_node_id and not self.rest_node_ids:
+                if event.route_node_state.node_id == self.graph.root_node_id and not self.rest_nodes:
                     self.reset()
 
                 yield event
@@ -71,7 +71,7 @@ class AnswerStreamProcessor(StreamProcessor):
         self.route_position = {}
         for answer_node_id, route_chunks in self.generate_routes.answer_generate_route.items():
             self.route_position[answer_node_id] = 0
-        self.rest_node_ids = self.graph.node_ids.copy()
+        self.rest_nodes = self.reachability_index.all_nodes
         self.current_stream_chunk_generating_node_ids = {}
 
     def _generate_stream_outputs_when_node_finished(
@@ -85,11 +85,8 @@ class AnswerStreamProcessor(StreamProcessor):
         for answer_node_id, position in self.route_position.items():
             # all depends on answer node id not in rest node ids
             if event.route_node_state.node_id != answer_node_id and (
-                answer_node_id not in self.rest_node_ids
-                or not all(
-                    dep_id not in self.rest_node_ids
-                    for dep_id in self.generate_routes.answer_dependencies[answer_node_id]
-                )
+                not self._is_rest_node(answer_node_id)
+                or self.rest_nodes & self.reachability_index.answer_dependencies[answer_node_id]
             ):
                 continue
 
@@ -153,13 +150,11 @@ class AnswerStreamProcessor(StreamProcessor):
 
         stream_out_answer_node_ids = []
         for answer_node_id, route_position in self.route_position.items():
-            if answer_node_id not in self.rest_node_ids:
+            if not self._is_rest_node(answer_node_id):
                 continue
 
             # all depends on answer node id not in rest node ids
-            if all(
-                dep_id not in self.rest_node_ids for dep_id in self.generate_routes.answer_dependencies[answer_node_id]
-            ):
+            if not self.rest_nodes & self.reachability_index.answer_dependencies[answer_node_id]:
                 if route_position >= len(self.generate_routes.answer_generate_route[answer_node_id]):
                     continue
 
@@ -1,7 +1,6 @@
 import logging
 from abc import ABC, abstractmethod
 from collections.abc import Generator
-from typing import Optional
 
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.graph_engine.entities.event import GraphEngineEvent, NodeRunExceptionEvent, NodeRunSucceededEvent
@@ -14,26 +13,31 @@ class StreamProcessor(ABC):
     def __init__(self, graph: Graph, variable_pool: VariablePool) -> None:
         self.graph = graph
         self.variable_pool = variable_pool
-        self.rest_node_ids = graph.node_ids.copy()
+        self.reachability_index = graph.reachability_index
+        # bitset of the nodes neither finished nor in a branch not taken, see ReachabilityIndex
+        self.rest_nodes = self.reachability_index.all_nodes
 
     @abstractmethod
     def process(self, generator: Generator[GraphEngineEvent, None, None]) -> Generator[GraphEngineEvent, None, None]:
         raise NotImplementedError
 
+    def _is_rest_node(self, node_id: str) -> bool:
+        return bool(self.rest_nodes & self.reachability_index.bit(node_id))
+
     def _remove_unreachable_nodes(self, event: NodeRunSucceededEvent | NodeRunExceptionEvent) -> None:
         finished_node_id = event.route_node_state.node_id
-        if finished_node_id not in self.rest_node_ids:
+        if not self._is_rest_node(finished_node_id):
             return
 
         # remove finished node id
-        self.rest_node_ids.remove(finished_node_id)
+        self.rest_nodes &= ~self.reachability_index.bit(finished_node_id)
 
         run_result = event.route_node_state.node_run_result
         if not run_result:
             return
 
         if run_result.edge_source_handle:
-            reachable_node_ids: list[str] = []
+            reachable_nodes = 0
             unreachable_first_node_ids: list[str] = []
             if finished_node_id not in self.graph.edge_mapping:
                 logger.warning(f"node {finished_node_id} has no edge mapping")
@@ -57,39 +61,11 @@ class StreamProcessor(ABC):
 
                     # The branch_identify parameter is added to ensure that
                     # only nodes in the correct logical branch are included.
-                    ids = self._fetch_node_ids_in_reachable_branch(edge.target_node_id, run_result.edge_source_handle)
-                    reachable_node_ids.extend(ids)
+                    reachable_nodes |= self.reachability_index.reachable_in_branch(
+                        edge.target_node_id, run_result.edge_source_handle
+                    )
                 else:
                     unreachable_first_node_ids.append(edge.target_node_id)
 
             for node_id in unreachable_first_node_ids:
-                self._remove_node_ids_in_unreachable_branch(node_id, reachable_node_ids)
-
-    def _fetch_node_ids_in_reachable_branch(self, node_id: str, branch_identify: Optional[str] = None) -> list[str]:
-        node_ids = []
-        for edge in self.graph.edge_mapping.get(node_id, []):
-            if edge.target_node_id == self.graph.root_node_id:
-                continue
-
-            # Only follow edges that match the branch_identify or have no run_condition
-            if edge.run_condition and edge.run_condition.branch_identify:
-                if not branch_identify or edge.run_condition.branch_identify != branch_identify:
-                    continue
-
-            node_ids.append(edge.target_node_id)
-            node_ids.extend(self._fetch_node_ids_in_reachable_branch(edge.target_node_id, branch_identify))
-        return node_ids
-
-    def _remove_node_ids_in_unreachable_branch(self, node_id: str, reachable_node_ids: list[str]) -> None:
-        """
-        remove target node ids until merge
-        """
-        if node_id not in self.rest_node_ids:
-            return
-
-        self.rest_node_ids.remove(node_id)
-        for edge in self.graph.edge_mapping.get(node_id, []):
-            if edge.target_node_id in reachable_node_ids:
-                continue
-
-            self._remove_node_ids_in_unreachable_branch(edge.target_node_id, reachable_node_ids)
+                self.rest_nodes = self.reachability_index.prune_branch(self.rest_nodes, node_id, reachable_nodes)
@@ -2,6 +2,7 @@ from collections.abc import Mapping, Sequence
 from typing import Any, Optional
 
 from configs import dify_config
+from core.helper.code_executor.code_execution_batcher import get_code_execution_batcher
 from core.helper.code_executor.code_executor import CodeExecutionError, CodeExecutor, CodeLanguage
 from core.helper.code_executor.code_node_provider import CodeNodeProvider
 from core.helper.code_executor.javascript.javascript_code_provider import JavascriptCodeProvider
@@ -52,11 +53,22 @@ class CodeNode(BaseNode[CodeNodeData]):
             variables[variable_name] = variable.to_object() if variable else None
         # Run code
         try:
-            result = CodeExecutor.execute_workflow_code_template(
-                language=code_language,
-                code=code,
-                inputs=variables,
-            )
+            if self._in_parallel_iteration():
+                # the runs of the other iterations running at the same time are sent to the sandbox together
+                result = get_code_execution_batcher().execute(
+                    tenant_id=self.tenant_id,
+                    workflow_id=self.workflow_id,
+                    node_id=self.node_id,
+                    language=code_language,
+                    code=code,
+                    inputs=variables,
+                )
+            else:
+                result = CodeExecutor.execute_workflow_code_template(
+                    language=code_language,
+                    code=code,
+                    inputs=variables,
+                )
 
             # Transform result
             result = self._transform_result(result=result, output_schema=self.node_data.outputs)
@@ -67,6 +79,16 @@ class CodeNode(BaseNode[CodeNodeData]):
 
         return NodeRunResult(status=WorkflowNodeExecutionStatus.SUCCEEDED, inputs=variables, outputs=result)
 
+    def _in_parallel_iteration(self) -> bool:
+        """
+        Whether the node is in the sub graph of an iteration running its items in parallel
+        """
+        nodes = {node.get("id"): node.get("data", {}) for node in self.graph_config.get("nodes", [])}
+        iteration_id = nodes.get(self.node_id, {}).get("iteration_id")
+        if not iteration_id:
+            return False
+        return bool(nodes.get(iteration_id, {}).get("is_parallel"))
+
     def _check_string(self, value: str | None, variable: str) -> str | None:
         """
         Check string
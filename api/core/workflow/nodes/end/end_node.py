@@ -1,6 +1,7 @@
 from collections.abc import Mapping, Sequence
 from typing import Any
 
+from core.variables import SpilledArray
 from core.workflow.entities.node_entities import NodeRunResult
 from core.workflow.nodes.base import BaseNode
 from core.workflow.nodes.end.entities import EndNodeData
@@ -22,7 +23,10 @@ class EndNode(BaseNode[EndNodeData]):
         outputs = {}
         for variable_selector in output_variables:
             variable = self.graph_runtime_state.variable_pool.get(variable_selector.value_selector)
-            value = variable.to_object() if variable is not None else None
+            value: Any = None
+            if variable is not None:
+                # a spilled array is written to the workflow run one chunk at a time
+                value = variable.value if isinstance(variable.value, SpilledArray) else variable.to_object()
             outputs[variable_selector.variable] = value
 
         return NodeRunResult(
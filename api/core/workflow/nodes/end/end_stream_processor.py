@@ -28,7 +28,7 @@ class EndStreamProcessor(StreamProcessor):
     def process(self, generator: Generator[GraphEngineEvent, None, None]) -> Generator[GraphEngineEvent, None, None]:
         for event in generator:
             if isinstance(event, NodeRunStartedEvent):
-                if event.route_node_state.node_id == self.graph.root_node_id and not self.rest_node_ids:
+                if event.route_node_state.node_id == self.graph.root_node_id and not self.rest_nodes:
                     self.reset()
 
                 yield event
@@ -80,7 +80,7 @@ class EndStreamProcessor(StreamProcessor):
         self.route_position = {}
         for end_node_id, _ in self.end_stream_param.end_stream_variable_selector_mapping.items():
             self.route_position[end_node_id] = 0
-        self.rest_node_ids = self.graph.node_ids.copy()
+        self.rest_nodes = self.reachability_index.all_nodes
         self.current_stream_chunk_generating_node_ids = {}
 
     def _generate_stream_outputs_when_node_finished(
@@ -94,10 +94,8 @@ class EndStreamProcessor(StreamProcessor):
         for end_node_id, position in self.route_position.items():
             # all depends on end node id not in rest node ids
             if event.route_node_state.node_id != end_node_id and (
-                end_node_id not in self.rest_node_ids
-                or not all(
-                    dep_id not in self.rest_node_ids for dep_id in self.end_stream_param.end_dependencies[end_node_id]
-                )
+                not self._is_rest_node(end_node_id)
+                or self.rest_nodes & self.reachability_index.end_dependencies[end_node_id]
             ):
                 continue
 
@@ -158,11 +156,11 @@ class EndStreamProcessor(StreamProcessor):
 
         stream_out_end_node_ids = []
         for end_node_id, route_position in self.route_position.items():
-            if end_node_id not in self.rest_node_ids:
+            if not self._is_rest_node(end_node_id):
                 continue
 
             # all depends on end node id not in rest node ids
-            if all(dep_id not in self.rest_node_ids for dep_id in self.end_stream_param.end_dependencies[end_node_id]):
+            if not self.rest_nodes & self.reachability_index.end_dependencies[end_node_id]:
                 if route_position >= len(self.end_stream_param.end_stream_variable_selector_mapping[end_node_id]):
                     continue
 
@@ -26,7 +26,7 @@ class IfElseNode(BaseNode[IfElseNodeData]):
 
         process_data: dict[str, list] = {"condition_results": []}
 
-        input_conditions = []
+        input_conditions: list[dict[str, Any]] = []
         final_result = False
         selected_case_id = None
         condition_processor = ConditionProcessor()
@@ -34,10 +34,11 @@ class IfElseNode(BaseNode[IfElseNodeData]):
             # Check if the new cases structure is used
             if self.node_data.cases:
                 for case in self.node_data.cases:
-                    input_conditions, group_result, final_result = condition_processor.process_conditions(
-                        variable_pool=self.graph_runtime_state.variable_pool,
-                        conditions=case.conditions,
-                        operator=case.logical_operator,
+                    compiled_conditions = self.graph.get_compiled_conditions(
+                        f"{self.node_id}:{case.case_id}", case.conditions, case.logical_operator
+                    )
+                    input_conditions, group_result, final_result = compiled_conditions.evaluate(
+                        self.graph_runtime_state.variable_pool
                     )
 
                     process_data["condition_results"].append(
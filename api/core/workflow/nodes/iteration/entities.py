@@ -22,6 +22,7 @@ class IterationNodeData(BaseIterationNodeData):
     output_selector: list[str]  # output selector
     is_parallel: bool = False  # open the parallel mode or not
     parallel_nums: int = 10  # the numbers of parallel
+    is_streaming: bool = False  # read the iterator lazily and spill the outputs to disk, for large arrays
     error_handle_mode: ErrorHandleMode = ErrorHandleMode.TERMINATED  # how to handle the error
 
 
@@ -9,7 +9,7 @@ from typing import TYPE_CHECKING, Any, Optional, cast
 from flask import Flask, current_app
 
 from configs import dify_config
-from core.variables import ArrayVariable, IntegerVariable, NoneVariable
+from core.variables import ArrayVariable, IntegerVariable, NoneVariable, SpilledArray
 from core.workflow.entities.node_entities import (
     NodeRunMetadataKey,
     NodeRunResult,
@@ -92,12 +92,19 @@ class IterationNode(BaseNode[IterationNodeData]):
             )
             return
 
-        iterator_list_value = variable.to_object()
+        if self.node_data.is_streaming:
+            # items are read one by one, a spilled array from a previous streaming iteration is never loaded whole
+            iterator_list_value = variable.value
+            inputs: Mapping[str, Any] = {"iterator_length": len(iterator_list_value)}
+        else:
+            iterator_list_value = variable.to_object()
 
-        if not isinstance(iterator_list_value, list):
-            raise InvalidIteratorValueError(f"Invalid iterator value: {iterator_list_value}, please provide a list.")
+            if not isinstance(iterator_list_value, list):
+                raise InvalidIteratorValueError(
+                    f"Invalid iterator value: {iterator_list_value}, please provide a list."
+                )
 
-        inputs = {"iterator_selector": iterator_list_value}
+            inputs = {"iterator_selector": iterator_list_value}
 
         graph_config = self.graph_config
 
@@ -161,18 +168,27 @@ class IterationNode(BaseNode[IterationNodeData]):
             duration=None,
         )
         iter_run_map: dict[str, float] = {}
-        outputs: list[Any] = [None] * len(iterator_list_value)
+        outputs: list[Any] | SpilledArray
+        if self.node_data.is_streaming:
+            outputs = SpilledArray(
+                chunk_size=dify_config.ITERATION_STREAMING_CHUNK_SIZE, length=len(iterator_list_value)
+            )
+        else:
+            outputs = [None] * len(iterator_list_value)
         try:
             if self.node_data.is_parallel:
                 futures: list[Future] = []
                 q: Queue = Queue()
                 thread_pool = GraphEngineThreadPool(
-                    max_workers=self.node_data.parallel_nums, max_submit_count=dify_config.MAX_SUBMIT_COUNT
+                    tenant_id=self.tenant_id, app_id=self.app_id, max_submit_count=dify_config.MAX_SUBMIT_COUNT
                 )
-                for index, item in enumerate(iterator_list_value):
+                flask_app = current_app._get_current_object()  # type: ignore
+
+                def submit_next_item() -> None:
+                    index = len(futures)
                     future: Future = thread_pool.submit(
                         self._run_single_iter_parallel,
-                        flask_app=current_app._get_current_object(),  # type: ignore
+                        flask_app=flask_app,
                         q=q,
                         iterator_list_value=iterator_list_value,
                         inputs=inputs,
@@ -181,11 +197,15 @@ class IterationNode(BaseNode[IterationNodeData]):
                         graph_engine=graph_engine,
                         iteration_graph=iteration_graph,
                         index=index,
-                        item=item,
+                        item=iterator_list_value[index],
                         iter_run_map=iter_run_map,
                     )
                     future.add_done_callback(thread_pool.task_done_callback)
                     futures.append(future)
+
+                # the shared workflow execution pool runs at most parallel_nums items of this iteration at once
+                for _ in range(min(max(self.node_data.parallel_nums, 1), len(iterator_list_value))):
+                    submit_next_item()
                 succeeded_count = 0
                 while True:
                     try:
@@ -194,8 +214,10 @@ class IterationNode(BaseNode[IterationNodeData]):
                             break
                         if isinstance(event, IterationRunNextEvent):
                             succeeded_count += 1
-                            if succeeded_count == len(futures):
+                            if succeeded_count == len(iterator_list_value):
                                 q.put(None)
+                            elif len(futures) < len(iterator_list_value):
+                                submit_next_item()
                         yield event
                         if isinstance(event, RunCompletedEvent):
                             q.put(None)
@@ -223,12 +245,15 @@ class IterationNode(BaseNode[IterationNodeData]):
                         iteration_graph=iteration_graph,
                         iter_run_map=iter_run_map,
                     )
-            if self.node_data.error_handle_mode == ErrorHandleMode.REMOVE_ABNORMAL_OUTPUT:
-                outputs = [output for output in outputs if output is not None]
+            if isinstance(outputs, SpilledArray):
+                outputs = self._finalize_spilled_outputs(outputs)
+            else:
+                if self.node_data.error_handle_mode == ErrorHandleMode.REMOVE_ABNORMAL_OUTPUT:
+                    outputs = [output for output in outputs if output is not None]
 
-            # Flatten the list of lists
-            if isinstance(outputs, list) and all(isinstance(output, list) for output in outputs):
-                outputs = [item for sublist in outputs for item in sublist]
+                # Flatten the list of lists
+                if isinstance(outputs, list) and all(isinstance(output, list) for output in outputs):
+                    outputs = [item for sublist in outputs for item in sublist]
 
             yield IterationRunSucceededEvent(
                 iteration_id=self.id,
@@ -380,7 +405,7 @@ class IterationNode(BaseNode[IterationNodeData]):
         iterator_list_value: Sequence[str],
         variable_pool: VariablePool,
         inputs: Mapping[str, list],
-        outputs: list,
+        outputs: list | SpilledArray,
         start_at: datetime,
         graph_engine: "GraphEngine",
         iteration_graph: Graph,
@@ -459,33 +484,15 @@ class IterationNode(BaseNode[IterationNodeData]):
                         event=event, iter_run_index=current_index, parallel_mode_run_id=parallel_mode_run_id
                     )
                     if isinstance(event, NodeRunFailedEvent):
-                        if self.node_data.error_handle_mode == ErrorHandleMode.CONTINUE_ON_ERROR:
+                        if self.node_data.error_handle_mode in {
+                            ErrorHandleMode.CONTINUE_ON_ERROR,
+                            ErrorHandleMode.REMOVE_ABNORMAL_OUTPUT,
+                        }:
                             yield NodeInIterationFailedEvent(
                                 **metadata_event.model_dump(),
                             )
                             outputs[current_index] = None
                             variable_pool.add([self.node_id, "index"], next_index)
-                            if next_index < len(iterator_list_value):
-                                variable_pool.add([self.node_id, "item"], iterator_list_value[next_index])
-                            duration = (datetime.now(UTC).replace(tzinfo=None) - iter_start_at).total_seconds()
-                            iter_run_map[iteration_run_id] = duration
-                            yield IterationRunNextEvent(
-                                iteration_id=self.id,
-                                iteration_node_id=self.node_id,
-                                iteration_node_type=self.node_type,
-                                iteration_node_data=self.node_data,
-                                index=next_index,
-                                parallel_mode_run_id=parallel_mode_run_id,
-                                pre_iteration_output=None,
-                                duration=duration,
-                            )
-                            return
-                        elif self.node_data.error_handle_mode == ErrorHandleMode.REMOVE_ABNORMAL_OUTPUT:
-                            yield NodeInIterationFailedEvent(
-                                **metadata_event.model_dump(),
-                            )
-                            variable_pool.add([self.node_id, "index"], next_index)
-
                             if next_index < len(iterator_list_value):
                                 variable_pool.add([self.node_id, "item"], iterator_list_value[next_index])
                             duration = (datetime.now(UTC).replace(tzinfo=None) - iter_start_at).total_seconds()
@@ -564,6 +571,28 @@ class IterationNode(BaseNode[IterationNodeData]):
                 )
             )
 
+    def _finalize_spilled_outputs(self, outputs: SpilledArray) -> SpilledArray:
+        """
+        Remove the abnormal outputs and flatten the outputs of a streaming iteration without loading them whole
+        """
+        remove_abnormal_output = self.node_data.error_handle_mode == ErrorHandleMode.REMOVE_ABNORMAL_OUTPUT
+        if not remove_abnormal_output and not all(isinstance(output, list) for output in outputs):
+            return outputs
+
+        finalized = SpilledArray(chunk_size=outputs.chunk_size)
+        flatten = all(
+            isinstance(output, list) for output in outputs if output is not None or not remove_abnormal_output
+        )
+        for output in outputs:
+            if output is None and remove_abnormal_output:
+                continue
+            if flatten:
+                finalized.extend(output)
+            else:
+                finalized.append(output)
+        outputs.close()
+        return finalized
+
     def _run_single_iter_parallel(
         self,
         *,
@@ -571,7 +600,7 @@ class IterationNode(BaseNode[IterationNodeData]):
         q: Queue,
         iterator_list_value: Sequence[str],
         inputs: Mapping[str, list],
-        outputs: list,
+        outputs: list | SpilledArray,
         start_at: datetime,
         graph_engine: "GraphEngine",
         iteration_graph: Graph,
@@ -588,16 +617,19 @@ class IterationNode(BaseNode[IterationNodeData]):
             variable_pool_copy = graph_engine_copy.graph_runtime_state.variable_pool
             variable_pool_copy.add([self.node_id, "index"], index)
             variable_pool_copy.add([self.node_id, "item"], item)
-            for event in self._run_single_iter(
-                iterator_list_value=iterator_list_value,
-                variable_pool=variable_pool_copy,
-                inputs=inputs,
-                outputs=outputs,
-                start_at=start_at,
-                graph_engine=graph_engine_copy,
-                iteration_graph=iteration_graph,
-                iter_run_map=iter_run_map,
-                parallel_mode_run_id=parallel_mode_run_id,
-            ):
-                q.put(event)
+            try:
+                for event in self._run_single_iter(
+                    iterator_list_value=iterator_list_value,
+                    variable_pool=variable_pool_copy,
+                    inputs=inputs,
+                    outputs=outputs,
+                    start_at=start_at,
+                    graph_engine=graph_engine_copy,
+                    iteration_graph=iteration_graph,
+                    iter_run_map=iter_run_map,
+                    parallel_mode_run_id=parallel_mode_run_id,
+                ):
+                    q.put(event)
+            finally:
+                variable_pool_copy.discard()
             graph_engine.graph_runtime_state.total_tokens += graph_engine_copy.graph_runtime_state.total_tokens
@@ -1,9 +1,9 @@
-from collections.abc import Sequence
-from typing import Any, Literal
+from collections.abc import Callable, Sequence
+from typing import Any, Literal, Optional
 
 from core.file import FileAttribute, file_manager
 from core.variables import ArrayFileSegment
-from core.workflow.entities.variable_pool import VariablePool
+from core.workflow.entities.variable_pool import VARIABLE_PATTERN, VariablePool
 
 from .entities import Condition, SubCondition, SupportedComparisonOperator
 
@@ -16,57 +16,143 @@ class ConditionProcessor:
         conditions: Sequence[Condition],
         operator: Literal["and", "or"],
     ):
-        input_conditions = []
+        return CompiledConditions(conditions=conditions, operator=operator).evaluate(variable_pool)
+
+
+class CompiledConditions:
+    """
+    Conditions compiled once, with their comparison functions looked up and their constant expected values
+    converted ahead, to be evaluated on every run of a graph.
+
+    Evaluation short-circuits: "and" conditions stop at the first failed condition and "or" conditions at the
+    first passed one, so the results only hold the conditions evaluated.
+    """
+
+    def __init__(self, *, conditions: Sequence[Condition], operator: Literal["and", "or"]) -> None:
+        self.operator = operator
+        self._conditions = [_CompiledCondition(condition) for condition in conditions]
+
+    def evaluate(
+        self, variable_pool: VariablePool, *, record_inputs: bool = True
+    ) -> tuple[list[dict[str, Any]], list[bool], bool]:
+        """
+        Evaluate the conditions
+        :param variable_pool: variable pool
+        :param record_inputs: whether to return the actual and expected values of the conditions compared
+        :return: input conditions, results of the conditions evaluated, final result
+        """
+        input_conditions: list[dict[str, Any]] = []
         group_results = []
-
-        for condition in conditions:
-            variable = variable_pool.get(condition.variable_selector)
-            if variable is None:
-                raise ValueError(f"Variable {condition.variable_selector} not found")
-
-            if isinstance(variable, ArrayFileSegment) and condition.comparison_operator in {
-                "contains",
-                "not contains",
-                "all of",
-            }:
-                # check sub conditions
-                if not condition.sub_variable_condition:
-                    raise ValueError("Sub variable is required")
-                result = _process_sub_conditions(
-                    variable=variable,
-                    sub_conditions=condition.sub_variable_condition.conditions,
-                    operator=condition.sub_variable_condition.logical_operator,
-                )
-            elif condition.comparison_operator in {
-                "exists",
-                "not exists",
-            }:
-                result = _evaluate_condition(
-                    value=variable.value,
-                    operator=condition.comparison_operator,
-                    expected=None,
-                )
-            else:
-                actual_value = variable.value if variable else None
-                expected_value = condition.value
-                if isinstance(expected_value, str):
-                    expected_value = variable_pool.convert_template(expected_value).text
-                input_conditions.append(
-                    {
-                        "actual_value": actual_value,
-                        "expected_value": expected_value,
-                        "comparison_operator": condition.comparison_operator,
-                    }
-                )
-                result = _evaluate_condition(
-                    value=actual_value,
-                    operator=condition.comparison_operator,
-                    expected=expected_value,
-                )
+        # the result deciding the final result on its own
+        decisive_result = self.operator == "or"
+        for condition in self._conditions:
+            result = condition.evaluate(variable_pool, input_conditions if record_inputs else None)
             group_results.append(result)
+            if result is decisive_result:
+                return input_conditions, group_results, result
+        return input_conditions, group_results, not decisive_result
+
+
+class _CompiledCondition:
+    def __init__(self, condition: Condition) -> None:
+        self.variable_selector = condition.variable_selector
+        self.comparison_operator = condition.comparison_operator
+        self.sub_variable_condition = condition.sub_variable_condition
+        self._compare = _COMPARATORS.get(condition.comparison_operator)
+
+        # parts of an expected value with variables, text or variable selectors
+        self._template_parts: Optional[list[str | list[str]]] = None
+        self._expected_value = condition.value
+        self._expected_operand: Any = condition.value
+        if isinstance(condition.value, str):
+            parts = [
+                part.split(".") if i % 2 else part
+                for i, part in enumerate(VARIABLE_PATTERN.split(condition.value))
+                if part
+            ]
+            if any(isinstance(part, list) for part in parts):
+                self._template_parts = parts
+            elif condition.comparison_operator in _NUMBER_OPERATORS:
+                self._expected_operand = _ParsedNumber(condition.value)
+
+    def evaluate(self, variable_pool: VariablePool, input_conditions: Optional[list[dict[str, Any]]]) -> bool:
+        variable = variable_pool.get(self.variable_selector)
+        if variable is None:
+            raise ValueError(f"Variable {self.variable_selector} not found")
+
+        if isinstance(variable, ArrayFileSegment) and self.comparison_operator in {
+            "contains",
+            "not contains",
+            "all of",
+        }:
+            # check sub conditions
+            if not self.sub_variable_condition:
+                raise ValueError("Sub variable is required")
+            return _process_sub_conditions(
+                variable=variable,
+                sub_conditions=self.sub_variable_condition.conditions,
+                operator=self.sub_variable_condition.logical_operator,
+            )
+
+        if self.comparison_operator in {"exists", "not exists"}:
+            return self._compare_values(variable.value, None)
+
+        expected_value = self._expected_value
+        expected_operand = self._expected_operand
+        if self._template_parts is not None:
+            expected_value = expected_operand = "".join(
+                part if isinstance(part, str) else _render_variable(variable_pool, part)
+                for part in self._template_parts
+            )
+        if input_conditions is not None:
+            input_conditions.append(
+                {
+                    "actual_value": variable.value,
+                    "expected_value": expected_value,
+                    "comparison_operator": self.comparison_operator,
+                }
+            )
+        return self._compare_values(variable.value, expected_operand)
+
+    def _compare_values(self, value: Any, expected: Any) -> bool:
+        if self._compare is None:
+            raise ValueError(f"Unsupported operator: {self.comparison_operator}")
+        return self._compare(value, expected)
+
 
-        final_result = all(group_results) if operator == "and" else any(group_results)
-        return input_conditions, group_results, final_result
+def _render_variable(variable_pool: VariablePool, selector: list[str]) -> str:
+    variable = variable_pool.get(selector)
+    # a variable that does not exist is kept as the selector text, like VariablePool.convert_template
+    return variable.text if variable is not None else ".".join(selector)
+
+
+class _ParsedNumber:
+    """
+    Expected value of a number comparison converted once, int() and float() of it return the converted
+    values or raise the error the conversion failed with.
+    """
+
+    def __init__(self, value: str) -> None:
+        self._int: int | ValueError
+        self._float: float | ValueError
+        try:
+            self._int = int(value)
+        except ValueError as e:
+            self._int = e
+        try:
+            self._float = float(value)
+        except ValueError as e:
+            self._float = e
+
+    def __int__(self) -> int:
+        if isinstance(self._int, ValueError):
+            raise ValueError(*self._int.args)
+        return self._int
+
+    def __float__(self) -> float:
+        if isinstance(self._float, ValueError):
+            raise ValueError(*self._float.args)
+        return self._float
 
 
 def _evaluate_condition(
@@ -75,51 +161,10 @@ def _evaluate_condition(
     value: Any,
     expected: str | Sequence[str] | None,
 ) -> bool:
-    match operator:
-        case "contains":
-            return _assert_contains(value=value, expected=expected)
-        case "not contains":
-            return _assert_not_contains(value=value, expected=expected)
-        case "start with":
-            return _assert_start_with(value=value, expected=expected)
-        case "end with":
-            return _assert_end_with(value=value, expected=expected)
-        case "is":
-            return _assert_is(value=value, expected=expected)
-        case "is not":
-            return _assert_is_not(value=value, expected=expected)
-        case "empty":
-            return _assert_empty(value=value)
-        case "not empty":
-            return _assert_not_empty(value=value)
-        case "=":
-            return _assert_equal(value=value, expected=expected)
-        case "≠":
-            return _assert_not_equal(value=value, expected=expected)
-        case ">":
-            return _assert_greater_than(value=value, expected=expected)
-        case "<":
-            return _assert_less_than(value=value, expected=expected)
-        case "≥":
-            return _assert_greater_than_or_equal(value=value, expected=expected)
-        case "≤":
-            return _assert_less_than_or_equal(value=value, expected=expected)
-        case "null":
-            return _assert_null(value=value)
-        case "not null":
-            return _assert_not_null(value=value)
-        case "in":
-            return _assert_in(value=value, expected=expected)
-        case "not in":
-            return _assert_not_in(value=value, expected=expected)
-        case "all of" if isinstance(expected, list):
-            return _assert_all_of(value=value, expected=expected)
-        case "exists":
-            return _assert_exists(value=value)
-        case "not exists":
-            return _assert_not_exists(value=value)
-        case _:
-            raise ValueError(f"Unsupported operator: {operator}")
+    compare = _COMPARATORS.get(operator)
+    if compare is None:
+        raise ValueError(f"Unsupported operator: {operator}")
+    return compare(value, expected)
 
 
 def _assert_contains(*, value: Any, expected: Any) -> bool:
@@ -383,3 +428,36 @@ def _process_sub_conditions(
         result = all(sub_group_results) if "not" in condition.comparison_operator else any(sub_group_results)
         group_results.append(result)
     return all(group_results) if operator == "and" else any(group_results)
+
+
+def _compare_all_of(value: Any, expected: Any) -> bool:
+    if not isinstance(expected, list):
+        raise ValueError("Unsupported operator: all of")
+    return _assert_all_of(value=value, expected=expected)
+
+
+_COMPARATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "contains": lambda value, expected: _assert_contains(value=value, expected=expected),
+    "not contains": lambda value, expected: _assert_not_contains(value=value, expected=expected),
+    "start with": lambda value, expected: _assert_start_with(value=value, expected=expected),
+    "end with": lambda value, expected: _assert_end_with(value=value, expected=expected),
+    "is": lambda value, expected: _assert_is(value=value, expected=expected),
+    "is not": lambda value, expected: _assert_is_not(value=value, expected=expected),
+    "empty": lambda value, expected: _assert_empty(value=value),
+    "not empty": lambda value, expected: _assert_not_empty(value=value),
+    "=": lambda value, expected: _assert_equal(value=value, expected=expected),
+    "≠": lambda value, expected: _assert_not_equal(value=value, expected=expected),
+    ">": lambda value, expected: _assert_greater_than(value=value, expected=expected),
+    "<": lambda value, expected: _assert_less_than(value=value, expected=expected),
+    "≥": lambda value, expected: _assert_greater_than_or_equal(value=value, expected=expected),
+    "≤": lambda value, expected: _assert_less_than_or_equal(value=value, expected=expected),
+    "null": lambda value, expected: _assert_null(value=value),
+    "not null": lambda value, expected: _assert_not_null(value=value),
+    "in": lambda value, expected: _assert_in(value=value, expected=expected),
+    "not in": lambda value, expected: _assert_not_in(value=value, expected=expected),
+    "all of": _compare_all_of,
+    "exists": lambda value, expected: _assert_exists(value=value),
+    "not exists": lambda value, expected: _assert_not_exists(value=value),
+}
+
+_NUMBER_OPERATORS = {"=", "≠", ">", "<", "≥", "≤"}
@@ -8,6 +8,7 @@ from configs import dify_config
 from core.app.apps.base_app_queue_manager import GenerateTaskStoppedError
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.file.models import File
+from core.variables.spilled_array import SpilledArray
 from core.workflow.callbacks import WorkflowCallback
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.errors import WorkflowNodeRunFailedError
@@ -110,6 +111,8 @@ class WorkflowEntry:
                 for callback in callbacks:
                     callback.on_event(event=GraphRunFailedEvent(error=str(e)))
             return
+        finally:
+            graph_engine.graph_runtime_state.variable_pool.release_spilled()
 
     @classmethod
     def single_step_run(
@@ -152,7 +155,7 @@ class WorkflowEntry:
         variable_pool = VariablePool(environment_variables=workflow.environment_variables)
 
         # init graph
-        graph = Graph.init(graph_config=workflow.graph_dict)
+        graph = Graph.init_cached(graph_config=workflow.graph_dict, cache_key=workflow.unique_hash)
 
         # init workflow run state
         node_instance = node_cls(
@@ -181,18 +184,36 @@ class WorkflowEntry:
         except NotImplementedError:
             variable_mapping = {}
 
-        cls.mapping_user_inputs_to_variable_pool(
-            variable_mapping=variable_mapping,
-            user_inputs=user_inputs,
-            variable_pool=variable_pool,
-            tenant_id=workflow.tenant_id,
-        )
+        try:
+            cls.mapping_user_inputs_to_variable_pool(
+                variable_mapping=variable_mapping,
+                user_inputs=user_inputs,
+                variable_pool=variable_pool,
+                tenant_id=workflow.tenant_id,
+            )
+        except Exception:
+            variable_pool.release_spilled()
+            raise
         try:
             # run node
             generator = node_instance.run()
         except Exception as e:
+            variable_pool.release_spilled()
             raise WorkflowNodeRunFailedError(node_instance=node_instance, error=str(e))
-        return node_instance, generator
+        return node_instance, cls._release_spilled_after(generator, variable_pool)
+
+    @staticmethod
+    def _release_spilled_after(
+        generator: Generator[NodeEvent | InNodeEvent, None, None], variable_pool: VariablePool
+    ) -> Generator[NodeEvent | InNodeEvent, None, None]:
+        """
+        Run the node of a single step run, then delete the variables spilled during the run, also when the caller
+        stops reading the events early.
+        """
+        try:
+            yield from generator
+        finally:
+            variable_pool.release_spilled()
 
     @staticmethod
     def handle_special_values(value: Optional[Mapping[str, Any]]) -> Mapping[str, Any] | None:
@@ -208,6 +229,9 @@ class WorkflowEntry:
             for k, v in value.items():
                 res[k] = WorkflowEntry._handle_special_values(v)
             return res
+        if isinstance(value, SpilledArray):
+            # items are converted as they are read, the spilled array is not loaded whole
+            return value.map(WorkflowEntry._handle_special_values)
         if isinstance(value, list):
             res_list = []
             for item in value:
@@ -65,3 +65,12 @@ def init_app(app: DifyApp):
             "connection_timeout": engine.pool.timeout(),  # type: ignore
             "recycle_time": db.engine.pool._recycle,  # type: ignore
         }
+
+    @app.route("/workflow-pool-stat")
+    def workflow_pool_stat():
+        from core.workflow.graph_engine.workflow_execution_pool import get_workflow_execution_pool
+
+        return {
+            "pid": os.getpid(),
+            **get_workflow_execution_pool().stats(),
+        }
@@ -4,9 +4,11 @@ from dify_app import DifyApp
 def init_app(app: DifyApp):
     from commands import (
         add_qdrant_doc_id_index,
+        convert_embedding_cache_format,
         convert_to_agent_apps,
         create_tenant,
         fix_app_site_missing,
+        migrate_keyword_postings,
         reset_email,
         reset_encrypt_key_pair,
         reset_password,
@@ -24,6 +26,8 @@ def init_app(app: DifyApp):
         create_tenant,
         upgrade_db,
         fix_app_site_missing,
+        convert_embedding_cache_format,
+        migrate_keyword_postings,
     ]
     for cmd in cmds_to_register:
         app.cli.add_command(cmd)
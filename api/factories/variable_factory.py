@@ -20,6 +20,7 @@ from core.variables.segments import (
     Segment,
     StringSegment,
 )
+from core.variables.spilled_array import SpilledArray
 from core.variables.types import SegmentType
 from core.variables.variables import (
     ArrayAnyVariable,
@@ -127,6 +128,9 @@ def build_segment(value: Any, /) -> Segment:
         return ObjectSegment(value=value)
     if isinstance(value, File):
         return FileSegment(value=value)
+    if isinstance(value, SpilledArray):
+        # the items are not loaded to infer a narrower array type
+        return ArrayAnySegment(value=value)
     if isinstance(value, list):
         items = [build_segment(item) for item in value]
         types = {item.value_type for item in items}
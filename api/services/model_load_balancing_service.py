@@ -7,7 +7,11 @@ from typing import Optional, Union
 from constants import HIDDEN_VALUE
 from core.entities.provider_configuration import ProviderConfiguration
 from core.helper import encrypter
-from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.model_provider_cache import (
+    ProviderConfigurationsVersion,
+    ProviderCredentialsCache,
+    ProviderCredentialsCacheType,
+)
 from core.model_manager import LBModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -36,16 +40,14 @@ class ModelLoadBalancingService:
         :param model_type: model type
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Enable model load balancing
         provider_configuration.enable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def disable_model_load_balancing(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -57,16 +59,14 @@ class ModelLoadBalancingService:
         :param model_type: model type
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # disable model load balancing
         provider_configuration.disable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def get_load_balancing_configs(
         self, tenant_id: str, provider: str, model: str, model_type: str
@@ -79,11 +79,8 @@ class ModelLoadBalancingService:
         :param model_type: model type
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -205,11 +202,8 @@ class ModelLoadBalancingService:
         :param config_id: load balancing config id
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -276,6 +270,7 @@ class ModelLoadBalancingService:
         )
         db.session.add(inherit_config)
         db.session.commit()
+        ProviderConfigurationsVersion(tenant_id).bump()
 
         return inherit_config
 
@@ -291,11 +286,8 @@ class ModelLoadBalancingService:
         :param configs: load balancing configs
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -373,6 +365,7 @@ class ModelLoadBalancingService:
                 load_balancing_config.enabled = enabled
                 load_balancing_config.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
                 db.session.commit()
+                ProviderConfigurationsVersion(tenant_id).bump()
 
                 self._clear_credentials_cache(tenant_id, config_id)
             else:
@@ -413,12 +406,14 @@ class ModelLoadBalancingService:
 
                 db.session.add(load_balancing_model_config)
                 db.session.commit()
+                ProviderConfigurationsVersion(tenant_id).bump()
 
         # get deleted config ids
         deleted_config_ids = set(current_load_balancing_configs_dict.keys()) - updated_config_ids
         for config_id in deleted_config_ids:
             db.session.delete(current_load_balancing_configs_dict[config_id])
             db.session.commit()
+            ProviderConfigurationsVersion(tenant_id).bump()
 
             self._clear_credentials_cache(tenant_id, config_id)
 
@@ -441,11 +436,8 @@ class ModelLoadBalancingService:
         :param config_id: load balancing config id
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
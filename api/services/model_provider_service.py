@@ -8,6 +8,7 @@ import requests
 from flask import current_app
 
 from core.entities.model_entities import ModelStatus, ModelWithProviderEntity, ProviderModelWithStatusEntity
+from core.helper.model_provider_cache import ProviderConfigurationsVersion
 from core.model_runtime.entities.model_entities import ModelType, ParameterRule
 from core.model_runtime.model_providers import model_provider_factory
 from core.model_runtime.model_providers.__base.large_language_model import LargeLanguageModel
@@ -119,11 +120,8 @@ class ModelProviderService:
         :param provider:
         :param credentials:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -138,16 +136,14 @@ class ModelProviderService:
         :param credentials: provider credentials
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Add or update custom provider credentials.
         provider_configuration.add_or_update_custom_credentials(credentials)
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def remove_provider_credentials(self, tenant_id: str, provider: str) -> None:
         """
@@ -157,16 +153,14 @@ class ModelProviderService:
         :param provider: provider name
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Remove custom provider credentials.
         provider_configuration.delete_custom_credentials()
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def get_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str):
         """
@@ -178,11 +172,8 @@ class ModelProviderService:
         :param model: model name
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -204,11 +195,8 @@ class ModelProviderService:
         :param credentials: model credentials
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -230,11 +218,8 @@ class ModelProviderService:
         :param credentials: model credentials
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -242,6 +227,7 @@ class ModelProviderService:
         provider_configuration.add_or_update_custom_model_credentials(
             model_type=ModelType.value_of(model_type), model=model, credentials=credentials
         )
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def remove_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str) -> None:
         """
@@ -253,16 +239,14 @@ class ModelProviderService:
         :param model: model name
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Remove custom model credentials
         provider_configuration.delete_custom_model_credentials(model_type=ModelType.value_of(model_type), model=model)
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def get_models_by_model_type(self, tenant_id: str, model_type: str) -> list[ProviderWithModelsResponse]:
         """
@@ -335,11 +319,8 @@ class ModelProviderService:
         :param model: model name
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -474,6 +455,7 @@ class ModelProviderService:
 
         # Switch preferred provider type
         provider_configuration.switch_preferred_provider_type(preferred_provider_type_enum)
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def enable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -485,16 +467,14 @@ class ModelProviderService:
         :param model_type: model type
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Enable model
         provider_configuration.enable_model(model=model, model_type=ModelType.value_of(model_type))
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def disable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -506,16 +486,14 @@ class ModelProviderService:
         :param model_type: model type
         :return:
         """
-        # Get all provider configurations of the current workspace
-        provider_configurations = self.provider_manager.get_configurations(tenant_id)
-
         # Get provider configuration
-        provider_configuration = provider_configurations.get(provider)
+        provider_configuration = self.provider_manager.get_provider_configuration(tenant_id, provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
         # Enable model
         provider_configuration.disable_model(model=model, model_type=ModelType.value_of(model_type))
+        ProviderConfigurationsVersion(tenant_id).bump()
 
     def free_quota_submit(self, tenant_id: str, provider: str):
         api_key = os.environ.get("FREE_QUOTA_APPLY_API_KEY")
@@ -536,6 +514,8 @@ class ModelProviderService:
         if rst["type"] == "redirect":
             return {"type": rst["type"], "redirect_url": rst["redirect_url"]}
         else:
+            # the free quota is added to the provider records of the workspace
+            ProviderConfigurationsVersion(tenant_id).bump()
             return {"type": rst["type"], "result": "success"}
 
     def free_quota_qualification_verify(self, tenant_id: str, provider: str, token: Optional[str]):
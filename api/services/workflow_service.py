@@ -10,7 +10,8 @@ from sqlalchemy import desc
 from core.app.apps.advanced_chat.app_config_manager import AdvancedChatAppConfigManager
 from core.app.apps.workflow.app_config_manager import WorkflowAppConfigManager
 from core.model_runtime.utils.encoders import jsonable_encoder
-from core.variables import Variable
+from core.variables import SpilledArray, Variable
+from core.variables.utils import dump_json
 from core.workflow.entities.node_entities import NodeRunResult
 from core.workflow.errors import WorkflowNodeRunFailedError
 from core.workflow.nodes import NodeType
@@ -262,6 +263,8 @@ class WorkflowService:
                     # sign output files
                     node_run_result.outputs = WorkflowEntry.handle_special_values(node_run_result.outputs)
                     break
+            # deletes the variables spilled during the run
+            generator.close()
 
             if not node_run_result:
                 raise ValueError("Node run failed with no run result")
@@ -326,9 +329,13 @@ class WorkflowService:
             )
             outputs = WorkflowEntry.handle_special_values(node_run_result.outputs) if node_run_result.outputs else None
 
-            workflow_node_execution.inputs = json.dumps(inputs)
-            workflow_node_execution.process_data = json.dumps(process_data)
-            workflow_node_execution.outputs = json.dumps(outputs)
+            workflow_node_execution.inputs = dump_json(inputs)
+            workflow_node_execution.process_data = dump_json(process_data)
+            workflow_node_execution.outputs = dump_json(outputs)
+            # the outputs of a streaming iteration are not read anymore
+            for value in (outputs or {}).values():
+                if isinstance(value, SpilledArray):
+                    value.close()
             workflow_node_execution.execution_metadata = (
                 json.dumps(jsonable_encoder(node_run_result.metadata)) if node_run_result.metadata else None
             )
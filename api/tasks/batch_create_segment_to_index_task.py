@@ -74,12 +74,17 @@ def batch_create_segment_to_index_task(
                 DocumentSegment.document_id == dataset_document.id
             )
             max_position = session.scalar(max_position_stmt) or 1
-            for segment in content:
+            # calc embedding use tokens of all the segments at once
+            if embedding_model:
+                segment_tokens = embedding_model.get_text_embedding_num_tokens_batch(
+                    texts=[segment["content"] for segment in content]
+                )
+            else:
+                segment_tokens = [0] * len(content)
+            for segment, tokens in zip(content, segment_tokens):
                 content_str = segment["content"]
                 doc_id = str(uuid.uuid4())
                 segment_hash = helper.generate_text_hash(content_str)
-                # calc embedding use tokens
-                tokens = embedding_model.get_text_embedding_num_tokens(texts=[content_str]) if embedding_model else 0
                 segment_document = DocumentSegment(
                     tenant_id=tenant_id,
                     dataset_id=dataset_id,
@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from configs import dify_config
+from core.app.apps import base_app_queue_manager
+from core.app.apps.base_app_queue_manager import GenerateTaskStoppedError, PublishFrom
+from core.app.apps.message_based_app_queue_manager import MessageBasedAppQueueManager
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.entities.queue_entities import QueuePingEvent, QueueStopEvent
+
+
+@pytest.fixture
+def redis_client(mocker):
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+    mocker.patch.object(base_app_queue_manager, "redis_client", redis_client)
+    return redis_client
+
+
+def _queue_manager() -> MessageBasedAppQueueManager:
+    return MessageBasedAppQueueManager(
+        task_id="task",
+        user_id="user",
+        invoke_from=InvokeFrom.SERVICE_API,
+        conversation_id="conversation",
+        app_mode="chat",
+        message_id="message",
+    )
+
+
+def test_stop_flag_is_not_read_per_message(redis_client, mocker):
+    mocker.patch.object(dify_config, "APP_STOP_FLAG_CHECK_INTERVAL", 60)
+    queue_manager = _queue_manager()
+
+    for _ in range(100):
+        queue_manager.publish(QueuePingEvent(), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.stop_listen()
+    messages = list(queue_manager.listen())
+
+    assert len(messages) == 100
+    assert redis_client.get.call_count == 1
+
+
+def test_stop_flag_is_refreshed_after_interval(redis_client, mocker):
+    mocker.patch.object(dify_config, "APP_STOP_FLAG_CHECK_INTERVAL", 60)
+    monotonic = mocker.patch.object(base_app_queue_manager.time, "monotonic", return_value=100.0)
+    queue_manager = _queue_manager()
+    queue_manager.publish(QueuePingEvent(), PublishFrom.APPLICATION_MANAGER)
+
+    redis_client.get.return_value = b"1"
+    queue_manager.publish(QueuePingEvent(), PublishFrom.APPLICATION_MANAGER)
+
+    monotonic.return_value = 161.0
+    with pytest.raises(GenerateTaskStoppedError):
+        queue_manager.publish(QueuePingEvent(), PublishFrom.APPLICATION_MANAGER)
+    assert redis_client.get.call_count == 2
+
+
+def test_listen_publishes_stop_event_when_stopped(redis_client):
+    redis_client.get.return_value = b"1"
+    queue_manager = _queue_manager()
+    queue_manager.publish(QueuePingEvent(), PublishFrom.TASK_PIPELINE)
+
+    events = [message.event for message in queue_manager.listen()]
+
+    assert isinstance(events[0], QueuePingEvent)
+    assert isinstance(events[-1], QueueStopEvent)
@@ -1,5 +1,9 @@
+import json
+import sys
+
 from core.helper import encrypter
-from core.variables import SecretVariable, StringVariable
+from core.variables import ObjectSegment, SecretVariable, SpilledArray, StringVariable
+from core.variables.utils import dump_json, preview_spilled_arrays, truncate_value
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.enums import SystemVariableKey
 
@@ -56,3 +60,46 @@ def test_convert_variable_to_segment_group():
     assert segments_group.log == "fake-user-id"
     assert isinstance(segments_group.value[0], StringVariable)
     assert segments_group.value[0].value == "fake-user-id"
+
+
+def test_segment_size_counts_nested_values():
+    value = {"items": [{"text": str(i) * 1000} for i in range(10)]}
+
+    assert ObjectSegment(value=value).size > 10 * 1000
+    assert ObjectSegment(value=value).size > sys.getsizeof(value)
+
+
+def test_truncate_value():
+    value = {"body": "x" * 20, "items": list(range(20)), "count": 3}
+
+    truncated = truncate_value(value, 10)
+    assert truncated["body"] == "x" * 10 + "...[truncated, 20 characters in total]"
+    # arrays keep only their own items
+    assert truncated["items"] == list(range(10))
+    assert truncated["count"] == 3
+    assert truncate_value(value, 20) == value
+
+
+def test_truncate_value_of_spilled_array():
+    array = SpilledArray(chunk_size=2)
+    array.extend(range(20))
+
+    assert truncate_value({"items": array}, 3) == {"items": [0, 1, 2]}
+
+
+def test_preview_spilled_arrays():
+    array = SpilledArray(chunk_size=2)
+    array.extend(range(5))
+    value = {"output": array, "body": "x" * 20, "items": list(range(20))}
+
+    assert preview_spilled_arrays(value, 3) == {"output": [0, 1, 2], "body": "x" * 20, "items": list(range(20))}
+    assert preview_spilled_arrays(value, 0)["output"] == [0, 1, 2, 3, 4]
+
+
+def test_dump_json_of_spilled_arrays():
+    array = SpilledArray(chunk_size=2)
+    array.extend([{"index": 0}, 1.5, "é", None, [1]])
+    value = {"output": array, "empty": SpilledArray(chunk_size=2), "items": [1, 2]}
+
+    assert dump_json(value) == json.dumps({"output": [{"index": 0}, 1.5, "é", None, [1]], "empty": [], "items": [1, 2]})
+    assert dump_json({"items": [1, 2]}) == json.dumps({"items": [1, 2]})
@@ -0,0 +1,84 @@
+import pytest
+
+from core.variables import ArrayAnySegment, SpilledArray
+from factories import variable_factory
+
+
+def test_spills_complete_chunks():
+    array = SpilledArray(chunk_size=2, length=5)
+    for i in range(5):
+        array[i] = {"index": i}
+
+    assert list(array._spilled) == [0, 1]
+    assert list(array._chunks) == [2]
+    assert list(array) == [{"index": i} for i in range(5)]
+    assert array[3] == {"index": 3}
+    assert array[-1] == {"index": 4}
+    assert array[1:3] == [{"index": 1}, {"index": 2}]
+
+
+def test_items_set_out_of_order():
+    array = SpilledArray(chunk_size=2, length=4)
+    array[3] = "d"
+    array[0] = "a"
+    assert not array._spilled
+    assert list(array) == ["a", None, None, "d"]
+
+    array[2] = "c"
+    array[1] = "b"
+    assert list(array._spilled) == [1, 0]
+    assert list(array) == ["a", "b", "c", "d"]
+
+
+def test_set_item_of_spilled_chunk():
+    array = SpilledArray(chunk_size=2)
+    array.extend(["a", "b", "c"])
+    assert array[0] == "a"
+
+    array[0] = "z"
+
+    assert list(array) == ["z", "b", "c"]
+
+
+def test_index_out_of_range():
+    array = SpilledArray(chunk_size=2, length=1)
+    with pytest.raises(IndexError):
+        array[1]
+    with pytest.raises(IndexError):
+        array[1] = "a"
+
+
+def test_segment_of_spilled_array():
+    array = SpilledArray(chunk_size=2)
+    array.extend([1, "a", {"b": 2}])
+
+    segment = variable_factory.build_segment(array)
+
+    assert isinstance(segment, ArrayAnySegment)
+    assert segment.value is array
+    assert segment.to_object() == [1, "a", {"b": 2}]
+
+
+def test_map_reads_the_items_through_a_read_only_view():
+    array = SpilledArray(chunk_size=2)
+    array.extend([1, 2, 3])
+
+    view = array.map(lambda item: item * 10).map(str)
+
+    assert isinstance(view, SpilledArray)
+    assert list(view) == ["10", "20", "30"]
+    assert view[2] == "30"
+    assert list(array) == [1, 2, 3]
+    with pytest.raises(TypeError):
+        view.append(4)
+
+
+def test_close_deletes_the_file_of_the_array_and_its_views():
+    array = SpilledArray(chunk_size=2)
+    array.extend([1, 2, 3])
+    view = array.map(str)
+
+    array.close()
+
+    assert array._file.closed
+    assert view._file.closed
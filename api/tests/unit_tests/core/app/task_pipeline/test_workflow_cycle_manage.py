@@ -0,0 +1,137 @@
+import json
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from configs import dify_config
+from core.app.entities.queue_entities import QueueIterationCompletedEvent, QueueNodeSucceededEvent
+from core.app.task_pipeline.workflow_cycle_manage import WorkflowCycleManage
+from core.variables import SpilledArray
+from core.workflow.nodes import NodeType
+from core.workflow.nodes.base.entities import BaseNodeData
+from core.workflow.nodes.iteration.entities import IterationNodeData
+from models.workflow import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+
+
+def _spilled_output(length: int) -> SpilledArray:
+    output = SpilledArray(chunk_size=2, length=length)
+    for i in range(length):
+        output[i] = {"index": i}
+    return output
+
+
+def _iteration_completed_event(output: SpilledArray) -> QueueIterationCompletedEvent:
+    return QueueIterationCompletedEvent(
+        node_execution_id="node_execution_id",
+        node_id="iteration",
+        node_type=NodeType.ITERATION,
+        node_data=IterationNodeData(
+            title="Iteration", iterator_selector=["start", "items"], output_selector=["code", "result"]
+        ),
+        start_at=datetime.now(UTC).replace(tzinfo=None),
+        node_run_index=1,
+        outputs={"output": output},
+        steps=len(output),
+    )
+
+
+@pytest.fixture
+def workflow_cycle_manage(mocker):
+    workflow_cycle_manage = WorkflowCycleManage(application_generate_entity=MagicMock(), workflow_system_variables={})
+    mocker.patch.object(workflow_cycle_manage, "_flush_workflow_node_executions")
+    return workflow_cycle_manage
+
+
+def test_iteration_completed_stream_response_with_spilled_outputs(workflow_cycle_manage):
+    event = _iteration_completed_event(_spilled_output(3))
+
+    response = workflow_cycle_manage._workflow_iteration_completed_to_stream_response(
+        session=MagicMock(), task_id="task_id", workflow_run=MagicMock(id="workflow_run_id"), event=event
+    )
+
+    data = response.to_dict()["data"]
+    assert data["outputs"] == {"output": [{"index": 0}, {"index": 1}, {"index": 2}]}
+    json.dumps(data)
+
+
+def test_iteration_completed_stream_response_sends_a_preview_of_spilled_outputs(mocker, workflow_cycle_manage):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_PREVIEW_LENGTH", 2)
+    event = _iteration_completed_event(_spilled_output(5))
+
+    response = workflow_cycle_manage._workflow_iteration_completed_to_stream_response(
+        session=MagicMock(), task_id="task_id", workflow_run=MagicMock(id="workflow_run_id"), event=event
+    )
+
+    assert response.to_dict()["data"]["outputs"] == {"output": [{"index": 0}, {"index": 1}]}
+
+
+def test_workflow_run_success_writes_spilled_outputs_and_closes_them(mocker, workflow_cycle_manage):
+    output = _spilled_output(3)
+    workflow_cycle_manage._workflow_iteration_completed_to_stream_response(
+        session=MagicMock(),
+        task_id="task_id",
+        workflow_run=MagicMock(id="workflow_run_id"),
+        event=_iteration_completed_event(output),
+    )
+    workflow_run = MagicMock()
+    mocker.patch.object(workflow_cycle_manage, "_get_workflow_run", return_value=workflow_run)
+
+    workflow_cycle_manage._handle_workflow_run_success(
+        session=MagicMock(),
+        workflow_run_id="workflow_run_id",
+        start_at=0.0,
+        total_tokens=0,
+        total_steps=2,
+        outputs={"result": output},
+    )
+
+    assert json.loads(workflow_run.outputs) == {"result": [{"index": 0}, {"index": 1}, {"index": 2}]}
+    assert output._file.closed
+
+
+def test_dump_node_execution_value_of_spilled_outputs(mocker):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_PREVIEW_LENGTH", 2)
+    assert json.loads(WorkflowCycleManage._dump_node_execution_value({"output": _spilled_output(3)})) == {
+        "output": [{"index": 0}, {"index": 1}]
+    }
+
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_PREVIEW_LENGTH", 0)
+    assert json.loads(WorkflowCycleManage._dump_node_execution_value({"output": _spilled_output(3)})) == {
+        "output": [{"index": 0}, {"index": 1}, {"index": 2}]
+    }
+
+
+def test_node_finish_stream_response_sends_the_whole_outputs(mocker, workflow_cycle_manage):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_PREVIEW_LENGTH", 2)
+    mocker.patch.object(workflow_cycle_manage, "_save_workflow_node_execution")
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = "node_execution_id"
+    workflow_node_execution.workflow_run_id = "workflow_run_id"
+    workflow_node_execution.node_id = "code"
+    workflow_node_execution.node_type = NodeType.CODE.value
+    workflow_node_execution.index = 1
+    workflow_node_execution.title = "Code"
+    workflow_node_execution.created_at = datetime.now(UTC).replace(tzinfo=None)
+    workflow_cycle_manage._workflow_node_executions["node_execution_id"] = workflow_node_execution
+    event = QueueNodeSucceededEvent(
+        node_execution_id="node_execution_id",
+        node_id="code",
+        node_type=NodeType.CODE,
+        node_data=BaseNodeData(title="Code"),
+        start_at=datetime.now(UTC).replace(tzinfo=None),
+        inputs={"text": "abcdef"},
+        outputs={"result": [1, 2, 3], "items": _spilled_output(3)},
+    )
+
+    workflow_cycle_manage._handle_workflow_node_execution_success(session=MagicMock(), event=event)
+    response = workflow_cycle_manage._workflow_node_finish_to_stream_response(
+        session=MagicMock(), event=event, task_id="task_id", workflow_node_execution=workflow_node_execution
+    )
+
+    # the node execution log keeps a preview
+    assert workflow_node_execution.status == WorkflowNodeExecutionStatus.SUCCEEDED.value
+    assert json.loads(workflow_node_execution.outputs) == {"result": [1, 2], "items": [{"index": 0}, {"index": 1}]}
+    data = response.to_dict()["data"]
+    assert data["inputs"] == {"text": "abcdef"}
+    assert data["outputs"] == {"result": [1, 2, 3], "items": [{"index": 0}, {"index": 1}]}
@@ -0,0 +1,148 @@
+import threading
+from unittest.mock import MagicMock
+
+from core.app.task_pipeline import workflow_node_execution_writer as writer_module
+from core.app.task_pipeline.workflow_node_execution_writer import WorkflowNodeExecutionWriter
+from models.workflow import WorkflowNodeExecution
+
+
+def _node_execution(id: str, status: str = "running", workflow_run_id: str = "run") -> WorkflowNodeExecution:
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = id
+    workflow_node_execution.workflow_run_id = workflow_run_id
+    workflow_node_execution.status = status
+    return workflow_node_execution
+
+
+def _writer(mocker, batch_size=10, flush_interval=60.0):
+    writer = WorkflowNodeExecutionWriter(engine=MagicMock(), batch_size=batch_size, flush_interval=flush_interval)
+    batches = []
+
+    def write_rows(rows):
+        batches.append(rows)
+        return True
+
+    mocker.patch.object(writer, "_write_rows", side_effect=write_rows)
+    return writer, batches
+
+
+def test_flush_coalesces_start_and_finish(mocker):
+    writer, batches = _writer(mocker)
+    workflow_node_execution = _node_execution("1")
+    writer.save(workflow_node_execution)
+    workflow_node_execution.status = "succeeded"
+    writer.save(workflow_node_execution)
+    writer.save(_node_execution("2"))
+
+    assert writer.flush("run", timeout=5)
+
+    assert len(batches) == 1
+    assert [(row["id"], row["status"]) for row in batches[0]] == [("1", "succeeded"), ("2", "running")]
+    assert writer.stats()["coalesced"] == 1
+    assert writer.queue_depth == 0
+
+
+def test_save_snapshots_the_record(mocker):
+    writer, batches = _writer(mocker)
+    workflow_node_execution = _node_execution("1")
+    writer.save(workflow_node_execution)
+    workflow_node_execution.status = "succeeded"
+
+    assert writer.flush("run", timeout=5)
+
+    assert batches[0][0]["status"] == "running"
+
+
+def test_full_batch_is_written_without_flush(mocker):
+    writer, batches = _writer(mocker, batch_size=2)
+    written = threading.Event()
+    writer._write_rows.side_effect = lambda rows: (batches.append(rows), written.set())
+
+    writer.save(_node_execution("1"))
+    writer.save(_node_execution("2"))
+
+    assert written.wait(timeout=5)
+    assert len(batches[0]) == 2
+
+
+def test_pending_records_are_written_after_flush_interval(mocker):
+    writer, batches = _writer(mocker, flush_interval=0.05)
+    written = threading.Event()
+    writer._write_rows.side_effect = lambda rows: (batches.append(rows), written.set())
+
+    writer.save(_node_execution("1"))
+
+    assert written.wait(timeout=5)
+    assert batches[0][0]["id"] == "1"
+
+
+def test_flush_times_out_when_write_is_slow(mocker):
+    writer, _ = _writer(mocker)
+    release = threading.Event()
+    writer._write_rows.side_effect = lambda rows: release.wait(timeout=5)
+
+    writer.save(_node_execution("1"))
+
+    assert not writer.flush("run", timeout=0.05)
+    release.set()
+    assert writer.flush("run", timeout=5)
+
+
+def test_failed_batch_is_retried(mocker):
+    mocker.patch.object(writer_module, "_RETRY_INTERVAL", 0)
+    writer, batches = _writer(mocker)
+    results = [False, True]
+    writer._write_rows.side_effect = lambda rows: (batches.append(rows), results.pop(0))[1]
+
+    writer.save(_node_execution("1"))
+
+    assert writer.flush("run", timeout=5)
+    assert [[row["id"] for row in batch] for batch in batches] == [["1"], ["1"]]
+    assert writer.stats()["retried"] == 1
+    assert writer.stats()["failed"] == 0
+
+
+def test_flush_writes_records_the_writer_gave_up(mocker):
+    mocker.patch.object(writer_module, "_RETRY_INTERVAL", 0)
+    writer, batches = _writer(mocker)
+    results = [False] * writer_module._MAX_WRITE_ATTEMPTS + [True]
+    writer._write_rows.side_effect = lambda rows: (batches.append(rows), results.pop(0))[1]
+
+    writer.save(_node_execution("1"))
+
+    assert writer.flush("run", timeout=5)
+    assert len(batches) == writer_module._MAX_WRITE_ATTEMPTS + 1
+    assert writer.stats()["failed"] == 0
+
+
+def test_flush_reports_records_that_could_not_be_written(mocker):
+    mocker.patch.object(writer_module, "_RETRY_INTERVAL", 0)
+    writer, batches = _writer(mocker)
+    writer._write_rows.side_effect = lambda rows: (batches.append(rows), False)[1]
+
+    writer.save(_node_execution("1"))
+
+    assert not writer.flush("run", timeout=5)
+    assert len(batches) == writer_module._MAX_WRITE_ATTEMPTS + 1
+    assert writer.stats()["failed"] == 1
+    # nothing is left to write
+    assert writer.flush("run", timeout=5)
+
+
+def test_flush_waits_only_for_the_records_of_the_run(mocker):
+    mocker.patch.object(writer_module, "_RETRY_INTERVAL", 0.1)
+    writer, batches = _writer(mocker, batch_size=1)
+
+    def write_rows(rows):
+        batches.append(rows)
+        return rows[0]["workflow_run_id"] != "other_run"
+
+    writer._write_rows.side_effect = write_rows
+    writer.save(_node_execution("1", workflow_run_id="other_run"))
+    writer.save(_node_execution("2"))
+
+    # the record of the other run is still retried
+    assert writer.flush("run", timeout=5)
+    assert [batch[0]["id"] for batch in batches] == ["1", "2"]
+    assert not writer.flush("other_run", timeout=5)
+    assert writer.stats()["failed"] == 1
@@ -0,0 +1,125 @@
+import subprocess
+import sys
+import threading
+
+import httpx
+import pytest
+
+from core.helper.code_executor import code_executor
+from core.helper.code_executor.code_execution_batcher import CodeExecutionBatcher
+from core.helper.code_executor.code_executor import (
+    CodeExecutionError,
+    CodeExecutionTimeoutError,
+    CodeExecutor,
+    CodeLanguage,
+)
+
+CODE = """
+def main(a: int) -> dict:
+    if a < 0:
+        raise ValueError("negative")
+    return {"result": a * 2}
+"""
+
+
+@pytest.fixture
+def sandbox_requests(mocker):
+    """Stand-in for the sandbox service running the posted python code in a subprocess."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        data = httpx.Response(200, content=request.content).json()
+        requests.append(data)
+        process = subprocess.run(
+            [sys.executable, "-c", data["preload"] + "\n" + data["code"]], capture_output=True, text=True, timeout=30
+        )
+        error = process.stderr if process.returncode else ""
+        return httpx.Response(
+            200, json={"code": 0, "message": "success", "data": {"stdout": process.stdout, "error": error}}
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    mocker.patch.object(code_executor, "_get_client", return_value=client)
+    return requests
+
+
+def test_execute_batch(sandbox_requests):
+    results = CodeExecutor.execute_workflow_code_template_batch(
+        CodeLanguage.PYTHON3, CODE, [{"a": 1}, {"a": -1}, {"a": 3}]
+    )
+
+    assert len(sandbox_requests) == 1
+    assert results[0] == {"result": 2}
+    assert isinstance(results[1], CodeExecutionError)
+    assert "negative" in str(results[1])
+    assert results[2] == {"result": 6}
+
+
+def test_execute_batch_falls_back_to_single_runs(sandbox_requests):
+    code = 'raise RuntimeError("broken")\n' + CODE
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, code, [{"a": 1}, {"a": 2}])
+
+    # the failed batch and then one request for each inputs
+    assert len(sandbox_requests) == 3
+    assert all(isinstance(result, CodeExecutionError) for result in results)
+
+
+def test_execute_batch_does_not_run_timed_out_inputs_again(mocker, sandbox_requests):
+    execute_code = mocker.patch.object(CodeExecutor, "execute_code", side_effect=CodeExecutionTimeoutError("timed out"))
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, CODE, [{"a": 1}, {"a": 2}])
+
+    execute_code.assert_called_once()
+    assert all(isinstance(result, CodeExecutionTimeoutError) for result in results)
+
+
+def _execute(batcher: CodeExecutionBatcher, a: int, tenant_id: str = "tenant_id"):
+    return batcher.execute(
+        tenant_id=tenant_id,
+        workflow_id="workflow_id",
+        node_id="code",
+        language=CodeLanguage.PYTHON3,
+        code=CODE,
+        inputs={"a": a},
+    )
+
+
+def test_batcher_groups_concurrent_runs(sandbox_requests):
+    batcher = CodeExecutionBatcher(max_batch_size=4, max_wait=5.0)
+    results: dict[int, object] = {}
+
+    def run(a: int) -> None:
+        try:
+            results[a] = _execute(batcher, a)
+        except CodeExecutionError as e:
+            results[a] = e
+
+    threads = [threading.Thread(target=run, args=(a,)) for a in (1, 2, -3, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # the batch is executed once it is full, without waiting for max_wait
+    assert len(sandbox_requests) == 1
+    assert results[1] == {"result": 2}
+    assert results[4] == {"result": 8}
+    assert isinstance(results[-3], CodeExecutionError)
+
+
+def test_batcher_does_not_group_runs_of_other_workspaces(sandbox_requests):
+    batcher = CodeExecutionBatcher(max_batch_size=2, max_wait=0.2)
+    results: dict[int, object] = {}
+
+    def run(a: int, tenant_id: str) -> None:
+        results[a] = _execute(batcher, a, tenant_id)
+
+    threads = [threading.Thread(target=run, args=(a, f"tenant_{a}")) for a in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sandbox_requests) == 2
+    assert results == {1: {"result": 2}, 2: {"result": 4}}
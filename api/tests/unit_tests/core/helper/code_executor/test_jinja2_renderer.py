@@ -0,0 +1,65 @@
+import pytest
+
+from configs import dify_config
+from core.helper.code_executor.code_executor import CodeExecutionError, CodeExecutor, CodeLanguage
+from core.helper.code_executor.jinja2.jinja2_renderer import Jinja2Renderer, Jinja2RenderError
+
+
+def test_render():
+    renderer = Jinja2Renderer(cache_size=2, max_output_length=1000, timeout=5.0)
+    template = "Hello {{ name }}!{% for item in items %} {{ item }}{% endfor %}"
+
+    assert renderer.render(template, {"name": "Dify", "items": [1, 2]}) == "Hello Dify! 1 2"
+    assert renderer.render(template, {"name": "you", "items": []}) == "Hello you!"
+    assert renderer._get_template(template) is renderer._get_template(template)
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "{{ ''.__class__.__mro__[1].__subclasses__() }}",
+        "{% set _ = items.append(1) %}",
+        "{% for i in range(100) %}{{ i }}{% endfor %}",
+        "{{ name",
+    ],
+)
+def test_render_error(template):
+    renderer = Jinja2Renderer(cache_size=2, max_output_length=100, timeout=5.0)
+
+    with pytest.raises(Jinja2RenderError):
+        renderer.render(template, {"name": "Dify", "items": []})
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "{{ 'a' * 300000000 }}",
+        "{{ 300000000 * [1] }}",
+        "{{ 2 ** 300000000 }}",
+        "{{ 'a' * 60 + 'b' * 60 }}",
+    ],
+)
+def test_render_error_before_allocating_large_values(template):
+    renderer = Jinja2Renderer(cache_size=2, max_output_length=100, timeout=5.0)
+
+    with pytest.raises(Jinja2RenderError, match="exceeds 100 characters"):
+        renderer.render(template, {})
+    assert renderer.render("{{ 'ab' * 2 }} {{ 2 ** 10 }} {{ 3 * 4 }}", {}) == "abab 1024 12"
+
+
+def test_render_times_out_without_output():
+    renderer = Jinja2Renderer(cache_size=2, max_output_length=100, timeout=0.05)
+
+    with pytest.raises(Jinja2RenderError, match="timed out"):
+        renderer.render("{% for i in range(100000) %}{% for j in range(100000) %}{% endfor %}{% endfor %}", {})
+
+
+def test_code_executor_renders_locally(mocker):
+    mocker.patch.object(dify_config, "JINJA2_RENDERER", "local")
+    execute_code = mocker.patch.object(CodeExecutor, "execute_code")
+
+    result = CodeExecutor.execute_workflow_code_template(CodeLanguage.JINJA2, "{{ a }}-{{ b }}", {"a": 1, "b": "x"})
+    assert result == {"result": "1-x"}
+    with pytest.raises(CodeExecutionError):
+        CodeExecutor.execute_workflow_code_template(CodeLanguage.JINJA2, "{% if %}", {})
+    execute_code.assert_not_called()
@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+import pytest
+import redis
+
+from configs import dify_config
+from core.helper import indexing_slots as indexing_slots_module
+from core.helper.indexing_slots import IndexingSchedulerStats, IndexingSlots, hold_indexing_slots
+from extensions.ext_redis import redis_client
+
+
+@pytest.fixture
+def scripts(mocker):
+    redis_client.initialize(redis.Redis())
+    scripts: list[MagicMock] = []
+
+    def register_script(script):
+        scripts.append(MagicMock(name=script))
+        return scripts[-1]
+
+    mocker.patch.object(redis_client, "register_script", side_effect=register_script)
+    mocker.patch.object(indexing_slots_module, "indexing_scheduler_stats", IndexingSchedulerStats())
+    return scripts
+
+
+def test_hold_waits_for_a_free_slot(mocker, scripts):
+    sleep = mocker.patch.object(indexing_slots_module.time, "sleep")
+    zrem = mocker.patch.object(redis_client, "zrem")
+    slots = IndexingSlots("indexing_slots:dataset:dataset_id", 2)
+    scripts[0].side_effect = [0, 0, 1]
+
+    with slots.hold():
+        assert sleep.call_count == 2
+        assert indexing_slots_module.indexing_scheduler_stats.snapshot()["waiting"] == 0
+
+    keys = scripts[0].call_args.kwargs["keys"]
+    token = scripts[0].call_args.kwargs["args"][3]
+    assert keys == ["indexing_slots:dataset:dataset_id"]
+    assert scripts[0].call_args.kwargs["args"][2] == 2
+    zrem.assert_called_once_with("indexing_slots:dataset:dataset_id", token)
+
+
+def test_hold_indexing_slots(mocker, scripts):
+    mocker.patch.object(dify_config, "INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_DATASET", 3)
+    mocker.patch.object(dify_config, "INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_TENANT", 5)
+    zrem = mocker.patch.object(redis_client, "zrem")
+
+    with hold_indexing_slots("tenant_id", "dataset_id"):
+        dataset_script, tenant_script = scripts
+        assert dataset_script.call_args.kwargs["keys"] == ["indexing_slots:dataset:dataset_id"]
+        assert dataset_script.call_args.kwargs["args"][2] == 3
+        assert tenant_script.call_args.kwargs["keys"] == ["indexing_slots:tenant:tenant_id"]
+        assert tenant_script.call_args.kwargs["args"][2] == 5
+        zrem.assert_not_called()
+
+    # the tenant slot is released first
+    assert [call.args[0] for call in zrem.call_args_list] == [
+        "indexing_slots:tenant:tenant_id",
+        "indexing_slots:dataset:dataset_id",
+    ]
@@ -0,0 +1,172 @@
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from configs import dify_config
+from core.entities.provider_entities import QuotaConfiguration, QuotaUnit
+from core.helper import provider_usage_counter as provider_usage_counter_module
+from core.helper.model_provider_cache import ProviderConfigurationsVersion
+from core.helper.provider_usage_counter import ProviderUsageCounter, deduct_provider_quota
+from extensions.ext_redis import redis_client
+from models.provider import ProviderQuotaType
+
+_KEY = "{provider_usage}:quota:tenant_id:openai:trial"
+_DIRTY_QUOTAS_KEY = "{provider_usage}:dirty_quotas"
+
+
+@pytest.fixture
+def redis(mocker):
+    client = fakeredis.FakeRedis()
+    mocker.patch.object(redis_client, "_client", client)
+    return client
+
+
+@pytest.fixture
+def counter(mocker, redis):
+    counter = ProviderUsageCounter(engine=MagicMock(), flush_interval=10.0)
+    mocker.patch.object(counter, "_start_worker")
+    db = mocker.patch.object(provider_usage_counter_module, "db")
+    db.session.query.return_value.filter.return_value.first.return_value = MagicMock(quota_used=90, quota_limit=100)
+    return counter
+
+
+@pytest.fixture
+def session(mocker):
+    session = mocker.patch.object(provider_usage_counter_module, "Session").return_value.__enter__.return_value
+    session.execute.return_value.first.return_value = MagicMock(quota_used=95, quota_limit=100)
+    return session
+
+
+def _written_delta(session) -> int:
+    stmt = session.execute.call_args.args[0]
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    assert "quota_used=(coalesce(providers.quota_used, %(coalesce_1)s) + %(coalesce_2)s)" in str(compiled)
+    return compiled.params["coalesce_2"]
+
+
+def test_deduct_quota_loads_counter(redis, counter):
+    assert counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5) == (95, 100, True)
+    assert counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 10) == (105, 100, True)
+    # the quota is used up
+    assert counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 1) == (105, 100, False)
+
+    assert counter.get_quota_used("tenant_id", "openai", ProviderQuotaType.TRIAL) == 105
+    assert redis.smembers(_DIRTY_QUOTAS_KEY) == {_KEY.encode()}
+    # a counter with quota not written yet does not expire
+    assert redis.ttl(_KEY) == -1
+
+    # no record of the quota
+    provider_usage_counter_module.db.session.query.return_value.filter.return_value.first.return_value = None
+    assert counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.PAID, 5) is None
+
+
+def test_flush_adds_the_deducted_quota(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+    # the quota was reset in the database meanwhile
+    session.execute.return_value.first.return_value = MagicMock(quota_used=5, quota_limit=200)
+
+    assert counter.flush() is True
+
+    assert _written_delta(session) == 5
+    assert counter.get_quota_used("tenant_id", "openai", ProviderQuotaType.TRIAL) == 5
+    assert counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 150) == (155, 200, True)
+    counter.flush()
+    assert _written_delta(session) == 150
+
+
+def test_flush_marks_the_counter_clean(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+
+    counter.flush()
+
+    assert redis.smembers(_DIRTY_QUOTAS_KEY) == set()
+    assert 0 < redis.ttl(_KEY) <= provider_usage_counter_module._IDLE_COUNTER_TTL
+    session.execute.reset_mock()
+    counter.flush()
+    session.execute.assert_not_called()
+
+
+def test_flush_keeps_the_quota_deducted_while_written(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+
+    def execute(stmt):
+        counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 2)
+        return MagicMock(first=MagicMock(return_value=MagicMock(quota_used=95, quota_limit=100)))
+
+    session.execute.side_effect = execute
+    counter.flush()
+
+    assert counter.get_quota_used("tenant_id", "openai", ProviderQuotaType.TRIAL) == 97
+    assert redis.smembers(_DIRTY_QUOTAS_KEY) == {_KEY.encode()}
+    assert redis.ttl(_KEY) == -1
+
+
+def test_flush_writes_the_quota_again_after_a_failure(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+    session.commit.side_effect = ValueError("connection lost")
+
+    with pytest.raises(ValueError):
+        counter.flush()
+
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 3)
+    session.commit.side_effect = None
+    session.execute.return_value.first.return_value = MagicMock(quota_used=98, quota_limit=100)
+    counter.flush()
+
+    assert _written_delta(session) == 8
+    assert counter.get_quota_used("tenant_id", "openai", ProviderQuotaType.TRIAL) == 98
+    assert redis.smembers(_DIRTY_QUOTAS_KEY) == set()
+
+
+def test_flush_drops_the_counter_of_a_deleted_provider(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+    session.execute.return_value.first.return_value = None
+
+    counter.flush()
+
+    assert not redis.exists(_KEY)
+    assert redis.smembers(_DIRTY_QUOTAS_KEY) == set()
+
+
+def test_flush_last_used(mocker, redis, counter, session):
+    mocker.patch.object(provider_usage_counter_module.time, "time", return_value=1700000000.5)
+    counter.touch("tenant_id", "openai")
+
+    assert counter.flush() is True
+
+    session.execute.assert_called_once()
+    assert redis.hgetall("{provider_usage}:last_used") == {}
+
+
+def test_flush_skipped_while_another_process_writes(redis, counter, session):
+    counter.deduct_quota("tenant_id", "openai", ProviderQuotaType.TRIAL, 5)
+
+    with redis_client.lock("{provider_usage}:flush_lock"):
+        assert counter.flush() is False
+
+    session.execute.assert_not_called()
+
+
+@pytest.mark.parametrize(("result", "bumped"), [((50, 100, True), False), ((100, 100, True), True), (None, False)])
+def test_deduct_provider_quota(mocker, result, bumped):
+    mocker.patch.object(dify_config, "PROVIDER_USAGE_COUNTER_ENABLED", True)
+    counter = mocker.patch.object(provider_usage_counter_module, "get_provider_usage_counter").return_value
+    counter.deduct_quota.return_value = result
+    bump = mocker.patch.object(ProviderConfigurationsVersion, "bump")
+    quota_configuration = QuotaConfiguration(
+        quota_type=ProviderQuotaType.TRIAL,
+        quota_unit=QuotaUnit.TOKENS,
+        quota_limit=100,
+        quota_used=0,
+        is_valid=True,
+        restrict_models=[],
+    )
+
+    deduct_provider_quota("tenant_id", "openai", quota_configuration, 10)
+
+    counter.deduct_quota.assert_called_once_with(
+        tenant_id="tenant_id", provider_name="openai", quota_type=ProviderQuotaType.TRIAL, amount=10
+    )
+    assert bump.called is bumped
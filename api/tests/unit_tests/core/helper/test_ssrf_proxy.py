@@ -1,8 +1,10 @@
 import random
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
 
+from core.helper import ssrf_proxy
 from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
 
 
@@ -50,3 +52,42 @@ def test_retry_logic_success(mock_request):
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
     assert mock_request.call_args_list[0][1].get("method") == "GET"
+
+
+@patch("httpx.Client.request")
+def test_client_is_reused_between_requests(mock_request):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_request.return_value = mock_response
+
+    make_request("GET", "http://example.com")
+    make_request("GET", "http://example.com")
+
+    assert ssrf_proxy._get_client() is ssrf_proxy._get_client()
+    assert len(ssrf_proxy.get_pool_stats()["pools"]) == 1
+
+
+def test_shared_client_does_not_persist_cookies():
+    client = ssrf_proxy._get_client()
+    request = httpx.Request("GET", "http://example.com")
+    response = httpx.Response(200, headers={"set-cookie": "session=secret"}, request=request)
+
+    client.cookies.extract_cookies(response)
+
+    assert not client.cookies
+
+
+def test_host_limiter():
+    limiter = ssrf_proxy._HostLimiter()
+    limiter.acquire("example.com", 1, None)
+    limiter.acquire("dify.ai", 1, None)
+
+    with pytest.raises(httpx.PoolTimeout):
+        limiter.acquire("example.com", 1, 0.01)
+    assert limiter.waits == 1
+
+    limiter.release("example.com")
+    limiter.acquire("example.com", 1, 0.01)
+    limiter.release("example.com")
+    limiter.release("dify.ai")
+    assert not limiter._in_flight
@@ -0,0 +1,45 @@
+from concurrent.futures import Future
+
+from core.helper.tenant_fair_queue import TenantFairQueue, WorkItem
+
+
+def _item(tenant_id: str, value: int) -> WorkItem:
+    return WorkItem(tenant_id, Future(), lambda: value, (), {})
+
+
+def test_take_round_robin_across_tenants():
+    queue: TenantFairQueue[WorkItem] = TenantFairQueue()
+    for value in range(3):
+        queue.put(_item("tenant_a", value))
+    queue.put(_item("tenant_b", 10))
+
+    taken = []
+    while (item := queue.take()) is not None:
+        item.run()
+        taken.append((item.tenant_id, item.future.result()))
+
+    assert taken == [("tenant_a", 0), ("tenant_b", 10), ("tenant_a", 1), ("tenant_a", 2)]
+    assert len(queue) == 0
+    assert queue.max_depth == 4
+    assert queue.tenant_count == 0
+
+
+def test_take_skips_items_that_cannot_start():
+    queue: TenantFairQueue[WorkItem] = TenantFairQueue()
+    queue.put(_item("tenant_a", 0))
+    queue.put(_item("tenant_a", 1))
+    queue.put(_item("tenant_b", 2))
+
+    item = queue.take(lambda item: item.tenant_id == "tenant_b")
+    assert item is not None
+    assert item.tenant_id == "tenant_b"
+    assert queue.take(lambda item: False) is None
+    assert len(queue) == 2
+    assert queue.tenant_count == 1
+
+
+def test_cancelled_item_does_not_run():
+    item = _item("tenant_a", 0)
+    item.future.cancel()
+
+    assert item.run() is False
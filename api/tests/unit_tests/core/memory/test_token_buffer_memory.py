@@ -0,0 +1,87 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.memory import token_buffer_memory
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import AssistantPromptMessage, PromptMessage, UserPromptMessage
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        pipeline = MagicMock()
+        pipeline.setex.side_effect = lambda key, ttl, value: self.data.__setitem__(key, str(value).encode())
+        return pipeline
+
+
+def _count_tokens(prompt_messages: list[PromptMessage]) -> int:
+    # 3 tokens of priming per request and 4 tokens of overhead per message, like OpenAI chat models
+    return 3 + sum(len(str(prompt_message.content)) + 4 for prompt_message in prompt_messages)
+
+
+@pytest.fixture
+def memory(mocker):
+    mocker.patch.object(token_buffer_memory, "redis_client", FakeRedis())
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "gpt-4o"
+    model_instance.get_llm_num_tokens.side_effect = _count_tokens
+    return TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance)
+
+
+def _prompt_messages(count: int) -> list[PromptMessage]:
+    prompt_messages: list[PromptMessage] = []
+    for i in range(count):
+        prompt_messages.append(UserPromptMessage(content=f"question {i}" * (i % 3 + 1)))
+        prompt_messages.append(AssistantPromptMessage(content=f"answer {i}" * (i % 5 + 1)))
+    return prompt_messages
+
+
+def _naive_prune(prompt_messages: list[PromptMessage], max_token_limit: int) -> list[PromptMessage]:
+    prompt_messages = list(prompt_messages)
+    while _count_tokens(prompt_messages) > max_token_limit and len(prompt_messages) > 1:
+        prompt_messages.pop(0)
+    return prompt_messages
+
+
+@pytest.mark.parametrize("max_token_limit", [0, 50, 200, 500])
+def test_prune_matches_message_by_message_pruning(memory, max_token_limit):
+    prompt_messages = _prompt_messages(20)
+    total = _count_tokens(prompt_messages)
+
+    pruned = memory._prune_prompt_messages(list(prompt_messages), total, max_token_limit)
+
+    assert pruned == _naive_prune(prompt_messages, max_token_limit)
+
+
+def test_prune_counts_each_message_once(memory):
+    prompt_messages = _prompt_messages(50)
+    total = _count_tokens(prompt_messages)
+
+    memory._prune_prompt_messages(list(prompt_messages), total, 300)
+    # one count per message plus one verification of the result
+    assert memory.model_instance.get_llm_num_tokens.call_count == len(prompt_messages) + 1
+
+    memory.model_instance.get_llm_num_tokens.reset_mock()
+    memory._prune_prompt_messages(list(prompt_messages), total, 300)
+    # counts are cached for the next turn of the conversation
+    assert memory.model_instance.get_llm_num_tokens.call_count == 1
+
+
+def test_prune_falls_back_when_tokens_are_not_additive(memory):
+    prompt_messages = _prompt_messages(10)
+    total = _count_tokens(prompt_messages)
+    # an underestimated per message count must not let the result exceed the limit
+    memory.model_instance.get_llm_num_tokens.side_effect = lambda messages: (
+        1 if len(messages) == 1 else _count_tokens(messages)
+    )
+
+    pruned = memory._prune_prompt_messages(list(prompt_messages), total, 100)
+
+    assert pruned == _naive_prune(prompt_messages, 100)
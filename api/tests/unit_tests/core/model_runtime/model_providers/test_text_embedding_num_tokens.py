@@ -0,0 +1,32 @@
+from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
+from core.model_runtime.model_providers.huggingface_tei.tei_helper import TeiHelper
+from core.model_runtime.model_providers.huggingface_tei.text_embedding.text_embedding import (
+    HuggingfaceTeiTextEmbeddingModel,
+)
+from core.model_runtime.model_providers.openai_api_compatible.text_embedding.text_embedding import (
+    OAICompatEmbeddingModel,
+)
+
+TEXTS = ["Dify is an open-source LLM app development platform.", "", "hello world"]
+
+
+def test_gpt2_num_tokens_batch():
+    assert GPT2Tokenizer.get_num_tokens_batch(TEXTS) == [GPT2Tokenizer.get_num_tokens(text) for text in TEXTS]
+
+
+def test_openai_api_compatible_num_tokens_batch():
+    model = OAICompatEmbeddingModel()
+
+    num_tokens = model.get_num_tokens_batch("model", {}, TEXTS)
+
+    assert num_tokens == [GPT2Tokenizer.get_num_tokens(text) for text in TEXTS]
+    assert model.get_num_tokens("model", {}, TEXTS) == sum(num_tokens)
+
+
+def test_tei_num_tokens_batch(mocker):
+    invoke_tokenize = mocker.patch.object(TeiHelper, "invoke_tokenize", return_value=[[{}] * 3, [], [{}] * 2])
+    model = HuggingfaceTeiTextEmbeddingModel()
+
+    assert model.get_num_tokens_batch("model", {"server_url": "http://tei/"}, TEXTS) == [3, 0, 2]
+    # all the texts are tokenized in a single request
+    invoke_tokenize.assert_called_once_with("http://tei", TEXTS, {"Authorization": "Bearer None"})
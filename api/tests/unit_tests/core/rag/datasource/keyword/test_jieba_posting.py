@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource.keyword.jieba import jieba_posting
+from core.rag.datasource.keyword.jieba.jieba_posting import JiebaPosting
+from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.keyword.keyword_type import KeyWordType
+from core.rag.models.document import Document
+
+
+@pytest.fixture
+def mock_db(mocker):
+    return mocker.patch.object(jieba_posting, "db")
+
+
+@pytest.fixture
+def keyword_index():
+    dataset = MagicMock()
+    dataset.id = "dataset_id"
+    return JiebaPosting(dataset)
+
+
+def test_factory_returns_posting_store():
+    assert Keyword.get_keyword_factory(KeyWordType.JIEBA_POSTING) is JiebaPosting
+
+
+def test_add_texts_inserts_postings_in_one_statement(mocker, mock_db, keyword_index):
+    mocker.patch.object(jieba_posting, "JiebaKeywordTableHandler")
+    update_segment_keywords = mocker.patch.object(JiebaPosting, "_update_segment_keywords")
+    texts = [
+        Document(page_content="foo", metadata={"doc_id": "node_1"}),
+        Document(page_content="bar", metadata={"doc_id": "node_2"}),
+    ]
+
+    keyword_index.add_texts(texts, keywords_list=[["apple", "apple", "pear"], ["pear"]])
+
+    assert update_segment_keywords.call_count == 2
+    mock_db.session.execute.assert_called_once()
+    values = mock_db.session.execute.call_args.args[1]
+    assert sorted((value["keyword"], value["index_node_id"]) for value in values) == [
+        ("apple", "node_1"),
+        ("pear", "node_1"),
+        ("pear", "node_2"),
+    ]
+    assert all(value["dataset_id"] == "dataset_id" for value in values)
+    mock_db.session.commit.assert_called_once()
+
+
+def test_search_keeps_posting_rank_order(mocker, mock_db, keyword_index):
+    mocker.patch.object(JiebaPosting, "_retrieve_ids_by_keywords", return_value=["node_2", "node_1"])
+    segments = []
+    for node_id in ("node_1", "node_2"):
+        segment = MagicMock()
+        segment.index_node_id = node_id
+        segment.content = f"content of {node_id}"
+        segments.append(segment)
+    mock_db.session.query.return_value.filter.return_value.all.return_value = segments
+
+    documents = keyword_index.search("query", top_k=2)
+
+    assert [document.metadata["doc_id"] for document in documents] == ["node_2", "node_1"]
+    assert mock_db.session.query.call_count == 1
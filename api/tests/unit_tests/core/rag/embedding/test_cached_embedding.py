@@ -0,0 +1,127 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.entities.embedding_type import EmbeddingInputType
+from core.model_runtime.entities.text_embedding_entities import EmbeddingUsage, TextEmbeddingResult
+from core.rag.embedding import cached_embedding
+from core.rag.embedding.cached_embedding import CacheEmbedding, EmbeddingCacheStats, MemoryEmbeddingCache
+from core.rag.embedding.embedding_codec import encode_embedding
+from libs import helper
+from models.dataset import Embedding
+
+
+def _usage() -> EmbeddingUsage:
+    return EmbeddingUsage(
+        tokens=1, total_tokens=1, unit_price=0, price_unit=0, total_price=0, currency="USD", latency=0
+    )
+
+
+def _cached_row(text: str, vector: list[float]) -> tuple[str, bytes]:
+    embedding = Embedding(model_name="model", hash=helper.generate_text_hash(text), provider_name="provider")
+    embedding.set_embedding(vector)
+    return embedding.hash, embedding.embedding
+
+
+@pytest.fixture
+def model_instance():
+    model_instance = MagicMock()
+    model_instance.provider = "provider"
+    model_instance.model = "model"
+    model_instance.load_balancing_manager = None
+    model_instance.model_type_instance.get_model_schema.return_value = None
+
+    def invoke_text_embedding(texts, user=None, input_type=EmbeddingInputType.DOCUMENT):
+        return TextEmbeddingResult(
+            model="model", embeddings=[[float(len(text)), 0.0] for text in texts], usage=_usage()
+        )
+
+    model_instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    return model_instance
+
+
+@pytest.fixture
+def mock_db(mocker):
+    db = mocker.patch.object(cached_embedding, "db")
+    mocker.patch.object(cached_embedding, "redis_client", MagicMock())
+    mocker.patch.object(cached_embedding, "embedding_cache_stats", EmbeddingCacheStats())
+    mocker.patch.object(cached_embedding, "memory_embedding_cache", None)
+    return db
+
+
+def test_embed_documents_uses_one_lookup_per_batch(mocker, model_instance, mock_db):
+    mocker.patch.object(cached_embedding.dify_config, "EMBEDDING_CACHE_LOOKUP_BATCH_SIZE", 2)
+    mock_db.session.query.return_value.filter.return_value.all.side_effect = [
+        [_cached_row("a", [1.0, 0.0])],
+        [_cached_row("ccc", [0.0, 1.0])],
+    ]
+
+    embeddings = CacheEmbedding(model_instance).embed_documents(["a", "bb", "ccc", "bb"])
+
+    assert mock_db.session.query.call_count == 2
+    assert embeddings == [[1.0, 0.0], [1.0, 0.0], [0.0, 1.0], [1.0, 0.0]]
+    # the duplicated text is only embedded once
+    model_instance.invoke_text_embedding.assert_called_once()
+    assert model_instance.invoke_text_embedding.call_args.kwargs["texts"] == ["bb"]
+    mock_db.session.execute.assert_called_once()
+    assert [row["hash"] for row in mock_db.session.execute.call_args.args[1]] == [helper.generate_text_hash("bb")]
+    assert cached_embedding.embedding_cache_stats.snapshot() == {
+        "memory_hits": 0,
+        "redis_hits": 0,
+        "database_hits": 2,
+        "misses": 1,
+    }
+
+
+def test_embed_documents_memory_tier(mocker, model_instance, mock_db):
+    mocker.patch.object(cached_embedding, "memory_embedding_cache", MemoryEmbeddingCache(10))
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+    cache_embedding = CacheEmbedding(model_instance)
+
+    first = cache_embedding.embed_documents(["a", "bb"])
+    assert model_instance.invoke_text_embedding.call_count == 2
+    second = cache_embedding.embed_documents(["a", "bb"])
+
+    assert first == second
+    assert model_instance.invoke_text_embedding.call_count == 2
+    assert mock_db.session.query.call_count == 1
+    assert cached_embedding.embedding_cache_stats.snapshot()["memory_hits"] == 2
+
+
+def test_embed_documents_redis_tier(mocker, model_instance, mock_db):
+    mocker.patch.object(cached_embedding.dify_config, "EMBEDDING_CACHE_REDIS_ENABLED", True)
+    redis_client = cached_embedding.redis_client
+    redis_client.mget.return_value = [encode_embedding([0.6, 0.8]), None]
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+
+    embeddings = CacheEmbedding(model_instance).embed_documents(["a", "bb"])
+
+    assert np.allclose(embeddings[0], [0.6, 0.8])
+    assert embeddings[1] == [1.0, 0.0]
+    assert model_instance.invoke_text_embedding.call_args.kwargs["texts"] == ["bb"]
+    redis_client.pipeline.return_value.execute.assert_called_once()
+    assert cached_embedding.embedding_cache_stats.snapshot()["redis_hits"] == 1
+
+
+def test_embed_documents_raises_for_nan_embeddings(model_instance, mock_db):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+
+    # the zero vector of the empty text normalizes to nan
+    with pytest.raises(ValueError, match="Failed to embed 1 of 2 texts"):
+        CacheEmbedding(model_instance).embed_documents(["a", ""])
+
+    # the other embeddings are still cached
+    assert [row["hash"] for row in mock_db.session.execute.call_args.args[1]] == [helper.generate_text_hash("a")]
+
+
+def test_memory_cache_returns_copies():
+    memory_cache = MemoryEmbeddingCache(10)
+    embedding = [1.0, 0.0]
+    memory_cache.put(("key",), embedding)
+    embedding.append(2.0)
+
+    cached = memory_cache.get(("key",))
+    assert cached == [1.0, 0.0]
+    cached.append(3.0)
+    assert memory_cache.get(("key",)) == [1.0, 0.0]
@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.entities.embedding_type import EmbeddingInputType
+from core.model_runtime.entities.text_embedding_entities import EmbeddingUsage, TextEmbeddingResult
+from core.model_runtime.errors.invoke import InvokeRateLimitError
+from core.rag.embedding import embedding_batcher as embedding_batcher_module
+from core.rag.embedding.embedding_batcher import EmbeddingBatcher
+
+
+def _result(texts: list[str]) -> TextEmbeddingResult:
+    usage = EmbeddingUsage(
+        tokens=1, total_tokens=1, unit_price=0, price_unit=0, total_price=0, currency="USD", latency=0
+    )
+    return TextEmbeddingResult(model="model", embeddings=[[float(len(text)), 0.0] for text in texts], usage=usage)
+
+
+@pytest.fixture
+def model_instance():
+    model_instance = MagicMock()
+    model_instance.provider = "provider"
+    model_instance.model = "model"
+    model_instance.load_balancing_manager = None
+    model_instance.invoke_text_embedding.side_effect = lambda texts, user, input_type: _result(texts)
+    return model_instance
+
+
+def test_embed_coalesces_concurrent_texts(model_instance):
+    batcher = EmbeddingBatcher(max_wait=5.0, max_concurrency=2)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(batcher.embed, model_instance, texts, 4) for texts in (["a", "bb"], ["ccc", "dddd"])]
+
+    assert [future.result() for future in futures] == [[[1.0, 0.0], [2.0, 0.0]], [[3.0, 0.0], [4.0, 0.0]]]
+    # the texts of both documents filled a single batch of the model
+    model_instance.invoke_text_embedding.assert_called_once()
+    assert model_instance.invoke_text_embedding.call_args.kwargs["input_type"] == EmbeddingInputType.DOCUMENT
+    snapshot = batcher.snapshot()
+    assert snapshot["batches"] == 1
+    assert snapshot["texts"] == 4
+    assert snapshot["queued_texts"] == 0
+
+
+def test_embed_retries_rate_limited_batches(mocker, model_instance):
+    sleep = mocker.patch.object(embedding_batcher_module.time, "sleep")
+    model_instance.invoke_text_embedding.side_effect = [InvokeRateLimitError("rate limited"), _result(["a"])]
+    batcher = EmbeddingBatcher(max_wait=0.01, max_concurrency=2)
+
+    assert batcher.embed(model_instance, ["a"], 4) == [[1.0, 0.0]]
+    sleep.assert_called_once_with(2.0)
+    assert batcher.snapshot()["rate_limit_retries"] == 1
+
+    model_instance.invoke_text_embedding.side_effect = ValueError("invalid credentials")
+    with pytest.raises(ValueError):
+        batcher.embed(model_instance, ["a", "bb"], 4)
+    assert batcher.snapshot()["errors"] == 1
+
+
+def test_embed_sends_full_batches_concurrently(model_instance):
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def invoke_text_embedding(texts, user, input_type):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.2)
+        with lock:
+            in_flight[0] -= 1
+        return _result(texts)
+
+    model_instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    model_instance.load_balancing_manager = MagicMock(configs_count=2)
+    batcher = EmbeddingBatcher(max_wait=5.0, max_concurrency=2)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(batcher.embed, model_instance, ["a" * i, "b" * i], 2) for i in range(1, 5)]
+    elapsed = time.perf_counter() - started_at
+
+    assert [future.result() for future in futures] == [[[float(i), 0.0]] * 2 for i in range(1, 5)]
+    # 2 senders per load balancing config, the 4 full batches overlap
+    assert in_flight[1] == 4
+    assert elapsed < 0.6
@@ -0,0 +1,57 @@
+import base64
+import pickle
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.embedding_codec import (
+    EmbeddingStorageFormat,
+    decode_cached_embedding,
+    decode_embedding,
+    decode_embedding_array,
+    encode_embedding,
+    get_embedding_storage_format,
+)
+
+EMBEDDING = [0.1, -0.25, 0.5, 0.8]
+
+
+@pytest.mark.parametrize(
+    ("storage_format", "item_size"),
+    [
+        (EmbeddingStorageFormat.FLOAT32, 4),
+        (EmbeddingStorageFormat.FLOAT16, 2),
+    ],
+)
+def test_binary_round_trip(storage_format, item_size):
+    data = encode_embedding(EMBEDDING, storage_format)
+
+    assert len(data) == 4 + item_size * len(EMBEDDING)
+    assert get_embedding_storage_format(data) == storage_format
+    assert np.allclose(decode_embedding(data), EMBEDDING, atol=1e-3)
+
+
+def test_decode_embedding_array_is_zero_copy():
+    data = encode_embedding(EMBEDDING, EmbeddingStorageFormat.FLOAT32)
+
+    array = decode_embedding_array(data)
+
+    assert array.dtype == np.float32
+    assert not array.flags.owndata
+    assert not array.flags.writeable
+
+
+def test_legacy_pickle_rows_are_readable():
+    data = pickle.dumps(EMBEDDING, protocol=pickle.HIGHEST_PROTOCOL)
+
+    assert get_embedding_storage_format(data) == EmbeddingStorageFormat.PICKLE
+    assert decode_embedding(data) == EMBEDDING
+    assert encode_embedding(EMBEDDING, EmbeddingStorageFormat.PICKLE) == data
+
+
+def test_decode_cached_embedding_accepts_legacy_base64():
+    legacy = base64.b64encode(np.array(EMBEDDING).tobytes())
+
+    assert decode_cached_embedding(legacy) == EMBEDDING
+    assert np.allclose(decode_cached_embedding(encode_embedding(EMBEDDING)), EMBEDDING)
+    assert decode_cached_embedding(encode_embedding(EMBEDDING, EmbeddingStorageFormat.PICKLE)) == EMBEDDING
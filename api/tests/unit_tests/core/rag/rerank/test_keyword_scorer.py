@@ -0,0 +1,52 @@
+import math
+from collections import Counter
+
+import pytest
+
+from core.rag.rerank.keyword_scorer import calculate_tfidf_cosine_scores
+
+
+def _reference_scores(query_keywords: set[str], documents_keywords: list[set[str]]) -> list[float]:
+    # the pure-python scoring previously used by WeightRerankRunner and DatasetRetrieval
+    total_documents = len(documents_keywords)
+    all_keywords: set[str] = set().union(*documents_keywords)
+    keyword_idf = {
+        keyword: math.log(
+            (1 + total_documents) / (1 + sum(1 for keywords in documents_keywords if keyword in keywords))
+        )
+        + 1
+        for keyword in all_keywords
+    }
+    query_tfidf = {keyword: count * keyword_idf.get(keyword, 0) for keyword, count in Counter(query_keywords).items()}
+
+    similarities = []
+    for document_keywords in documents_keywords:
+        document_tfidf = {
+            keyword: count * keyword_idf[keyword] for keyword, count in Counter(document_keywords).items()
+        }
+        numerator = sum(query_tfidf[x] * document_tfidf[x] for x in set(query_tfidf) & set(document_tfidf))
+        denominator = math.sqrt(sum(v**2 for v in query_tfidf.values())) * math.sqrt(
+            sum(v**2 for v in document_tfidf.values())
+        )
+        similarities.append(numerator / denominator if denominator else 0.0)
+    return similarities
+
+
+@pytest.mark.parametrize(
+    ("query_keywords", "documents_keywords"),
+    [
+        ({"dify", "workflow"}, [{"dify", "agent"}, {"workflow", "dify", "node"}, {"rag"}, set()]),
+        ({"unknown"}, [{"dify"}, {"rag"}]),
+        (set(), [{"dify"}]),
+        ({"dify"}, [set(), set()]),
+        ({"a", "b", "c"}, [{"a"}, {"a", "b"}, {"a", "b", "c"}, {"c", "d"}, {"e"}]),
+    ],
+)
+def test_matches_reference_scores(query_keywords, documents_keywords):
+    scores = calculate_tfidf_cosine_scores(query_keywords, documents_keywords)
+
+    assert scores == pytest.approx(_reference_scores(query_keywords, documents_keywords))
+
+
+def test_no_documents():
+    assert calculate_tfidf_cosine_scores({"dify"}, []) == []
@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.rerank import weight_rerank
+from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.weight_rerank import WeightRerankRunner
+
+
+@pytest.fixture
+def cache_embedding(mocker):
+    mocker.patch.object(weight_rerank, "ModelManager")
+    embedding = MagicMock()
+    mocker.patch.object(weight_rerank, "CacheEmbedding", return_value=embedding)
+    return embedding
+
+
+def _runner() -> WeightRerankRunner:
+    return WeightRerankRunner(
+        "tenant",
+        Weights(
+            vector_setting=VectorSetting(
+                vector_weight=1.0, embedding_provider_name="provider", embedding_model_name="model"
+            ),
+            keyword_setting=KeywordSetting(keyword_weight=0.0),
+        ),
+    )
+
+
+def _expected_cosine(a: list[float], b: list[float]) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_calculate_cosine_batches_documents(cache_embedding):
+    cache_embedding.embed_query.return_value = [1.0, 0.0, 1.0]
+    cache_embedding.embed_documents.return_value = [[0.0, 1.0, 1.0]]
+    documents = [
+        Document(page_content="scored", metadata={"doc_id": "1", "score": 0.42}),
+        Document(page_content="with vector", vector=[1.0, 2.0, 3.0], metadata={"doc_id": "2"}),
+        Document(page_content="without vector", metadata={"doc_id": "3"}),
+        Document(page_content="zero vector", vector=[0.0, 0.0, 0.0], metadata={"doc_id": "4"}),
+    ]
+
+    scores = _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    assert scores[0] == 0.42
+    assert scores[1] == pytest.approx(_expected_cosine([1.0, 0.0, 1.0], [1.0, 2.0, 3.0]))
+    assert scores[2] == pytest.approx(0.5)
+    assert scores[3] == 0.0
+    cache_embedding.embed_documents.assert_called_once_with(["without vector"])
+
+
+def test_calculate_cosine_scores_documents_not_embedded_as_zero(cache_embedding):
+    cache_embedding.embed_query.return_value = [1.0, 0.0]
+    cache_embedding.embed_documents.return_value = [None, [1.0, 0.0]]
+    documents = [
+        Document(page_content="a", metadata={"doc_id": "1"}),
+        Document(page_content="b", metadata={"doc_id": "2"}),
+    ]
+
+    scores = _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    assert scores == [0.0, pytest.approx(1.0)]
+
+
+def test_calculate_cosine_skips_embedding_when_all_scored(cache_embedding):
+    documents = [Document(page_content="a", metadata={"doc_id": "1", "score": 0.9})]
+
+    scores = _runner()._calculate_cosine("tenant", "query", documents, _runner().weights.vector_setting)
+
+    assert scores == [0.9]
+    weight_rerank.CacheEmbedding.assert_not_called()
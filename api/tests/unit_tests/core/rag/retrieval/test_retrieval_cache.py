@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from configs import dify_config
+from core.rag.models.document import ChildDocument, Document
+from core.rag.retrieval import retrieval_cache
+from core.rag.retrieval.retrieval_cache import RetrievalCache, bump_dataset_retrieval_version
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.ttls: dict[str, int] = {}
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+
+
+@pytest.fixture
+def redis(mocker):
+    fake_redis = FakeRedis()
+    mocker.patch.object(retrieval_cache, "redis_client", fake_redis)
+    mocker.patch.object(dify_config, "RETRIEVAL_CACHE_ENABLED", True)
+    return fake_redis
+
+
+def test_cache_round_trip(redis):
+    documents = [
+        Document(
+            page_content="content",
+            vector=[0.1, 0.2],
+            metadata={"doc_id": "1", "score": 0.9},
+            children=[ChildDocument(page_content="child", metadata={"doc_id": "1-1"})],
+        )
+    ]
+    cache_key = RetrievalCache.get_cache_key(["dataset"], "what is dify", {"top_k": 2})
+    assert RetrievalCache.get(cache_key) is None
+
+    RetrievalCache.set(cache_key, documents)
+
+    assert RetrievalCache.get(cache_key) == documents
+    assert redis.ttls[cache_key] == dify_config.RETRIEVAL_CACHE_TTL
+
+
+def test_cache_key_normalizes_query_and_dataset_order(redis):
+    cache_key = RetrievalCache.get_cache_key(["a", "b"], " what  is\tdify ", {"top_k": 2})
+
+    assert cache_key == RetrievalCache.get_cache_key(["b", "a"], "what is dify", {"top_k": 2})
+    assert cache_key != RetrievalCache.get_cache_key(["a", "b"], "what is dify", {"top_k": 3})
+
+
+def test_bumped_version_invalidates_cache(redis):
+    cache_key = RetrievalCache.get_cache_key(["a", "b"], "query", {})
+    RetrievalCache.set(cache_key, [Document(page_content="stale")])
+
+    bump_dataset_retrieval_version("b")
+
+    new_cache_key = RetrievalCache.get_cache_key(["a", "b"], "query", {})
+    assert new_cache_key != cache_key
+    assert RetrievalCache.get(new_cache_key) is None
+
+
+def test_large_results_are_not_cached(redis, mocker):
+    mocker.patch.object(dify_config, "RETRIEVAL_CACHE_MAX_ENTRY_SIZE", 10)
+    cache_key = RetrievalCache.get_cache_key(["dataset"], "query", {})
+
+    RetrievalCache.set(cache_key, [Document(page_content="a long page content")])
+
+    assert RetrievalCache.get(cache_key) is None
+
+
+def test_disabled_cache_has_no_key(mocker):
+    redis_client = MagicMock()
+    mocker.patch.object(retrieval_cache, "redis_client", redis_client)
+    mocker.patch.object(dify_config, "RETRIEVAL_CACHE_ENABLED", False)
+
+    assert RetrievalCache.get_cache_key(["dataset"], "query", {}) is None
+    assert RetrievalCache.get(None) is None
+    redis_client.mget.assert_not_called()
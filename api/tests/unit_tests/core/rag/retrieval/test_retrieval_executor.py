@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = RetrievalExecutor(max_workers=1, max_queue_size=10)
+    yield executor
+    executor.shutdown()
+
+
+def _block(executor: RetrievalExecutor) -> threading.Event:
+    # occupy the only worker until the returned event is set
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    executor.submit("blocker", blocker)
+    started.wait(5)
+    return release
+
+
+def test_submit_returns_result(executor):
+    assert executor.submit("tenant", lambda x: x * 2, 21).result(timeout=5) == 42
+    assert executor.submit("tenant", lambda **kwargs: kwargs, a=1).result(timeout=5) == {"a": 1}
+
+
+def test_round_robin_across_tenants(executor):
+    release = _block(executor)
+    order = []
+    futures = [executor.submit("a", order.append, f"a{i}") for i in range(3)]
+    futures += [executor.submit("b", order.append, f"b{i}") for i in range(2)]
+    assert executor.stats()["queue_depth"] == 5
+    assert executor.stats()["queued_tenants"] == 2
+
+    release.set()
+    assert executor.wait(futures, timeout=5)
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_rejects_when_queue_is_full():
+    executor = RetrievalExecutor(max_workers=1, max_queue_size=1)
+    release = _block(executor)
+    executor.submit("tenant", lambda: None)
+
+    with pytest.raises(ValueError):
+        executor.submit("tenant", lambda: None)
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    executor.shutdown()
+
+
+def test_nested_submits_run_in_parallel_on_workers_of_their_own(executor):
+    # the searches only finish if they run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+
+    def search():
+        barrier.wait()
+        # searches submitted from the nested pool run inline
+        return executor.submit("tenant", threading.current_thread).result(timeout=5).name
+
+    def retrieve():
+        futures = [executor.submit("tenant", search) for _ in range(2)]
+        return [future.result(timeout=5) for future in futures]
+
+    executor._nested.max_workers = 2
+    names = executor.submit("tenant", retrieve).result(timeout=5)
+
+    assert len(names) == 2
+    assert all(name.startswith("retrieval_nested") for name in names)
+
+
+def test_wait_cancels_pending_futures_on_deadline(executor):
+    release = _block(executor)
+    future = executor.submit("tenant", lambda: "late")
+
+    assert not executor.wait([future], timeout=0.05)
+    assert future.cancelled()
+
+    release.set()
+    executor.shutdown()
+    stats = executor.stats()
+    assert stats["timed_out"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from configs import dify_config
+from core import indexing_runner as indexing_runner_module
+from core.helper.indexing_slots import IndexingSchedulerStats
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.models.document import Document
+from models.dataset import Document as DatasetDocument
+
+
+@pytest.fixture
+def runner(mocker):
+    mocker.patch.object(dify_config, "INDEXING_PAGE_BATCH_SIZE", 2)
+    mocker.patch.object(dify_config, "INDEXING_MAX_PENDING_BATCHES", 1)
+    mocker.patch.object(indexing_runner_module, "DatasetDocumentStore")
+    runner = IndexingRunner()
+    pages = [Document(page_content=f"page {i}", metadata={}) for i in range(5)]
+    mocker.patch.object(runner, "_extract_iter", return_value=(page for page in pages))
+    mocker.patch.object(runner, "_get_embedding_model_instance")
+    mocker.patch.object(runner, "_update_document_index_status")
+    mocker.patch.object(runner, "_save_segments")
+    mocker.patch.object(runner, "_process_keyword_index", return_value=None)
+    mocker.patch.object(runner, "_process_chunk", side_effect=lambda *args: len(args[2]))
+    with Flask(__name__).app_context():
+        yield runner
+
+
+def _run_pipeline(runner, process_rule):
+    index_processor = MagicMock()
+    index_processor.transform.side_effect = lambda documents, **kwargs: [
+        Document(page_content=document.page_content, metadata={"doc_id": document.page_content})
+        for document in documents
+    ]
+    dataset = MagicMock(indexing_technique="high_quality")
+    dataset_document = MagicMock(id="document_id", doc_form="text_model")
+    runner._run_pipeline(index_processor, dataset, dataset_document, process_rule)
+    return index_processor
+
+
+def test_run_pipeline_in_batches(runner):
+    index_processor = _run_pipeline(runner, {"mode": "automatic"})
+
+    assert [len(call.args[0]) for call in index_processor.transform.call_args_list] == [2, 2, 1]
+    assert [len(call.args[2]) for call in runner._save_segments.call_args_list] == [2, 2, 1]
+    assert runner._process_keyword_index.call_count == 3
+    statuses = [call.kwargs for call in runner._update_document_index_status.call_args_list]
+    assert [status["after_indexing_status"] for status in statuses] == [
+        "splitting",
+        "splitting",
+        "splitting",
+        "indexing",
+        "completed",
+    ]
+    assert statuses[2]["extra_update_params"][DatasetDocument.word_count] == 30
+    assert statuses[-1]["extra_update_params"][DatasetDocument.tokens] == 5
+
+
+def test_run_pipeline_full_doc(runner):
+    index_processor = _run_pipeline(runner, {"mode": "hierarchical", "rules": {"parent_mode": "full-doc"}})
+
+    # the whole document is split at once
+    assert [len(call.args[0]) for call in index_processor.transform.call_args_list] == [5]
+    runner._save_segments.assert_called_once()
+
+
+def test_run_documents_concurrently(mocker, runner):
+    mocker.patch.object(dify_config, "INDEXING_MAX_CONCURRENT_DOCUMENTS_PER_DATASET", 2)
+    mocker.patch.object(indexing_runner_module, "hold_indexing_slots")
+    stats = mocker.patch.object(indexing_runner_module, "indexing_scheduler_stats", IndexingSchedulerStats())
+    indexed = {"document_1": True, "document_2": False}
+
+    def run_document(dataset_document):
+        if dataset_document.id == "document_3":
+            raise DocumentIsPausedError()
+        return indexed[dataset_document.id]
+
+    mocker.patch.object(runner, "_run_document", side_effect=run_document)
+    dataset_documents = [MagicMock(id=f"document_{i}") for i in range(1, 4)]
+    query = mocker.patch.object(indexing_runner_module, "db").session.query.return_value
+    query.filter.return_value.first.side_effect = dataset_documents
+
+    # the paused document does not stop the indexing of the others
+    with pytest.raises(DocumentIsPausedError):
+        runner.run(dataset_documents)
+
+    assert runner._run_document.call_count == 3
+    assert stats.snapshot() == {"waiting": 0, "running": 0, "completed": 1, "failed": 1, "paused": 1}
+
+
+@pytest.mark.parametrize(
+    ("concurrent_documents", "pool_size", "max_overflow", "lanes"),
+    [(1, 30, 10, 10), (4, 30, 10, 7), (8, 30, 10, 2), (8, 5, 0, 1), (4, 0, 10, 10)],
+)
+def test_lanes_fit_in_the_database_pool(mocker, concurrent_documents, pool_size, max_overflow, lanes):
+    mocker.patch.object(dify_config, "SQLALCHEMY_POOL_SIZE", pool_size)
+    mocker.patch.object(dify_config, "SQLALCHEMY_MAX_OVERFLOW", max_overflow)
+    runner = IndexingRunner()
+    runner._concurrent_documents = concurrent_documents
+
+    assert runner._lane_count() == lanes
+
+
+def test_run_in_splitting_status_cleans_the_loaded_segments(mocker, runner):
+    mocker.patch.object(indexing_runner_module, "db")
+    dataset = mocker.patch.object(indexing_runner_module, "Dataset").query.filter_by.return_value.first.return_value
+    document_segments = [MagicMock(index_node_id=f"node_{i}") for i in range(2)]
+    query = mocker.patch.object(indexing_runner_module, "DocumentSegment").query
+    query.filter_by.return_value.all.return_value = document_segments
+    factory = mocker.patch.object(indexing_runner_module, "IndexProcessorFactory")
+    index_processor = factory.return_value.init_index_processor.return_value
+    mocker.patch.object(runner, "_run_pipeline")
+
+    runner.run_in_splitting_status(MagicMock(doc_form="text_model"))
+
+    # the vectors and keywords of the batches loaded before the indexing stopped are removed
+    index_processor.clean.assert_called_once_with(
+        dataset, ["node_0", "node_1"], with_keywords=True, delete_child_chunks=True
+    )
+    runner._run_pipeline.assert_called_once()
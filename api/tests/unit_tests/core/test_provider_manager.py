@@ -1,8 +1,11 @@
+from configs import dify_config
+from core import provider_manager as provider_manager_module
 from core.entities.provider_entities import ModelSettings
+from core.helper.model_provider_cache import ProviderConfigurationsVersion
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.model_providers import model_provider_factory
 from core.provider_manager import ProviderManager
-from models.provider import LoadBalancingModelConfig, ProviderModelSetting
+from models.provider import LoadBalancingModelConfig, ProviderModelSetting, ProviderType
 
 
 def test__to_model_settings(mocker):
@@ -181,3 +184,47 @@ def test__to_model_settings_lb_disabled(mocker):
     assert result[0].model_type == ModelType.LLM
     assert result[0].enabled is True
     assert len(result[0].load_balancing_configs) == 0
+
+
+def _mock_provider_records(mocker):
+    mocker.patch.object(provider_manager_module, "_snapshots", None)
+    get_all_providers = mocker.patch.object(ProviderManager, "_get_all_providers", return_value={})
+    mocker.patch.object(ProviderManager, "_init_trial_provider_records", side_effect=lambda _, records: records)
+    mocker.patch.object(ProviderManager, "_get_all_provider_models", return_value={})
+    mocker.patch.object(ProviderManager, "_get_all_preferred_model_providers", return_value={})
+    mocker.patch.object(ProviderManager, "_get_all_provider_model_settings", return_value={})
+    mocker.patch.object(ProviderManager, "_get_all_provider_load_balancing_configs", return_value={})
+    return get_all_providers
+
+
+def test_get_provider_configuration_cached(mocker):
+    get_all_providers = _mock_provider_records(mocker)
+    version = mocker.patch.object(ProviderConfigurationsVersion, "get", return_value=0)
+    provider_manager = ProviderManager()
+
+    configuration = provider_manager.get_provider_configuration("tenant_id", "openai")
+    assert configuration.provider.provider == "openai"
+    assert configuration.using_provider_type == ProviderType.CUSTOM
+    assert provider_manager.get_provider_configuration("tenant_id", "unknown") is None
+    # only the requested provider is built
+    snapshot = provider_manager._get_snapshot("tenant_id")
+    assert list(snapshot.configurations) == ["openai"]
+    assert ProviderManager().get_configurations("tenant_id")["openai"] is configuration
+    assert get_all_providers.call_count == 1
+
+    # a change in the workspace bumps the version
+    version.return_value = 1
+    assert provider_manager.get_provider_configuration("tenant_id", "openai") is not configuration
+    assert get_all_providers.call_count == 2
+
+
+def test_get_provider_configuration_cache_disabled(mocker):
+    get_all_providers = _mock_provider_records(mocker)
+    mocker.patch.object(dify_config, "PROVIDER_CONFIGURATIONS_CACHE_SIZE", 0)
+    version = mocker.patch.object(ProviderConfigurationsVersion, "get")
+    provider_manager = ProviderManager()
+
+    configuration = provider_manager.get_provider_configuration("tenant_id", "openai")
+    assert provider_manager.get_provider_configuration("tenant_id", "openai") is not configuration
+    assert get_all_providers.call_count == 2
+    version.assert_not_called()
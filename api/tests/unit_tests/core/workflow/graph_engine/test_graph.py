@@ -789,3 +789,25 @@ def test_parallels_graph6():
 
     for node_id in ["code1", "code2"]:
         assert graph.node_parallel_mapping[node_id] == child_parallel.id
+
+
+def test_init_cached():
+    graph_config = {
+        "edges": [
+            {
+                "id": "start-source-answer-target",
+                "source": "start",
+                "target": "answer",
+            },
+        ],
+        "nodes": [
+            {"data": {"type": "start"}, "id": "start"},
+            {"data": {"type": "answer", "title": "answer", "answer": "1"}, "id": "answer"},
+        ],
+    }
+
+    graph = Graph.init_cached(graph_config=graph_config, cache_key="workflow-hash")
+
+    assert graph is Graph.init_cached(graph_config=graph_config, cache_key="workflow-hash")
+    assert graph is not Graph.init_cached(graph_config=graph_config, cache_key="changed-workflow-hash")
+    assert Graph.init_cached(graph_config=graph_config, cache_key="workflow-hash", root_node_id="start") is not graph
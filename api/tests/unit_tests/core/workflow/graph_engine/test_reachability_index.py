@@ -0,0 +1,56 @@
+from core.workflow.graph_engine.entities.graph import Graph
+
+
+def _graph() -> Graph:
+    graph_config = {
+        "edges": [
+            {"id": "start-qc", "source": "start", "target": "qc"},
+            {"id": "qc-1-llm", "source": "qc", "sourceHandle": "1", "target": "llm"},
+            {"id": "qc-2-http", "source": "qc", "sourceHandle": "2", "target": "http"},
+            {"id": "llm-answer", "source": "llm", "target": "answer"},
+            {"id": "http-answer2", "source": "http", "target": "answer2"},
+            {"id": "answer-merge", "source": "answer", "target": "merge"},
+            {"id": "answer2-merge", "source": "answer2", "target": "merge"},
+        ],
+        "nodes": [
+            {"data": {"type": "start"}, "id": "start"},
+            {"data": {"type": "question-classifier"}, "id": "qc"},
+            {"data": {"type": "llm"}, "id": "llm"},
+            {"data": {"type": "http-request"}, "id": "http"},
+            {"data": {"type": "answer", "title": "answer", "answer": "{{#llm.text#}}"}, "id": "answer"},
+            {"data": {"type": "answer", "title": "answer2", "answer": "{{#http.body#}}"}, "id": "answer2"},
+            {"data": {"type": "answer", "title": "merge", "answer": "done"}, "id": "merge"},
+        ],
+    }
+    return Graph.init(graph_config=graph_config)
+
+
+def test_reachable_in_branch():
+    graph = _graph()
+    index = graph.reachability_index
+
+    assert graph.reachability_index is index
+    assert index.reachable_in_branch("llm", "1") == index.mask(["answer", "merge"])
+    assert index.reachable_in_branch("start") == index.bit("qc")
+    assert index.reachable_in_branch("qc", "2") == index.mask(["http", "answer2", "merge"])
+    assert index.reachable_in_branch("qc") == 0
+
+
+def test_prune_branch():
+    index = _graph().reachability_index
+    rest = index.all_nodes & ~index.mask(["start", "qc"])
+
+    rest = index.prune_branch(rest, "http", index.reachable_in_branch("llm", "1"))
+
+    # the merge node is still reachable from the branch taken
+    assert rest == index.mask(["llm", "answer", "merge"])
+    assert index.prune_branch(rest, "http", 0) == rest
+
+
+def test_dependencies():
+    index = _graph().reachability_index
+
+    assert index.answer_dependencies["answer"] == index.bit("qc")
+    assert index.answer_dependencies["answer2"] == index.bit("qc")
+    rest = index.all_nodes & ~index.mask(["start", "qc"])
+    assert not rest & index.answer_dependencies["answer"]
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from core.workflow.graph_engine.workflow_execution_pool import WorkflowExecutionPool
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_submit_runs_tasks():
+    pool = WorkflowExecutionPool(max_workers=2, max_queue_size=10)
+    futures = [pool.submit("tenant", "app", lambda i=i: i * 2) for i in range(5)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+    stats = pool.stats()
+    assert stats["completed"] == 5
+    assert stats["workers"] <= 2
+    pool.shutdown()
+
+
+def test_tenant_limit_does_not_block_other_tenants(release):
+    pool = WorkflowExecutionPool(max_workers=4, max_queue_size=10, max_workers_per_tenant=1)
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    blocking = pool.submit("tenant_a", "app_a", block)
+    assert started.wait(timeout=5)
+    queued = pool.submit("tenant_a", "app_a", lambda: "a")
+    other = pool.submit("tenant_b", "app_b", lambda: "b")
+
+    assert other.result(timeout=5) == "b"
+    assert not queued.done()
+    assert pool.stats()["queue_depth"] == 1
+
+    release.set()
+    assert queued.result(timeout=5) == "a"
+    assert blocking.result(timeout=5) is None
+    pool.shutdown()
+
+
+def test_app_limit(release):
+    pool = WorkflowExecutionPool(max_workers=4, max_queue_size=10, max_workers_per_app=1)
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    pool.submit("tenant", "app_a", block)
+    assert started.wait(timeout=5)
+    queued = pool.submit("tenant", "app_a", lambda: "a")
+    other = pool.submit("tenant", "app_b", lambda: "b")
+
+    assert other.result(timeout=5) == "b"
+    assert not queued.done()
+    release.set()
+    assert queued.result(timeout=5) == "a"
+    pool.shutdown()
+
+
+def test_nested_submit_runs_inline_when_pool_is_full():
+    pool = WorkflowExecutionPool(max_workers=1, max_queue_size=10)
+
+    def parent():
+        return pool.submit("tenant", "app", lambda: threading.current_thread().name).result(timeout=5)
+
+    worker_name = pool.submit("tenant", "app", parent).result(timeout=5)
+
+    assert worker_name.startswith("workflow_")
+    assert pool.stats()["inline"] == 1
+    pool.shutdown()
+
+
+def test_nested_submit_takes_a_free_worker():
+    pool = WorkflowExecutionPool(max_workers=2, max_queue_size=10)
+
+    def parent():
+        child = pool.submit("tenant", "app", lambda: threading.current_thread().name)
+        return threading.current_thread().name, child.result(timeout=5)
+
+    parent_name, child_name = pool.submit("tenant", "app", parent).result(timeout=5)
+
+    assert parent_name != child_name
+    assert pool.stats()["inline"] == 0
+    pool.shutdown()
+
+
+def test_submit_rejects_when_queue_is_full(release):
+    pool = WorkflowExecutionPool(max_workers=1, max_queue_size=1)
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    pool.submit("tenant", "app", block)
+    assert started.wait(timeout=5)
+    pool.submit("tenant", "app", lambda: None)
+
+    with pytest.raises(ValueError):
+        pool.submit("tenant", "app", lambda: None)
+    assert pool.stats()["rejected"] == 1
+    release.set()
+    pool.shutdown()
+
+
+def test_cancelled_task_releases_its_slot(release):
+    pool = WorkflowExecutionPool(max_workers=1, max_queue_size=10)
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    pool.submit("tenant", "app", block)
+    assert started.wait(timeout=5)
+    cancelled = pool.submit("tenant", "app", lambda: None)
+    assert cancelled.cancel()
+    release.set()
+
+    assert pool.submit("tenant", "app", lambda: "done").result(timeout=5) == "done"
+    assert pool.stats()["cancelled"] == 1
+    assert pool.stats()["active"] == 0
+    pool.shutdown()
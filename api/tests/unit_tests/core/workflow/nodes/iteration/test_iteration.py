@@ -2,7 +2,10 @@ import time
 import uuid
 from unittest.mock import patch
 
+import pytest
+
 from core.app.entities.app_invoke_entities import InvokeFrom
+from core.variables import SpilledArray
 from core.workflow.entities.node_entities import NodeRunResult
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.enums import SystemVariableKey
@@ -17,7 +20,8 @@ from models.enums import UserFrom
 from models.workflow import WorkflowNodeExecutionStatus, WorkflowType
 
 
-def test_run():
+@pytest.mark.parametrize("is_streaming", [False, True])
+def test_run(is_streaming):
     graph_config = {
         "edges": [
             {
@@ -174,6 +178,7 @@ def test_run():
                 "start_node_id": "tt",
                 "title": "迭代",
                 "type": "iteration",
+                "is_streaming": is_streaming,
             },
             "id": "iteration-1",
         },
@@ -196,7 +201,9 @@ def test_run():
             count += 1
             if isinstance(item, RunCompletedEvent):
                 assert item.run_result.status == WorkflowNodeExecutionStatus.SUCCEEDED
-                assert item.run_result.outputs == {"output": ["dify 123", "dify 123"]}
+                assert item.run_result.outputs is not None
+                assert isinstance(item.run_result.outputs["output"], SpilledArray if is_streaming else list)
+                assert list(item.run_result.outputs["output"]) == ["dify 123", "dify 123"]
 
         assert count == 20
 
@@ -13,6 +13,7 @@ from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntime
 from core.workflow.nodes.if_else.entities import IfElseNodeData
 from core.workflow.nodes.if_else.if_else_node import IfElseNode
 from core.workflow.utils.condition.entities import Condition, SubCondition, SubVariableCondition
+from core.workflow.utils.condition.processor import CompiledConditions
 from extensions.ext_database import db
 from models.enums import UserFrom
 from models.workflow import WorkflowNodeExecutionStatus, WorkflowType
@@ -240,6 +241,9 @@ def test_array_file_contains_file_name():
         },
     )
 
+    node.graph.get_compiled_conditions.side_effect = lambda key, conditions, operator: CompiledConditions(
+        conditions=conditions, operator=operator
+    )
     node.graph_runtime_state.variable_pool.get.return_value = ArrayFileSegment(
         value=[
             File(
@@ -1,8 +1,11 @@
 import pytest
 
+from configs import dify_config
 from core.file import File, FileTransferMethod, FileType
-from core.variables import FileSegment, StringSegment
+from core.variables import FileSegment, StringSegment, StringVariable
+from core.workflow.constants import CONVERSATION_VARIABLE_NODE_ID
 from core.workflow.entities.variable_pool import VariablePool
+from extensions.ext_storage import storage
 
 
 @pytest.fixture
@@ -44,3 +47,114 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_child_pool_reads_parent_and_isolates_writes(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    pool.add(("node_2", "var"), StringSegment(value="other"))
+    child = pool.create_child()
+
+    assert child.get(("node_1", "var")).value == "parent"
+
+    child.add(("node_1", "var"), StringSegment(value="child"))
+    child.add(("node_3", "var"), StringSegment(value="new"))
+    child.remove(("node_2",))
+
+    assert child.get(("node_1", "var")).value == "child"
+    assert child.get(("node_3", "var")).value == "new"
+    assert child.get(("node_2", "var")) is None
+    assert pool.get(("node_1", "var")).value == "parent"
+    assert pool.get(("node_3", "var")) is None
+    assert pool.get(("node_2", "var")).value == "other"
+
+
+def test_child_pool_remove_then_add(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    child = pool.create_child()
+
+    child.remove(("node_1", "var"))
+    assert child.get(("node_1", "var")) is None
+
+    child.add(("node_1", "var"), StringSegment(value="child"))
+    assert child.get(("node_1", "var")).value == "child"
+
+
+def test_child_pool_assigns_conversation_variables_to_itself():
+    pool = VariablePool(
+        system_variables={},
+        user_inputs={},
+        conversation_variables=[StringVariable(name="topic", value="parent")],
+    )
+    child = pool.create_child()
+    variable = child.get((CONVERSATION_VARIABLE_NODE_ID, "topic"))
+
+    child.add((CONVERSATION_VARIABLE_NODE_ID, "topic"), variable.model_copy(update={"value": "child"}))
+
+    assert child.get((CONVERSATION_VARIABLE_NODE_ID, "topic")).value == "child"
+    assert pool.get((CONVERSATION_VARIABLE_NODE_ID, "topic")).value == "parent"
+    assert pool.conversation_variables[0].value == "parent"
+
+
+def test_spill_large_variables(pool, mocker):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_SPILL_THRESHOLD", 100 * 1024)
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_POOL_MEMORY_BUDGET", 0)
+    files: dict[str, bytes] = {}
+    mocker.patch.object(storage, "save", side_effect=files.__setitem__)
+    mocker.patch.object(storage, "load_once", side_effect=files.__getitem__)
+    mocker.patch.object(storage, "delete", side_effect=files.pop)
+
+    pool.add(("node_1", "small"), "x" * 10)
+    pool.add(("node_1", "large"), {"body": "y" * 200 * 1024})
+
+    assert len(files) == 1
+    assert pool.memory_usage < 1024
+    assert pool.get(("node_1", "large")).value == {"body": "y" * 200 * 1024}
+    assert pool.get(("node_1", "small")).value == "x" * 10
+
+    child = pool.create_child()
+    child.add(("node_2", "large"), "z" * 200 * 1024)
+    assert child.get(("node_2", "large")).value == "z" * 200 * 1024
+    assert child.get(("node_1", "large")).value == {"body": "y" * 200 * 1024}
+
+    # the values read last stay loaded
+    assert pool.get(("node_1", "large")).value == {"body": "y" * 200 * 1024}
+    assert storage.load_once.call_count == 2
+
+    pool.release_spilled()
+    assert not files
+
+
+def test_memory_budget(pool, mocker):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_SPILL_THRESHOLD", 0)
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_POOL_MEMORY_BUDGET", 300 * 1024)
+    save = mocker.patch.object(storage, "save")
+
+    pool.add(("node_1", "a"), "a" * 200 * 1024)
+    assert save.call_count == 0
+    pool.add(("node_1", "b"), "b" * 200 * 1024)
+    assert save.call_count == 1
+
+    # removed variables free their share of the budget
+    pool.remove(("node_1", "a"))
+    assert pool.memory_usage == 0
+    pool.add(("node_1", "c"), "c" * 200 * 1024)
+    assert save.call_count == 1
+
+
+def test_child_pools_share_the_memory_budget(pool, mocker):
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_SPILL_THRESHOLD", 0)
+    mocker.patch.object(dify_config, "WORKFLOW_VARIABLE_POOL_MEMORY_BUDGET", 300 * 1024)
+    save = mocker.patch.object(storage, "save")
+    pool.add(("node_1", "a"), "a" * 100 * 1024)
+    children = [pool.create_child() for _ in range(2)]
+
+    children[0].add(("node_2", "b"), "b" * 100 * 1024)
+    assert save.call_count == 0
+    children[1].add(("node_2", "b"), "b" * 150 * 1024)
+    assert save.call_count == 1
+
+    # a discarded child gives back its share of the budget
+    children[0].discard()
+    assert pool.memory_usage < 110 * 1024
+    pool.add(("node_3", "c"), "c" * 150 * 1024)
+    assert save.call_count == 1
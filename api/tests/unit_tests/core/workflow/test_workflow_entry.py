@@ -0,0 +1,16 @@
+from unittest.mock import MagicMock
+
+from core.workflow.workflow_entry import WorkflowEntry
+
+
+def test_single_step_run_releases_spilled_variables_when_stopped_early():
+    variable_pool = MagicMock()
+    generator = WorkflowEntry._release_spilled_after(iter(["started", "completed", "unread"]), variable_pool)
+
+    for event in generator:
+        if event == "completed":
+            break
+    variable_pool.release_spilled.assert_not_called()
+    generator.close()
+
+    variable_pool.release_spilled.assert_called_once()
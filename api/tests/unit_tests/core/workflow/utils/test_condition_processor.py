@@ -0,0 +1,198 @@
+from collections.abc import Sequence
+from typing import Any, Literal
+
+import pytest
+
+from core.variables import ArrayFileSegment
+from core.workflow.entities.variable_pool import VariablePool
+from core.workflow.utils.condition import processor
+from core.workflow.utils.condition.entities import Condition, SupportedComparisonOperator
+from core.workflow.utils.condition.processor import CompiledConditions
+
+
+def _variable_pool(**values) -> VariablePool:
+    pool = VariablePool(system_variables={}, user_inputs={})
+    for key, value in values.items():
+        pool.add(["node", key], value)
+    return pool
+
+
+def test_short_circuit():
+    conditions = [
+        Condition(variable_selector=["node", "name"], comparison_operator="is", value="dify"),
+        Condition(variable_selector=["node", "missing"], comparison_operator="empty"),
+    ]
+    pool = _variable_pool(name="other")
+
+    input_conditions, results, final_result = CompiledConditions(conditions=conditions, operator="and").evaluate(pool)
+    assert (results, final_result) == ([False], False)
+    assert input_conditions == [{"actual_value": "other", "expected_value": "dify", "comparison_operator": "is"}]
+
+    _, results, final_result = CompiledConditions(conditions=conditions[::-1], operator="or").evaluate(
+        _variable_pool(missing="", name="other")
+    )
+    assert (results, final_result) == ([True], True)
+
+    with pytest.raises(ValueError, match="not found"):
+        CompiledConditions(conditions=conditions, operator="or").evaluate(pool)
+
+
+def test_expected_values():
+    compiled = CompiledConditions(
+        conditions=[
+            Condition(variable_selector=["node", "query"], comparison_operator="contains", value="{{#node.word#}}!"),
+            Condition(variable_selector=["node", "count"], comparison_operator="≥", value="2.5"),
+        ],
+        operator="and",
+    )
+
+    input_conditions, results, final_result = compiled.evaluate(_variable_pool(query="hi!", word="hi", count=3.0))
+    assert (results, final_result) == ([True, True], True)
+    assert input_conditions[0]["expected_value"] == "hi!"
+    assert input_conditions[1]["expected_value"] == "2.5"
+    assert compiled.evaluate(_variable_pool(query="hi!", word="ho", count=3.0), record_inputs=False) == (
+        [],
+        [False],
+        False,
+    )
+    # the expected value is converted like the actual value, 2.5 is not an int
+    with pytest.raises(ValueError):
+        compiled.evaluate(_variable_pool(query="hi!", word="hi", count=3))
+
+
+def _baseline_process_conditions(
+    *, variable_pool: VariablePool, conditions: Sequence[Condition], operator: Literal["and", "or"]
+):
+    """ConditionProcessor.process_conditions before conditions were compiled, kept as the benchmark baseline."""
+    input_conditions = []
+    group_results = []
+
+    for condition in conditions:
+        variable = variable_pool.get(condition.variable_selector)
+        if variable is None:
+            raise ValueError(f"Variable {condition.variable_selector} not found")
+
+        if isinstance(variable, ArrayFileSegment) and condition.comparison_operator in {
+            "contains",
+            "not contains",
+            "all of",
+        }:
+            # check sub conditions
+            if not condition.sub_variable_condition:
+                raise ValueError("Sub variable is required")
+            result = processor._process_sub_conditions(
+                variable=variable,
+                sub_conditions=condition.sub_variable_condition.conditions,
+                operator=condition.sub_variable_condition.logical_operator,
+            )
+        elif condition.comparison_operator in {
+            "exists",
+            "not exists",
+        }:
+            result = _baseline_evaluate_condition(
+                value=variable.value,
+                operator=condition.comparison_operator,
+                expected=None,
+            )
+        else:
+            actual_value = variable.value if variable else None
+            expected_value = condition.value
+            if isinstance(expected_value, str):
+                expected_value = variable_pool.convert_template(expected_value).text
+            input_conditions.append(
+                {
+                    "actual_value": actual_value,
+                    "expected_value": expected_value,
+                    "comparison_operator": condition.comparison_operator,
+                }
+            )
+            result = _baseline_evaluate_condition(
+                value=actual_value,
+                operator=condition.comparison_operator,
+                expected=expected_value,
+            )
+        group_results.append(result)
+
+    final_result = all(group_results) if operator == "and" else any(group_results)
+    return input_conditions, group_results, final_result
+
+
+def _baseline_evaluate_condition(*, operator: SupportedComparisonOperator, value: Any, expected: Any) -> bool:
+    match operator:
+        case "contains":
+            return processor._assert_contains(value=value, expected=expected)
+        case "not contains":
+            return processor._assert_not_contains(value=value, expected=expected)
+        case "start with":
+            return processor._assert_start_with(value=value, expected=expected)
+        case "end with":
+            return processor._assert_end_with(value=value, expected=expected)
+        case "is":
+            return processor._assert_is(value=value, expected=expected)
+        case "is not":
+            return processor._assert_is_not(value=value, expected=expected)
+        case "empty":
+            return processor._assert_empty(value=value)
+        case "not empty":
+            return processor._assert_not_empty(value=value)
+        case "=":
+            return processor._assert_equal(value=value, expected=expected)
+        case "≠":
+            return processor._assert_not_equal(value=value, expected=expected)
+        case ">":
+            return processor._assert_greater_than(value=value, expected=expected)
+        case "<":
+            return processor._assert_less_than(value=value, expected=expected)
+        case "≥":
+            return processor._assert_greater_than_or_equal(value=value, expected=expected)
+        case "≤":
+            return processor._assert_less_than_or_equal(value=value, expected=expected)
+        case "null":
+            return processor._assert_null(value=value)
+        case "not null":
+            return processor._assert_not_null(value=value)
+        case "in":
+            return processor._assert_in(value=value, expected=expected)
+        case "not in":
+            return processor._assert_not_in(value=value, expected=expected)
+        case "all of" if isinstance(expected, list):
+            return processor._assert_all_of(value=value, expected=expected)
+        case "exists":
+            return processor._assert_exists(value=value)
+        case "not exists":
+            return processor._assert_not_exists(value=value)
+        case _:
+            raise ValueError(f"Unsupported operator: {operator}")
+
+
+CASES = {
+    "string": (
+        [
+            Condition(variable_selector=["node", "query"], comparison_operator="contains", value="weather"),
+            Condition(variable_selector=["node", "query"], comparison_operator="not contains", value="{{#node.word#}}"),
+            Condition(variable_selector=["node", "lang"], comparison_operator="is", value="en"),
+        ],
+        "and",
+    ),
+    "number": (
+        [
+            Condition(variable_selector=["node", "count"], comparison_operator=">", value="100"),
+            Condition(variable_selector=["node", "score"], comparison_operator="≤", value="0.5"),
+            Condition(variable_selector=["node", "count"], comparison_operator="=", value="3"),
+        ],
+        "or",
+    ),
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+@pytest.mark.parametrize("compiled", [False, True], ids=["baseline", "compiled"])
+def test_benchmark_conditions(benchmark, case, compiled):
+    conditions, operator = CASES[case]
+    pool = _variable_pool(query="what is the weather today", word="tomorrow", lang="en", count=3, score=0.8)
+    benchmark.group = f"conditions-{case}"
+    if compiled:
+        result = benchmark(CompiledConditions(conditions=conditions, operator=operator).evaluate, pool)
+    else:
+        result = benchmark(_baseline_process_conditions, variable_pool=pool, conditions=conditions, operator=operator)
+    assert result[2] is True